@@ -0,0 +1,194 @@
+"""
+Admission checks for upload requests, run as the body arrives.
+
+FastAPI parses a multipart body completely before the endpoint runs, so
+checks in the endpoint come after the whole upload has been received. This
+ASGI middleware checks instead:
+
+- Content-Length against the limit, before reading anything
+- each file part's declared type and extension, as soon as its headers arrive
+- the first SNIFF_BYTES of each file, which must look like a supported format
+- the running byte count, for bodies sent without (or lying about) a length
+
+A failing request gets its 413 or 400 response right away, and the rest of
+its body is never read.
+"""
+import re
+from dataclasses import dataclass
+from email.message import Message
+from email.utils import collapse_rfc2231_value
+from typing import List, Optional, Pattern
+
+from fastapi import HTTPException
+from starlette.responses import JSONResponse
+
+from media_probe import SNIFF_BYTES, is_supported_type, sniff_container
+
+# Larger part header blocks are not from a browser or HTTP library
+MAX_PART_HEADER_BYTES = 16 * 1024
+
+UNSUPPORTED_TYPE_DETAIL = "Unsupported file type: {}. Supported formats: MP3, WAV, M4A, MP4, MOV, AVI, FLAC, WebM"
+
+
+@dataclass
+class AdmissionRule:
+    method: str
+    path: Pattern[str]
+    max_body_bytes: int
+    max_file_bytes: int
+    too_large_detail: str
+    check_content: bool = True  # types and magic bytes, besides the sizes
+
+
+def admission_rule(
+    method: str, path: str, max_body_bytes: int, max_file_bytes: int, too_large_detail: str,
+    check_content: bool = True
+) -> AdmissionRule:
+    return AdmissionRule(method, re.compile(path), max_body_bytes, max_file_bytes, too_large_detail, check_content)
+
+
+class UploadRejected(HTTPException):
+    """
+    Raised from the body stream; FastAPI turns it into the error response
+    """
+
+
+def _parse_headers(block: bytes) -> Message:
+    message = Message()
+    for line in block.decode("latin-1").split("\r\n"):
+        name, _, value = line.partition(":")
+        if value:
+            message[name.strip()] = value.strip()
+    return message
+
+
+class _MultipartScanner:
+    """
+    Follows a multipart body chunk by chunk, checking every file part's
+    headers, first bytes and size without keeping more than a few KB
+    """
+
+    def __init__(self, boundary: bytes, rule: AdmissionRule):
+        self.delimiter = b"\r\n--" + boundary
+        self.rule = rule
+        # A leading CRLF lets the first boundary match like all the others
+        self.pending = bytearray(b"\r\n")
+        self.state = "preamble"
+        self.is_file = False
+        self.head = bytearray()
+        self.part_bytes = 0
+
+    def feed(self, chunk: bytes):
+        self.pending.extend(chunk)
+        while self._step():
+            pass
+
+    def _step(self) -> bool:
+        if self.state == "preamble":
+            index = self.pending.find(self.delimiter)
+            if index < 0:
+                del self.pending[:-len(self.delimiter)]
+                return False
+            del self.pending[:index + len(self.delimiter)]
+            self.state = "headers"
+            return True
+
+        if self.state == "headers":
+            end = self.pending.find(b"\r\n\r\n")
+            if end < 0:
+                if len(self.pending) > MAX_PART_HEADER_BYTES:
+                    raise UploadRejected(status_code=400, detail="Malformed multipart body")
+                return False
+            headers = _parse_headers(bytes(self.pending[:end]))
+            del self.pending[:end + 4]
+            filename = headers.get_param("filename", header="content-disposition")
+            self.is_file = filename is not None
+            if isinstance(filename, tuple):
+                filename = collapse_rfc2231_value(filename)
+            if self.is_file and self.rule.check_content and not is_supported_type(filename, headers.get_content_type()):
+                raise UploadRejected(
+                    status_code=400, detail=UNSUPPORTED_TYPE_DETAIL.format(headers.get("content-type"))
+                )
+            self.head = bytearray()
+            self.part_bytes = 0
+            self.state = "content"
+            return True
+
+        # Content runs up to the next delimiter; keep back what could be its start
+        index = self.pending.find(self.delimiter)
+        available = index if index >= 0 else max(len(self.pending) - len(self.delimiter), 0)
+        if self.is_file:
+            self.part_bytes += available
+            if self.part_bytes > self.rule.max_file_bytes:
+                raise UploadRejected(status_code=413, detail=self.rule.too_large_detail)
+            if self.rule.check_content and len(self.head) < SNIFF_BYTES:
+                self.head.extend(self.pending[:min(available, SNIFF_BYTES - len(self.head))])
+                if len(self.head) == SNIFF_BYTES or index >= 0:
+                    check_magic(bytes(self.head))
+        del self.pending[:available]
+        if index < 0:
+            return False
+        del self.pending[:len(self.delimiter)]
+        self.state = "headers"
+        return True
+
+
+def check_magic(head: bytes):
+    if head and sniff_container(head) is None:
+        raise UploadRejected(status_code=400, detail="File content is not a supported audio or video format")
+
+
+class UploadAdmissionMiddleware:
+    def __init__(self, app, rules: List[AdmissionRule]):
+        self.app = app
+        self.rules = rules
+
+    def _rule(self, scope) -> Optional[AdmissionRule]:
+        for rule in self.rules:
+            if scope["method"] == rule.method and rule.path.fullmatch(scope["path"]):
+                return rule
+        return None
+
+    async def __call__(self, scope, receive, send):
+        rule = self._rule(scope) if scope["type"] == "http" else None
+        if rule is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope["headers"]}
+        try:
+            content_length = int(headers.get("content-length", "0"))
+        except ValueError:
+            content_length = 0
+        if content_length > rule.max_body_bytes:
+            response = JSONResponse(status_code=413, content={"detail": rule.too_large_detail})
+            await response(scope, receive, send)
+            return
+
+        content_type = Message()
+        content_type["content-type"] = headers.get("content-type", "")
+        boundary = content_type.get_param("boundary")
+        scanner = _MultipartScanner(boundary.encode("latin-1"), rule) if boundary else None
+        # Raw bodies (resumable upload ranges) are sniffed only when they start the file
+        sniff_raw = rule.check_content and scanner is None and headers.get("content-range", "").startswith("bytes 0-")
+        head = bytearray()
+        received = 0
+
+        async def checked_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] != "http.request":
+                return message
+            chunk = message.get("body", b"")
+            received += len(chunk)
+            if received > rule.max_body_bytes:
+                raise UploadRejected(status_code=413, detail=rule.too_large_detail)
+            if scanner:
+                scanner.feed(chunk)
+            elif sniff_raw and len(head) < SNIFF_BYTES:
+                head.extend(chunk[:SNIFF_BYTES - len(head)])
+                if len(head) == SNIFF_BYTES or not message.get("more_body", False):
+                    check_magic(bytes(head))
+            return message
+
+        await self.app(scope, checked_receive, send)
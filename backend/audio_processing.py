@@ -0,0 +1,398 @@
+"""
+Audio helpers for the transcription pipeline.
+
+PCM WAV files are memory-mapped with NumPy, so even a 200MB upload is never
+loaded into memory as a whole. Other formats are decoded to WAV with ffmpeg
+when it is installed; without it they are sent upstream as-is.
+"""
+import asyncio
+import re
+import shutil
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+
+
+class AudioFormatError(ValueError):
+    pass
+
+
+@dataclass
+class PCMAudio:
+    samples: np.ndarray  # shape (frames, channels), usually a read-only memmap
+    sample_rate: int
+
+    @property
+    def frames(self) -> int:
+        return self.samples.shape[0]
+
+    @property
+    def channels(self) -> int:
+        return self.samples.shape[1]
+
+    @property
+    def duration(self) -> float:
+        return self.frames / self.sample_rate
+
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# 24-bit samples are read as (low byte, high 16 bits) so the high part can be
+# viewed as int16 without copying
+_INT24 = np.dtype([("lo", "u1"), ("hi", "<i2")])
+
+_WAV_DTYPES = {
+    (WAVE_FORMAT_PCM, 8): np.dtype("u1"),
+    (WAVE_FORMAT_PCM, 16): np.dtype("<i2"),
+    (WAVE_FORMAT_PCM, 24): _INT24,
+    (WAVE_FORMAT_PCM, 32): np.dtype("<i4"),
+    (WAVE_FORMAT_IEEE_FLOAT, 32): np.dtype("<f4"),
+}
+
+
+def read_wav(path: Path) -> PCMAudio:
+    """
+    Memory-map the sample data of a RIFF/WAVE file
+    """
+    file_size = path.stat().st_size
+    with open(path, "rb") as f:
+        riff = f.read(12)
+        if len(riff) < 12 or riff[:4] != b"RIFF" or riff[8:12] != b"WAVE":
+            raise AudioFormatError("Not a RIFF/WAVE file")
+
+        fmt = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise AudioFormatError("WAV file has no data chunk")
+            chunk_id, chunk_size = struct.unpack("<4sI", header)
+            if chunk_id == b"fmt ":
+                fmt = f.read(chunk_size)
+                if chunk_size % 2:
+                    f.seek(1, 1)
+            elif chunk_id == b"data":
+                data_offset = f.tell()
+                break
+            else:
+                f.seek(chunk_size + chunk_size % 2, 1)
+
+    if fmt is None or len(fmt) < 16:
+        raise AudioFormatError("WAV file has no fmt chunk")
+    format_tag, channels, sample_rate, _, block_align, bits = struct.unpack("<HHIIHH", fmt[:16])
+    if format_tag == WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+        format_tag = struct.unpack("<H", fmt[24:26])[0]
+    dtype = _WAV_DTYPES.get((format_tag, bits))
+    if dtype is None or channels == 0 or block_align != channels * dtype.itemsize:
+        raise AudioFormatError(f"Unsupported WAV encoding (format {format_tag}, {bits} bits)")
+
+    # Streaming writers leave the data size unset; trust the file size instead
+    available = file_size - data_offset
+    if chunk_size == 0 or chunk_size > available:
+        chunk_size = available
+    frames = chunk_size // block_align
+    if frames == 0:
+        raise AudioFormatError("WAV file contains no samples")
+
+    samples = np.memmap(path, dtype=dtype, mode="r", offset=data_offset, shape=(frames, channels))
+    if dtype == _INT24:
+        samples = samples["hi"]
+    return PCMAudio(samples=samples, sample_rate=sample_rate)
+
+
+def to_int16(samples: np.ndarray) -> np.ndarray:
+    if samples.dtype == np.int16:
+        return samples
+    if samples.dtype == np.uint8:
+        return ((samples.astype(np.int16) - 128) << 8).astype(np.int16)
+    if samples.dtype == np.int32:
+        return (samples >> 16).astype(np.int16)
+    return (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16)
+
+
+def wav_header(channels: int, sample_rate: int, data_size: int) -> bytes:
+    """
+    Canonical 44-byte header for 16-bit PCM
+    """
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_size, b"WAVE",
+        b"fmt ", 16, WAVE_FORMAT_PCM, channels, sample_rate, sample_rate * channels * 2, channels * 2, 16,
+        b"data", data_size
+    )
+
+
+def write_wav(path: Path, samples: np.ndarray, sample_rate: int):
+    """
+    Write 16-bit PCM samples, shaped (frames,) or (frames, channels)
+    """
+    samples = to_int16(samples)
+    channels = 1 if samples.ndim == 1 else samples.shape[1]
+    with open(path, "wb") as f:
+        f.write(wav_header(channels, sample_rate, samples.shape[0] * channels * 2))
+        np.ascontiguousarray(samples, dtype="<i2").tofile(f)
+
+
+def _lowpass_kernel(cutoff: float, taps: int) -> np.ndarray:
+    """
+    Blackman-windowed sinc low-pass; cutoff is in cycles per input sample
+    """
+    n = np.arange(taps) - (taps - 1) / 2
+    kernel = np.sinc(2 * cutoff * n) * np.blackman(taps)
+    return (kernel / kernel.sum()).astype(np.float32)
+
+
+def _fft_convolve_valid(signal: np.ndarray, kernel: np.ndarray) -> np.ndarray:
+    size = signal.size + kernel.size - 1
+    n_fft = 1 << (size - 1).bit_length()
+    full = np.fft.irfft(np.fft.rfft(signal, n_fft) * np.fft.rfft(kernel, n_fft), n_fft)
+    return full[kernel.size - 1:signal.size].astype(np.float32)
+
+
+def resample_to_wav(
+    audio: PCMAudio,
+    output_path: Path,
+    target_rate: int = 16000,
+    taps: int = 101,
+    block_output_frames: int = 1 << 16
+) -> PCMAudio:
+    """
+    Write the audio as 16-bit mono at target_rate (never upsampling).
+
+    Channels are averaged, the signal is low-pass filtered below the new
+    Nyquist frequency with an FFT convolution, and output samples are linearly
+    interpolated from the filtered signal. Work is done in blocks so memory use
+    does not grow with the length of the recording.
+    """
+    scale = {np.dtype(np.int16): 32768.0, np.dtype(np.int32): 2147483648.0, np.dtype(np.uint8): 128.0}.get(audio.samples.dtype, 1.0)
+    offset = 128.0 if audio.samples.dtype == np.uint8 else 0.0
+    target_rate = min(target_rate, audio.sample_rate)
+    step = audio.sample_rate / target_rate
+    out_frames = int(audio.frames / step)
+    kernel = _lowpass_kernel(0.45 / step, taps) if step > 1 else None
+    half = taps // 2 + 1 if kernel is not None else 1
+
+    with open(output_path, "wb") as f:
+        f.write(wav_header(1, target_rate, out_frames * 2))
+        for first in range(0, out_frames, block_output_frames):
+            positions = np.arange(first, min(first + block_output_frames, out_frames)) * step
+            lo = int(positions[0]) - half
+            hi = int(positions[-1]) + half + 2
+            segment = np.zeros(hi - lo, dtype=np.float32)
+            src_lo, src_hi = max(lo, 0), min(hi, audio.frames)
+            block = np.asarray(audio.samples[src_lo:src_hi], dtype=np.float32)
+            segment[src_lo - lo:src_hi - lo] = (block.mean(axis=1) - offset) / scale
+            if kernel is not None:
+                # Pad so the filtered output stays aligned with segment indices
+                padded = np.concatenate((np.zeros(taps // 2, np.float32), segment, np.zeros(taps // 2, np.float32)))
+                segment = _fft_convolve_valid(padded, kernel)
+            resampled = np.interp(positions - lo, np.arange(segment.size), segment)
+            np.clip(resampled * 32767.0, -32768, 32767).astype("<i2").tofile(f)
+    return read_wav(output_path)
+
+
+async def decode_to_wav(path: Path, output_path: Path) -> bool:
+    """
+    Decode any ffmpeg-readable media to 16-bit PCM WAV.
+    Returns False when ffmpeg is not installed or cannot decode the file.
+    """
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        return False
+    process = await asyncio.create_subprocess_exec(
+        ffmpeg, "-nostdin", "-v", "error", "-y", "-i", str(path),
+        "-vn", "-acodec", "pcm_s16le", "-f", "wav", str(output_path),
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE
+    )
+    await process.communicate()
+    if process.returncode != 0:
+        output_path.unlink(missing_ok=True)
+        return False
+    return True
+
+
+def plan_windows(frames: int, sample_rate: int, window_seconds: float, overlap_seconds: float) -> List[Tuple[int, int]]:
+    """
+    Split [0, frames) into windows of window_seconds that overlap by overlap_seconds
+    """
+    window = max(1, int(window_seconds * sample_rate))
+    overlap = min(int(overlap_seconds * sample_rate), window // 2)
+    if frames <= window:
+        return [(0, frames)]
+
+    windows = []
+    start = 0
+    while True:
+        end = min(start + window, frames)
+        windows.append((start, end))
+        if end == frames:
+            return windows
+        start = end - overlap
+
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def _normalize_word(word: str) -> str:
+    match = _WORD.search(word.lower())
+    return match.group(0) if match else word.lower()
+
+
+def stitch_transcripts(texts: List[str], max_overlap_words: int = 30, min_overlap_words: int = 2) -> str:
+    """
+    Join the transcripts of overlapping windows in order.
+
+    The overlapping audio appears at the end of one transcript and at the start
+    of the next; the longest run of words shared that way is kept only once.
+    """
+    words: List[str] = []
+    for text in texts:
+        next_words = text.split()
+        if not next_words:
+            continue
+        limit = min(max_overlap_words, len(words), len(next_words))
+        tail = [_normalize_word(w) for w in words[-limit:]] if limit else []
+        head = [_normalize_word(w) for w in next_words[:limit]]
+        overlap = 0
+        for k in range(limit, min_overlap_words - 1, -1):
+            if tail[-k:] == head[:k]:
+                overlap = k
+                break
+        words.extend(next_words[overlap:])
+    return " ".join(words)
+
+
+@dataclass
+class TimelineMap:
+    """
+    Maps times on a trimmed timeline back onto the original recording.
+    Span i of the trimmed audio starts at trimmed_starts[i] and corresponds to
+    the original audio from original_starts[i] to original_ends[i].
+    """
+    trimmed_starts: np.ndarray
+    original_starts: np.ndarray
+    original_ends: np.ndarray
+
+    @classmethod
+    def from_spans(cls, spans: List[Tuple[float, float]]) -> "TimelineMap":
+        """
+        Build the mapping from the kept (start, end) spans of the original, in seconds
+        """
+        bounds = np.asarray(spans, dtype=np.float64).reshape(-1, 2)
+        lengths = bounds[:, 1] - bounds[:, 0]
+        trimmed_starts = np.concatenate(([0.0], np.cumsum(lengths)[:-1]))
+        return cls(trimmed_starts=trimmed_starts, original_starts=bounds[:, 0], original_ends=bounds[:, 1])
+
+    def spans(self, decimals: int = 3) -> List[Tuple[float, float]]:
+        """
+        The kept spans of the original in seconds, from which from_spans
+        rebuilds the mapping (this is what gets stored)
+        """
+        return [
+            (round(start, decimals), round(end, decimals))
+            for start, end in zip(self.original_starts.tolist(), self.original_ends.tolist())
+        ]
+
+    def to_original(self, seconds):
+        """
+        Project one time or an array of times (seconds) onto the original timeline
+        """
+        seconds = np.asarray(seconds, dtype=np.float64)
+        index = np.clip(np.searchsorted(self.trimmed_starts, seconds, side="right") - 1, 0, None)
+        return self.original_starts[index] + (seconds - self.trimmed_starts[index])
+
+
+def frame_energy_db(audio: PCMAudio, frame_seconds: float, block_frames: int = 1 << 20) -> np.ndarray:
+    """
+    RMS level of consecutive frames in dBFS, computed block by block so the
+    whole signal is never converted to float at once
+    """
+    frame_len = max(1, int(frame_seconds * audio.sample_rate))
+    block_frames -= block_frames % frame_len
+    scale = {np.dtype(np.int16): 32768.0, np.dtype(np.int32): 2147483648.0, np.dtype(np.uint8): 128.0}.get(audio.samples.dtype, 1.0)
+    offset = 128.0 if audio.samples.dtype == np.uint8 else 0.0
+
+    levels = []
+    for start in range(0, audio.frames - frame_len + 1, block_frames):
+        block = np.asarray(audio.samples[start:start + block_frames], dtype=np.float32)
+        usable = block.shape[0] - block.shape[0] % frame_len
+        mono = (block[:usable].mean(axis=1) - offset) / scale
+        power = np.square(mono).reshape(-1, frame_len).mean(axis=1)
+        levels.append(10.0 * np.log10(power + 1e-12))
+    return np.concatenate(levels) if levels else np.zeros(0, dtype=np.float32)
+
+
+def _fill_short_runs(mask: np.ndarray, value: bool, min_length: int) -> np.ndarray:
+    """
+    Flip interior runs of `value` shorter than min_length frames
+    """
+    edges = np.flatnonzero(np.diff(np.concatenate(([not value], mask == value, [not value])).astype(np.int8)))
+    starts, ends = edges[0::2], edges[1::2]
+    short = (ends - starts) < min_length
+    if not value:
+        # Leading and trailing silence is never filled in
+        short &= (starts > 0) & (ends < mask.size)
+    mask = mask.copy()
+    for start, end in zip(starts[short], ends[short]):
+        mask[start:end] = not value
+    return mask
+
+
+def detect_speech(
+    audio: PCMAudio,
+    frame_seconds: float = 0.03,
+    margin_db: float = 12.0,
+    min_threshold_db: float = -60.0,
+    max_threshold_db: float = -35.0,
+    min_silence_seconds: float = 0.6,
+    min_speech_seconds: float = 0.15,
+    padding_seconds: float = 0.2
+) -> List[Tuple[int, int]]:
+    """
+    Find speech regions as (start, end) sample frames with an energy VAD.
+
+    The threshold sits margin_db above the noise floor (10th percentile of the
+    frame levels), clamped so recordings without pauses are not cut into.
+    Pauses shorter than min_silence_seconds are kept to preserve phrasing.
+    """
+    levels = frame_energy_db(audio, frame_seconds)
+    if levels.size == 0:
+        return [(0, audio.frames)]
+
+    noise_floor = float(np.percentile(levels, 10))
+    threshold = min(max(noise_floor + margin_db, min_threshold_db), max_threshold_db)
+    speech = levels > threshold
+    speech = _fill_short_runs(speech, False, int(round(min_silence_seconds / frame_seconds)))
+    speech = _fill_short_runs(speech, True, int(round(min_speech_seconds / frame_seconds)))
+
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], speech.astype(np.int8), [0]))))
+    frame_len = int(frame_seconds * audio.sample_rate)
+    padding = int(padding_seconds * audio.sample_rate)
+    starts = np.maximum(edges[0::2] * frame_len - padding, 0)
+    ends = np.minimum(edges[1::2] * frame_len + padding, audio.frames)
+
+    # Padding can make neighbouring spans overlap; merge them
+    spans: List[Tuple[int, int]] = []
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        if spans and start <= spans[-1][1]:
+            spans[-1] = (spans[-1][0], max(spans[-1][1], end))
+        else:
+            spans.append((start, end))
+    return spans
+
+
+def write_spans(audio: PCMAudio, spans: List[Tuple[int, int]], output_path: Path) -> TimelineMap:
+    """
+    Write only the speech spans to a 16-bit WAV and return the timeline mapping
+    """
+    kept_frames = sum(end - start for start, end in spans)
+    with open(output_path, "wb") as f:
+        f.write(wav_header(audio.channels, audio.sample_rate, kept_frames * audio.channels * 2))
+        for start, end in spans:
+            np.ascontiguousarray(to_int16(audio.samples[start:end]), dtype="<i2").tofile(f)
+    return TimelineMap.from_spans([(start / audio.sample_rate, end / audio.sample_rate) for start, end in spans])
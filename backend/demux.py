@@ -0,0 +1,502 @@
+"""
+Copy the audio track out of video files without re-encoding.
+
+A video upload is mostly video: a 200MB screen recording may hold only 10MB
+of audio, and the speech model needs nothing else. The audio elementary
+stream is copied byte for byte into a minimal audio-only file:
+
+- MP4/MOV: an M4A whose moov holds only the audio trak, its chunks packed
+  into one mdat and the chunk offsets rewritten
+- AVI: MP3 audio as a plain MP3 stream, PCM audio as WAV
+- WebM/Matroska: Opus or Vorbis audio as a WebM with only the audio track
+
+Video chunks are skipped by seeking past them, so they are never read.
+Other layouts (fragmented MP4, AAC in AVI, ...) are copied with
+`ffmpeg -vn -c:a copy` when ffmpeg is installed.
+"""
+import asyncio
+import shutil
+import struct
+from pathlib import Path
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from media_probe import (
+    MediaInfo, _ebml_elements, _ebml_vint, _mp4_atoms, _mp4_child, _read_moov, _riff_chunks
+)
+
+# Containers that can carry video next to the audio
+VIDEO_CONTAINERS = {"mp4", "mov", "avi", "webm", "matroska"}
+
+# Output suffix for the ffmpeg stream copy, by audio codec
+_COPY_SUFFIXES = {
+    "aac": ".m4a", "alac": ".m4a", "mp3": ".mp3", "opus": ".webm", "vorbis": ".webm", "flac": ".flac",
+}
+
+_COPY_BLOCK_BYTES = 1024 * 1024
+# AVI header lists are small; a larger one means a damaged file
+_MAX_AVI_HEADER_BYTES = 1024 * 1024
+
+
+class DemuxError(ValueError):
+    """
+    The audio track cannot be copied out here (layout, codec or damage)
+    """
+
+
+def _copy_ranges(src: BinaryIO, dst: BinaryIO, ranges: List[Tuple[int, int]]):
+    """
+    Copy (offset, size) byte ranges of src to dst, merging adjacent ones
+    """
+    start = end = None
+    for offset, size in ranges:
+        if offset == end:
+            end += size
+            continue
+        if start is not None:
+            _copy_range(src, dst, start, end - start)
+        start, end = offset, offset + size
+    if start is not None:
+        _copy_range(src, dst, start, end - start)
+
+
+def _copy_range(src: BinaryIO, dst: BinaryIO, offset: int, size: int):
+    src.seek(offset)
+    while size > 0:
+        block = src.read(min(size, _COPY_BLOCK_BYTES))
+        if not block:
+            raise DemuxError("Media data ends early")
+        dst.write(block)
+        size -= len(block)
+
+
+# MP4 / QuickTime
+
+
+def _atom(atom_type: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), atom_type) + payload
+
+
+def _with_child(data: bytes, start: int, end: int, path: Tuple[bytes, ...], payload: bytes) -> bytes:
+    """
+    Children of the container atom data[start:end], with the atom at path given a new payload
+    """
+    children = []
+    for atom_type, atom_start, atom_end in _mp4_atoms(data, start, end):
+        if atom_type == path[0]:
+            body = payload if len(path) == 1 else _with_child(data, atom_start, atom_end, path[1:], payload)
+        else:
+            body = data[atom_start:atom_end]
+        children.append(_atom(atom_type, body))
+    return b"".join(children)
+
+
+def _mp4_chunks(moov: bytes, start: int, end: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    File offset and byte size of every chunk of a track, from its stbl
+    """
+    tables = {atom_type: atom_start for atom_type, atom_start, _ in _mp4_atoms(moov, start, end)}
+    if b"stco" in tables or b"co64" in tables:
+        dtype, table = (">u4", tables[b"stco"]) if b"stco" in tables else (">u8", tables[b"co64"])
+        count, = struct.unpack(">I", moov[table + 4:table + 8])
+        offsets = np.frombuffer(moov, dtype, count, table + 8).astype(np.int64)
+    else:
+        raise DemuxError("Track has no chunk offsets")
+    if b"stsz" not in tables:
+        raise DemuxError("Track has no sample sizes")
+
+    table = tables[b"stsz"]
+    sample_size, sample_count = struct.unpack(">II", moov[table + 4:table + 12])
+    if sample_size:
+        sizes = np.full(sample_count, sample_size, np.int64)
+    else:
+        sizes = np.frombuffer(moov, ">u4", sample_count, table + 12).astype(np.int64)
+
+    # stsc runs: from its first chunk on, every chunk holds the same number of samples
+    table = tables[b"stsc"]
+    entries, = struct.unpack(">I", moov[table + 4:table + 8])
+    stsc = np.frombuffer(moov, ">u4", entries * 3, table + 8).reshape(-1, 3).astype(np.int64)
+    run_lengths = np.diff(np.append(stsc[:, 0] - 1, len(offsets)))
+    samples_per_chunk = np.repeat(stsc[:, 1], run_lengths)
+    if samples_per_chunk.sum() != sample_count:
+        raise DemuxError("Sample tables do not add up")
+
+    sample_ends = np.cumsum(samples_per_chunk)
+    boundaries = np.concatenate(([0], np.cumsum(sizes)))
+    return offsets, boundaries[sample_ends] - boundaries[sample_ends - samples_per_chunk]
+
+
+def _extract_mp4(f: BinaryIO, size: int, output_stem: Path) -> Optional[Path]:
+    moov = _read_moov(f, size)
+    if moov is None:
+        raise DemuxError("No moov atom")
+    audio_trak = None
+    other_traks = 0
+    for atom_type, start, end in _mp4_atoms(moov, 0, len(moov)):
+        if atom_type == b"mvex":
+            raise DemuxError("Fragmented MP4")
+        if atom_type != b"trak":
+            continue
+        hdlr = _mp4_child(moov, start, end, (b"mdia", b"hdlr"))
+        if audio_trak is None and hdlr and moov[hdlr[0] + 8:hdlr[0] + 12] == b"soun":
+            audio_trak = (start, end)
+        else:
+            other_traks += 1
+    if audio_trak is None:
+        raise DemuxError("No audio track")
+    if not other_traks:
+        return None
+    mvhd = _mp4_child(moov, 0, len(moov), (b"mvhd",))
+    stbl = _mp4_child(moov, *audio_trak, (b"mdia", b"minf", b"stbl"))
+    if mvhd is None or stbl is None:
+        raise DemuxError("Incomplete moov atom")
+    offsets, chunk_sizes = _mp4_chunks(moov, *stbl)
+    audio_bytes = int(chunk_sizes.sum())
+
+    offsets_type = b"stco" if audio_bytes + len(moov) < 0xFFFFFFFF - 0x10000 else b"co64"
+    stbl_children = b"".join(
+        _atom(atom_type, moov[start:end]) for atom_type, start, end in _mp4_atoms(moov, *stbl)
+        if atom_type not in (b"stco", b"co64")
+    )
+
+    def header(chunk_offsets: np.ndarray) -> bytes:
+        table = struct.pack(">II", 0, len(chunk_offsets)) + chunk_offsets.astype(
+            ">u4" if offsets_type == b"stco" else ">u8"
+        ).tobytes()
+        trak = _with_child(
+            moov, *audio_trak, (b"mdia", b"minf", b"stbl"), stbl_children + _atom(offsets_type, table)
+        )
+        return (
+            _atom(b"ftyp", b"M4A " + struct.pack(">I", 0) + b"M4A mp42isom")
+            + _atom(b"moov", _atom(b"mvhd", moov[slice(*mvhd)]) + _atom(b"trak", trak))
+        )
+
+    # The offset table has a fixed size, so the header length is known before the offsets
+    mdat_header = (
+        struct.pack(">I4s", 8 + audio_bytes, b"mdat") if audio_bytes + 8 <= 0xFFFFFFFF
+        else struct.pack(">I4sQ", 1, b"mdat", 16 + audio_bytes)
+    )
+    data_start = len(header(offsets)) + len(mdat_header)
+    new_offsets = data_start + np.concatenate(([0], np.cumsum(chunk_sizes)[:-1]))
+
+    output_path = Path(f"{output_stem}.m4a")
+    with open(output_path, "wb") as out:
+        out.write(header(new_offsets))
+        out.write(mdat_header)
+        _copy_ranges(f, out, list(zip(offsets.tolist(), chunk_sizes.tolist())))
+    return output_path
+
+
+# AVI
+
+
+def _avi_chunks(f: BinaryIO, start: int, end: int, chunk_id: bytes) -> Iterator[Tuple[int, int]]:
+    """
+    (offset, size) of the chunk_id chunks in a movi list, including 'rec ' groups
+    """
+    offset = start
+    while offset + 8 <= end:
+        f.seek(offset)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        found_id, size = struct.unpack("<4sI", header)
+        if found_id == b"LIST":
+            yield from _avi_chunks(f, offset + 12, min(offset + 8 + size, end), chunk_id)
+        elif found_id == chunk_id:
+            yield offset + 8, size
+        offset += 8 + size + (size & 1)
+
+
+def _extract_avi(f: BinaryIO, size: int, output_stem: Path) -> Optional[Path]:
+    f.seek(12)
+    list_id, hdrl_size, list_type = struct.unpack("<4sI4s", f.read(12))
+    if list_id != b"LIST" or list_type != b"hdrl" or hdrl_size > _MAX_AVI_HEADER_BYTES:
+        raise DemuxError("No AVI header list")
+    hdrl = f.read(hdrl_size - 4)
+
+    audio_stream = strf = None
+    other_streams = 0
+    stream_number = 0
+    for chunk_id, start, end in _riff_chunks(hdrl, 0, len(hdrl)):
+        if chunk_id != b"LIST" or hdrl[start:start + 4] != b"strl":
+            continue
+        stream = {chunk: (s, e) for chunk, s, e in _riff_chunks(hdrl, start + 4, end)}
+        strh = stream.get(b"strh")
+        if audio_stream is None and strh and hdrl[strh[0]:strh[0] + 4] == b"auds" and b"strf" in stream:
+            audio_stream, strf = stream_number, hdrl[slice(*stream[b"strf"])]
+        else:
+            other_streams += 1
+        stream_number += 1
+    if audio_stream is None:
+        raise DemuxError("No audio stream")
+    if not other_streams:
+        return None
+    format_tag, = struct.unpack("<H", strf[:2])
+    if format_tag not in (0x0001, 0x0055):
+        raise DemuxError(f"AVI audio format 0x{format_tag:04x}")
+
+    # Audio chunks of stream n are 'nnwb', in the movi list of the RIFF AVI
+    # chunk and of every RIFF AVIX chunk that follows it (OpenDML, over 1GB)
+    chunk_id = b"%02dwb" % audio_stream
+    ranges = []
+    offset = 0
+    while offset + 12 <= size:
+        f.seek(offset)
+        riff_id, riff_size = struct.unpack("<4sI", f.read(8))
+        if riff_id != b"RIFF":
+            break
+        riff_end = min(offset + 8 + riff_size, size)
+        for list_offset, list_size in _avi_chunks_of(f, offset + 12, riff_end, b"LIST"):
+            f.seek(list_offset)
+            if f.read(4) == b"movi":
+                ranges.extend(_avi_chunks(f, list_offset + 4, list_offset + list_size, chunk_id))
+        offset = riff_end + (riff_size & 1)
+    audio_bytes = sum(chunk_size for _, chunk_size in ranges)
+
+    output_path = Path(f"{output_stem}.{'wav' if format_tag == 0x0001 else 'mp3'}")
+    with open(output_path, "wb") as out:
+        if format_tag == 0x0001:
+            fmt = strf + b"\x00" * (len(strf) & 1)
+            out.write(b"RIFF" + struct.pack("<I", 4 + 8 + len(fmt) + 8 + audio_bytes) + b"WAVE")
+            out.write(struct.pack("<4sI", b"fmt ", len(strf)) + fmt)
+            out.write(struct.pack("<4sI", b"data", audio_bytes))
+        _copy_ranges(f, out, ranges)
+    return output_path
+
+
+def _avi_chunks_of(f: BinaryIO, start: int, end: int, chunk_id: bytes) -> Iterator[Tuple[int, int]]:
+    """
+    (offset, size) of the chunk_id chunks directly inside [start, end)
+    """
+    offset = start
+    while offset + 8 <= end:
+        f.seek(offset)
+        found_id, size = struct.unpack("<4sI", f.read(8))
+        if found_id == chunk_id:
+            yield offset + 8, min(size, end - offset - 8)
+        offset += 8 + size + (size & 1)
+
+
+# Matroska / WebM
+
+_EBML_HEADER = 0x1A45DFA3
+_MKV_SEGMENT = 0x18538067
+_MKV_INFO = 0x1549A966
+_MKV_TRACKS = 0x1654AE6B
+_MKV_TRACK_ENTRY = 0xAE
+_MKV_TRACK_NUMBER = 0xD7
+_MKV_TRACK_TYPE = 0x83
+_MKV_CODEC_ID = 0x86
+_MKV_CLUSTER = 0x1F43B675
+_MKV_TIMECODE = 0xE7
+_MKV_SIMPLE_BLOCK = 0xA3
+_MKV_BLOCK_GROUP = 0xA0
+_MKV_BLOCK = 0xA1
+# Top-level elements of a Segment; one of these ends a Cluster of unknown size
+_MKV_SEGMENT_CHILDREN = {
+    _MKV_CLUSTER, _MKV_INFO, _MKV_TRACKS, 0x114D9B74, 0x1C53BB6B, 0x1254C367, 0x1043A770, 0x1941A469,
+}
+_WEBM_AUDIO_CODECS = {"A_OPUS", "A_VORBIS"}
+_UNKNOWN_SIZE = b"\x01\xff\xff\xff\xff\xff\xff\xff"
+
+
+def _ebml(element_id: int, payload: bytes) -> bytes:
+    return element_id.to_bytes((element_id.bit_length() + 7) // 8, "big") + (len(payload) | 1 << 56).to_bytes(8, "big") + payload
+
+
+_WEBM_HEADER = _ebml(_EBML_HEADER, b"".join([
+    _ebml(0x4286, b"\x01"),  # EBMLVersion
+    _ebml(0x42F7, b"\x01"),  # EBMLReadVersion
+    _ebml(0x42F2, b"\x04"),  # EBMLMaxIDLength
+    _ebml(0x42F3, b"\x08"),  # EBMLMaxSizeLength
+    _ebml(0x4282, b"webm"),  # DocType
+    _ebml(0x4287, b"\x04"),  # DocTypeVersion
+    _ebml(0x4285, b"\x02"),  # DocTypeReadVersion
+]))
+
+
+def _ebml_header(f: BinaryIO, offset: int) -> Tuple[int, Optional[int], int]:
+    """
+    Element id, payload size (None if unknown) and payload offset of the element at offset
+    """
+    f.seek(offset)
+    data = f.read(12)
+    element_id, id_length = _ebml_vint(data, 0, keep_marker=True)
+    size, size_length = _ebml_vint(data, id_length)
+    if size == (1 << (7 * size_length)) - 1:
+        size = None
+    return element_id, size, offset + id_length + size_length
+
+
+def _read_element(f: BinaryIO, offset: int, end: int) -> bytes:
+    f.seek(offset)
+    return f.read(end - offset)
+
+
+def _extract_matroska(f: BinaryIO, size: int, output_stem: Path) -> Optional[Path]:
+    element_id, header_size, body = _ebml_header(f, 0)
+    if element_id != _EBML_HEADER or header_size is None:
+        raise DemuxError("No EBML header")
+    element_id, segment_size, offset = _ebml_header(f, body + header_size)
+    if element_id != _MKV_SEGMENT:
+        raise DemuxError("No Segment")
+    segment_end = size if segment_size is None else min(offset + segment_size, size)
+
+    # Info and Tracks come before the first Cluster
+    info = audio_entry = None
+    audio_track = None
+    other_tracks = 0
+    while offset < segment_end:
+        element_id, element_size, body = _ebml_header(f, offset)
+        if element_id == _MKV_CLUSTER:
+            break
+        if element_size is None:
+            raise DemuxError("Element of unknown size before the first Cluster")
+        if element_id == _MKV_INFO:
+            info = _read_element(f, offset, body + element_size)
+        elif element_id == _MKV_TRACKS:
+            tracks = _read_element(f, body, body + element_size)
+            for entry_id, entry_start, entry_end in _ebml_elements(tracks, 0, len(tracks)):
+                if entry_id != _MKV_TRACK_ENTRY:
+                    continue
+                fields = {field_id: tracks[s:e] for field_id, s, e in _ebml_elements(tracks, entry_start, entry_end)}
+                if audio_entry is None and int.from_bytes(fields.get(_MKV_TRACK_TYPE, b""), "big") == 2:
+                    codec_id = fields.get(_MKV_CODEC_ID, b"").decode("ascii", "replace").rstrip("\0")
+                    if codec_id not in _WEBM_AUDIO_CODECS:
+                        raise DemuxError(f"Matroska audio codec {codec_id}")
+                    audio_track = int.from_bytes(fields[_MKV_TRACK_NUMBER], "big")
+                    audio_entry = _ebml(_MKV_TRACK_ENTRY, tracks[entry_start:entry_end])
+                else:
+                    other_tracks += 1
+        offset = body + element_size
+    if info is None or audio_entry is None:
+        raise DemuxError("No audio track")
+    if not other_tracks:
+        return None
+
+    output_path = Path(f"{output_stem}.webm")
+    with open(output_path, "wb") as out:
+        out.write(_WEBM_HEADER)
+        out.write(_MKV_SEGMENT.to_bytes(4, "big") + _UNKNOWN_SIZE)
+        out.write(info)
+        out.write(_ebml(_MKV_TRACKS, audio_entry))
+        while offset < segment_end:
+            element_id, element_size, body = _ebml_header(f, offset)
+            if element_id == _MKV_CLUSTER:
+                offset = _copy_cluster(f, out, body, element_size, segment_end, audio_track)
+            elif element_size is None:
+                raise DemuxError("Element of unknown size")
+            else:
+                # Cues, Tags, SeekHead and the like point into the old layout
+                offset = body + element_size
+    return output_path
+
+
+def _copy_cluster(
+    f: BinaryIO, out: BinaryIO, body: int, size: Optional[int], segment_end: int, track: int
+) -> int:
+    """
+    Write the cluster with only the blocks of track; returns where the input cluster ends
+    """
+    end = segment_end if size is None else min(body + size, segment_end)
+    kept = []
+    has_blocks = False
+    offset = body
+    while offset < end:
+        element_id, element_size, child_body = _ebml_header(f, offset)
+        if size is None and element_id in _MKV_SEGMENT_CHILDREN:
+            break
+        if element_size is None:
+            raise DemuxError("Cluster element of unknown size")
+        child_end = child_body + element_size
+        if element_id == _MKV_TIMECODE:
+            kept.append(_read_element(f, offset, child_end))
+        elif element_id == _MKV_SIMPLE_BLOCK:
+            # The track number leads the block; other tracks' blocks are never read
+            f.seek(child_body)
+            if _ebml_vint(f.read(8), 0)[0] == track:
+                kept.append(_read_element(f, offset, child_end))
+                has_blocks = True
+        elif element_id == _MKV_BLOCK_GROUP:
+            group = _read_element(f, offset, child_end)
+            for group_id, start, _ in _ebml_elements(group, child_body - offset, len(group)):
+                if group_id == _MKV_BLOCK and _ebml_vint(group, start)[0] == track:
+                    kept.append(group)
+                    has_blocks = True
+        offset = child_end
+    if has_blocks:
+        out.write(_ebml(_MKV_CLUSTER, b"".join(kept)))
+    return offset
+
+
+_EXTRACTORS = {
+    "mp4": _extract_mp4,
+    "mov": _extract_mp4,
+    "avi": _extract_avi,
+    "webm": _extract_matroska,
+    "matroska": _extract_matroska,
+}
+
+
+def extract_audio(path: Path, output_stem: Path, container: str) -> Optional[Path]:
+    """
+    Copy the audio track of a video file to output_stem plus the suffix of
+    its format. Returns None when the file has no other tracks to drop and
+    raises DemuxError for layouts and codecs not handled here.
+    """
+    extractor = _EXTRACTORS.get(container)
+    if extractor is None:
+        raise DemuxError(f"Container {container}")
+    with open(path, "rb") as f:
+        size = f.seek(0, 2)
+        try:
+            output_path = extractor(f, size, output_stem)
+        except Exception as e:
+            for suffix in (".m4a", ".mp3", ".wav", ".webm"):
+                Path(f"{output_stem}{suffix}").unlink(missing_ok=True)
+            if isinstance(e, DemuxError) or not isinstance(e, (struct.error, ValueError, IndexError, KeyError)):
+                raise
+            raise DemuxError(f"Damaged {container} file") from e
+    return output_path
+
+
+async def copy_audio_stream(path: Path, output_path: Path) -> bool:
+    """
+    Copy the first audio stream into output_path (its suffix picks the
+    container) with ffmpeg, without re-encoding.
+    Returns False when ffmpeg is not installed or cannot copy the stream.
+    """
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        return False
+    process = await asyncio.create_subprocess_exec(
+        ffmpeg, "-nostdin", "-v", "error", "-y", "-i", str(path),
+        "-vn", "-map", "0:a:0", "-c:a", "copy", str(output_path),
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE
+    )
+    await process.communicate()
+    if process.returncode != 0:
+        output_path.unlink(missing_ok=True)
+        return False
+    return True
+
+
+async def demux_audio(path: Path, output_stem: Path, info: MediaInfo) -> Optional[Path]:
+    """
+    extract_audio() off the event loop, with an ffmpeg stream copy for what
+    it does not handle. None when there is nothing to drop or no way to copy
+    the audio out.
+    """
+    try:
+        return await asyncio.to_thread(extract_audio, path, output_stem, info.container)
+    except DemuxError:
+        pass
+    codec = info.codec or ""
+    suffix = ".wav" if codec.startswith("pcm") else _COPY_SUFFIXES.get(codec)
+    if suffix is None:
+        return None
+    output_path = Path(f"{output_stem}{suffix}")
+    return output_path if await copy_audio_stream(path, output_path) else None
@@ -0,0 +1,443 @@
+"""
+Recognise media files and read their properties from the container headers.
+
+Uploads are checked against the formats the service accepts before their
+body is stored, so a misnamed binary is turned away after a few kilobytes
+instead of after the whole upload.
+
+probe_media() reads duration, codec, sample rate and channels without
+decoding any audio: a few small reads at known offsets (WAV chunks, the
+first MP3 frame and its Xing/VBRI header, the MP4/MOV moov atom, FLAC
+STREAMINFO, the Matroska/WebM Info and Tracks elements, the AVI hdrl list),
+so it takes well under a millisecond whatever the file size.
+"""
+import os
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, Iterator, Optional, Tuple
+
+SUPPORTED_CONTENT_TYPES = {
+    "audio/mpeg", "audio/wav", "audio/x-wav", "audio/mp4", "audio/m4a",
+    "video/mp4", "video/mpeg", "video/quicktime", "video/x-msvideo",
+    "audio/flac", "audio/webm", "video/webm", "audio/mp3"
+}
+SUPPORTED_EXTENSIONS = {".mp3", ".wav", ".m4a", ".mp4", ".mov", ".avi", ".flac", ".webm"}
+
+# Bytes of a file needed to recognise every supported container
+SNIFF_BYTES = 4096
+
+# Top-level atoms an MP4/QuickTime file may start with
+_MP4_ATOMS = {b"ftyp", b"moov", b"mdat", b"free", b"skip", b"wide", b"pnot"}
+
+
+def is_supported_type(filename: Optional[str], content_type: Optional[str]) -> bool:
+    """
+    True if the content type or, failing that, the extension is supported
+    """
+    return content_type in SUPPORTED_CONTENT_TYPES or Path(filename or "").suffix.lower() in SUPPORTED_EXTENSIONS
+
+
+def _is_mpeg_audio_frame(head: bytes) -> bool:
+    # 11 sync bits, then a valid version, layer, bitrate and sample rate
+    if len(head) < 4 or head[0] != 0xFF or head[1] & 0xE0 != 0xE0:
+        return False
+    version, layer = (head[1] >> 3) & 0x3, (head[1] >> 1) & 0x3
+    bitrate, sample_rate = head[2] >> 4, (head[2] >> 2) & 0x3
+    return version != 1 and layer != 0 and bitrate not in (0, 0xF) and sample_rate != 3
+
+
+def sniff_container(head: bytes) -> Optional[str]:
+    """
+    Container format of a file from its first bytes (SNIFF_BYTES is always
+    enough): wav, avi, mp3, mp4, flac, webm or mpeg. None if unrecognised.
+    """
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        return "wav"
+    if head[:4] == b"RIFF" and head[8:12] == b"AVI ":
+        return "avi"
+    if head[:4] == b"fLaC":
+        return "flac"
+    if head[:4] == b"\x1a\x45\xdf\xa3":
+        return "webm"  # Matroska, which WebM is a profile of
+    if head[4:8] in _MP4_ATOMS:
+        return "mp4"
+    if head[:3] == b"ID3" or _is_mpeg_audio_frame(head):
+        return "mp3"
+    if head[:4] in (b"\x00\x00\x01\xba", b"\x00\x00\x01\xb3") or (
+        len(head) > 188 and head[0] == 0x47 and head[188] == 0x47
+    ):
+        return "mpeg"  # program or transport stream
+    return None
+
+
+# Probing
+
+
+@dataclass
+class MediaInfo:
+    container: str
+    codec: Optional[str] = None
+    duration: Optional[float] = None  # seconds
+    sample_rate: Optional[int] = None
+    channels: Optional[int] = None
+
+
+# MP4 sample descriptions and WAV format tags of common audio codecs
+_MP4_CODECS = {
+    b"mp4a": "aac", b"alac": "alac", b"Opus": "opus", b"fLaC": "flac", b".mp3": "mp3",
+    b"ac-3": "ac3", b"ec-3": "eac3", b"samr": "amr_nb", b"sawb": "amr_wb",
+    b"sowt": "pcm_s16le", b"twos": "pcm_s16be", b"lpcm": "pcm", b"ulaw": "mulaw", b"alaw": "alaw",
+}
+_WAV_CODECS = {0x0001: "pcm", 0x0003: "pcm_float", 0x0006: "alaw", 0x0007: "mulaw", 0x0055: "mp3", 0x00FF: "aac"}
+
+# Matroska element ids
+_EBML_DOCTYPE = 0x4282
+_MKV_SEGMENT = 0x18538067
+_MKV_CLUSTER = 0x1F43B675
+_MKV_INFO = 0x1549A966
+_MKV_TIMECODE_SCALE = 0x2AD7B1
+_MKV_DURATION = 0x4489
+_MKV_TRACKS = 0x1654AE6B
+_MKV_TRACK_ENTRY = 0xAE
+_MKV_TRACK_TYPE = 0x83
+_MKV_CODEC_ID = 0x86
+_MKV_AUDIO = 0xE1
+_MKV_SAMPLING_FREQUENCY = 0xB5
+_MKV_CHANNELS = 0x9F
+
+# Most bytes read for a header list: Matroska Info and Tracks, which come
+# before the first Cluster, or the AVI hdrl list
+_HEADER_LIST_BYTES = 64 * 1024
+# A larger moov means a damaged file; real ones are a few MB at most for hours of audio
+_MAX_MOOV_BYTES = 64 * 1024 * 1024
+
+# MPEG audio bitrates in kbps by (MPEG-1, layer) and sample rates by version bits
+_MP3_BITRATES = {
+    (True, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_MP3_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+
+def _probe_wav(f: BinaryIO, head: bytes, size: int) -> MediaInfo:
+    info = MediaInfo("wav")
+    byte_rate = 0
+    offset = 12
+    while offset + 8 <= size:
+        f.seek(offset)
+        chunk_id, chunk_size = struct.unpack("<4sI", f.read(8))
+        if chunk_id == b"fmt ":
+            fmt = f.read(min(chunk_size, 40))
+            format_tag, info.channels, info.sample_rate, byte_rate, _, bits = struct.unpack("<HHIIHH", fmt[:16])
+            if format_tag == 0xFFFE and len(fmt) >= 26:
+                format_tag = struct.unpack("<H", fmt[24:26])[0]
+            info.codec = _WAV_CODECS.get(format_tag, f"wav_0x{format_tag:04x}")
+            if info.codec == "pcm":
+                info.codec = "pcm_u8" if bits == 8 else f"pcm_s{bits}le"
+            elif info.codec == "pcm_float":
+                info.codec = f"pcm_f{bits}le"
+        elif chunk_id == b"data":
+            # Streaming writers leave the size unset; trust the file size instead
+            available = size - offset - 8
+            data_size = chunk_size if 0 < chunk_size <= available else available
+            if byte_rate:
+                info.duration = data_size / byte_rate
+            break
+        offset += 8 + chunk_size + (chunk_size & 1)
+    return info
+
+
+def _probe_avi(f: BinaryIO, head: bytes, size: int) -> MediaInfo:
+    info = MediaInfo("avi")
+    if head[12:16] != b"LIST" or head[20:24] != b"hdrl":
+        return info
+    f.seek(24)
+    hdrl = f.read(min(struct.unpack("<I", head[16:20])[0] - 4, _HEADER_LIST_BYTES))
+    for chunk_id, start, end in _riff_chunks(hdrl, 0, len(hdrl)):
+        if chunk_id == b"avih":
+            microseconds_per_frame, = struct.unpack("<I", hdrl[start:start + 4])
+            total_frames, = struct.unpack("<I", hdrl[start + 16:start + 20])
+            info.duration = microseconds_per_frame * total_frames / 1e6 or None
+        elif chunk_id == b"LIST" and hdrl[start:start + 4] == b"strl":
+            stream = {chunk: (s, e) for chunk, s, e in _riff_chunks(hdrl, start + 4, end)}
+            if b"strh" in stream and hdrl[stream[b"strh"][0]:stream[b"strh"][0] + 4] == b"auds":
+                strf = stream.get(b"strf")
+                if strf and info.codec is None:
+                    format_tag, info.channels, info.sample_rate = struct.unpack("<HHI", hdrl[strf[0]:strf[0] + 8])
+                    info.codec = _WAV_CODECS.get(format_tag, f"wav_0x{format_tag:04x}")
+    return info
+
+
+def _riff_chunks(data: bytes, start: int, end: int) -> Iterator[Tuple[bytes, int, int]]:
+    offset = start
+    while offset + 8 <= end:
+        chunk_id, chunk_size = struct.unpack("<4sI", data[offset:offset + 8])
+        yield chunk_id, offset + 8, min(offset + 8 + chunk_size, end)
+        offset += 8 + chunk_size + (chunk_size & 1)
+
+
+def _probe_mp3(f: BinaryIO, head: bytes, size: int) -> MediaInfo:
+    info = MediaInfo("mp3")
+    start = 0
+    if head[:3] == b"ID3":
+        # Syncsafe size (7 bits per byte), plus the footer if there is one
+        tag_size = (head[6] << 21) | (head[7] << 14) | (head[8] << 7) | head[9]
+        start = 10 + tag_size + (10 if head[5] & 0x10 else 0)
+    f.seek(start)
+    data = f.read(SNIFF_BYTES)
+
+    index = data.find(b"\xff")
+    while 0 <= index and not _is_mpeg_audio_frame(data[index:index + 4]):
+        index = data.find(b"\xff", index + 1)
+    if index < 0:
+        return info
+    frame = data[index:index + 4]
+    version, layer = (frame[1] >> 3) & 0x3, 4 - ((frame[1] >> 1) & 0x3)
+    mpeg1 = version == 3
+    info.codec = {1: "mp1", 2: "mp2", 3: "mp3"}[layer]
+    info.sample_rate = _MP3_SAMPLE_RATES[version][(frame[2] >> 2) & 0x3]
+    info.channels = 1 if frame[3] >> 6 == 3 else 2
+    samples_per_frame = 384 if layer == 1 else 1152 if mpeg1 or layer == 2 else 576
+
+    # VBR files announce their frame count in a Xing/Info or VBRI header in the first frame
+    side_info = (17 if info.channels == 1 else 32) if mpeg1 else (9 if info.channels == 1 else 17)
+    xing = index + 4 + side_info
+    frames = None
+    if data[xing:xing + 4] in (b"Xing", b"Info") and struct.unpack(">I", data[xing + 4:xing + 8])[0] & 1:
+        frames, = struct.unpack(">I", data[xing + 8:xing + 12])
+    elif data[index + 36:index + 40] == b"VBRI":
+        frames, = struct.unpack(">I", data[index + 50:index + 54])
+    if frames:
+        info.duration = frames * samples_per_frame / info.sample_rate
+        return info
+
+    # Constant bitrate: the audio bytes divided by the bitrate
+    audio_bytes = size - start - index
+    f.seek(max(size - 128, 0))
+    if f.read(3) == b"TAG":
+        audio_bytes -= 128
+    bitrate = _MP3_BITRATES[(mpeg1, layer)][frame[2] >> 4]
+    info.duration = audio_bytes * 8 / (bitrate * 1000)
+    return info
+
+
+def _mp4_atoms(data: bytes, start: int, end: int) -> Iterator[Tuple[bytes, int, int]]:
+    offset = start
+    while offset + 8 <= end:
+        atom_size, atom_type = struct.unpack(">I4s", data[offset:offset + 8])
+        header = 8
+        if atom_size == 1:
+            atom_size, = struct.unpack(">Q", data[offset + 8:offset + 16])
+            header = 16
+        elif atom_size == 0:
+            atom_size = end - offset
+        if atom_size < header:
+            return
+        yield atom_type, offset + header, min(offset + atom_size, end)
+        offset += atom_size
+
+
+def _mp4_child(data: bytes, start: int, end: int, path: Tuple[bytes, ...]) -> Optional[Tuple[int, int]]:
+    for atom_type, atom_start, atom_end in _mp4_atoms(data, start, end):
+        if atom_type == path[0]:
+            return (atom_start, atom_end) if len(path) == 1 else _mp4_child(data, atom_start, atom_end, path[1:])
+    return None
+
+
+def _mp4_duration(data: bytes, start: int) -> Optional[float]:
+    # mvhd and mdhd: version 1 has 64-bit times and duration
+    if data[start] == 1:
+        timescale, duration = struct.unpack(">IQ", data[start + 20:start + 32])
+    else:
+        timescale, duration = struct.unpack(">II", data[start + 12:start + 20])
+    return duration / timescale if timescale else None
+
+
+def _read_moov(f: BinaryIO, size: int) -> Optional[bytes]:
+    """
+    Payload of the moov atom, found by walking the top-level atom headers;
+    moov often follows a huge mdat
+    """
+    offset = 0
+    while offset + 8 <= size:
+        f.seek(offset)
+        header = f.read(16)
+        atom_size, atom_type = struct.unpack(">I4s", header[:8])
+        header_size = 8
+        if atom_size == 1:
+            atom_size, = struct.unpack(">Q", header[8:16])
+            header_size = 16
+        elif atom_size == 0:
+            atom_size = size - offset
+        if atom_size < header_size:
+            return None
+        if atom_type == b"moov":
+            if atom_size > _MAX_MOOV_BYTES:
+                return None
+            return f.read(atom_size - header_size) if header_size == 16 else header[8:] + f.read(atom_size - 16)
+        offset += atom_size
+    return None
+
+
+def _probe_mp4(f: BinaryIO, head: bytes, size: int) -> MediaInfo:
+    info = MediaInfo("mov" if head[4:8] == b"ftyp" and head[8:12] == b"qt  " else "mp4")
+    moov = _read_moov(f, size)
+    if moov is not None:
+        _parse_moov(moov, info)
+    return info
+
+
+def _parse_moov(moov: bytes, info: MediaInfo):
+    for atom_type, start, end in _mp4_atoms(moov, 0, len(moov)):
+        if atom_type == b"mvhd":
+            info.duration = _mp4_duration(moov, start)
+        elif atom_type == b"trak" and info.codec is None:
+            mdia = _mp4_child(moov, start, end, (b"mdia",))
+            hdlr = mdia and _mp4_child(moov, mdia[0], mdia[1], (b"hdlr",))
+            if not hdlr or moov[hdlr[0] + 8:hdlr[0] + 12] != b"soun":
+                continue
+            stsd = _mp4_child(moov, mdia[0], mdia[1], (b"minf", b"stbl", b"stsd"))
+            if stsd:
+                # First sample description: size, format, then the audio sample entry
+                entry = stsd[0] + 8
+                fourcc = moov[entry + 4:entry + 8]
+                info.codec = _MP4_CODECS.get(fourcc, fourcc.decode("latin-1").strip())
+                info.channels, = struct.unpack(">H", moov[entry + 24:entry + 26])
+                info.sample_rate = struct.unpack(">I", moov[entry + 32:entry + 36])[0] >> 16
+            mdhd = _mp4_child(moov, mdia[0], mdia[1], (b"mdhd",))
+            if mdhd and info.duration is None:
+                info.duration = _mp4_duration(moov, mdhd[0])
+
+
+def _probe_flac(f: BinaryIO, head: bytes, size: int) -> MediaInfo:
+    info = MediaInfo("flac", codec="flac")
+    # STREAMINFO is always the first metadata block
+    if head[4] & 0x7F != 0 or len(head) < 42:
+        return info
+    streaminfo = head[8:42]
+    info.sample_rate = int.from_bytes(streaminfo[10:13], "big") >> 4
+    info.channels = ((streaminfo[12] >> 1) & 0x7) + 1
+    total_samples = int.from_bytes(streaminfo[13:18], "big") & 0xFFFFFFFFF
+    if total_samples and info.sample_rate:
+        info.duration = total_samples / info.sample_rate
+    return info
+
+
+def _ebml_vint(data: bytes, pos: int, keep_marker: bool = False) -> Tuple[int, int]:
+    """
+    Variable-length integer at pos: (value, length). Element ids keep their length marker.
+    """
+    first = data[pos]
+    if not first:
+        raise ValueError("Invalid EBML variable-length integer")
+    length = 9 - first.bit_length()
+    value = first if keep_marker else first & (0xFF >> length)
+    for byte in data[pos + 1:pos + length]:
+        value = (value << 8) | byte
+    return value, length
+
+
+def _ebml_elements(data: bytes, start: int, end: int) -> Iterator[Tuple[int, int, int]]:
+    pos = start
+    while pos < end:
+        element_id, id_length = _ebml_vint(data, pos, keep_marker=True)
+        size, size_length = _ebml_vint(data, pos + id_length)
+        body = pos + id_length + size_length
+        # Unknown sizes (all ones) run to the end of the parent
+        if size == (1 << (7 * size_length)) - 1:
+            size = end - body
+        yield element_id, body, min(body + size, end)
+        pos = body + size
+
+
+def _ebml_uint(data: bytes, start: int, end: int) -> int:
+    return int.from_bytes(data[start:end], "big")
+
+
+def _ebml_float(data: bytes, start: int, end: int) -> float:
+    return struct.unpack(">f" if end - start == 4 else ">d", data[start:end])[0]
+
+
+def _probe_matroska(f: BinaryIO, head: bytes, size: int) -> MediaInfo:
+    f.seek(0)
+    data = f.read(_HEADER_LIST_BYTES)
+    info = MediaInfo("webm")
+    timecode_scale = 1_000_000  # nanoseconds per tick
+    duration = None
+    for element_id, start, end in _ebml_elements(data, 0, len(data)):
+        if element_id == 0x1A45DFA3:  # EBML header
+            for child_id, child_start, child_end in _ebml_elements(data, start, end):
+                if child_id == _EBML_DOCTYPE:
+                    info.container = data[child_start:child_end].decode("ascii", "replace").rstrip("\0")
+            continue
+        if element_id != _MKV_SEGMENT:
+            continue
+        for child_id, child_start, child_end in _ebml_elements(data, start, end):
+            if child_id == _MKV_CLUSTER:
+                break
+            if child_id == _MKV_INFO:
+                for field_id, field_start, field_end in _ebml_elements(data, child_start, child_end):
+                    if field_id == _MKV_TIMECODE_SCALE:
+                        timecode_scale = _ebml_uint(data, field_start, field_end)
+                    elif field_id == _MKV_DURATION:
+                        duration = _ebml_float(data, field_start, field_end)
+            elif child_id == _MKV_TRACKS:
+                for entry_id, entry_start, entry_end in _ebml_elements(data, child_start, child_end):
+                    if entry_id == _MKV_TRACK_ENTRY and info.codec is None:
+                        _parse_matroska_track(data, entry_start, entry_end, info)
+        break
+    if duration:
+        # MediaRecorder output has no Duration until it is remuxed
+        info.duration = duration * timecode_scale / 1e9
+    return info
+
+
+def _parse_matroska_track(data: bytes, start: int, end: int, info: MediaInfo):
+    fields = {element_id: (s, e) for element_id, s, e in _ebml_elements(data, start, end)}
+    if _MKV_TRACK_TYPE not in fields or _ebml_uint(data, *fields[_MKV_TRACK_TYPE]) != 2:
+        return  # not audio
+    if _MKV_CODEC_ID in fields:
+        codec_id = data[slice(*fields[_MKV_CODEC_ID])].decode("ascii", "replace").rstrip("\0")
+        info.codec = codec_id[2:].lower() if codec_id.startswith("A_") else codec_id
+    if _MKV_AUDIO in fields:
+        for element_id, s, e in _ebml_elements(data, *fields[_MKV_AUDIO]):
+            if element_id == _MKV_SAMPLING_FREQUENCY:
+                info.sample_rate = int(_ebml_float(data, s, e))
+            elif element_id == _MKV_CHANNELS:
+                info.channels = _ebml_uint(data, s, e)
+
+
+_PROBERS: Dict[str, Callable[[BinaryIO, bytes, int], MediaInfo]] = {
+    "wav": _probe_wav,
+    "avi": _probe_avi,
+    "mp3": _probe_mp3,
+    "mp4": _probe_mp4,
+    "flac": _probe_flac,
+    "webm": _probe_matroska,
+}
+
+
+def probe_media(path: Path) -> Optional[MediaInfo]:
+    """
+    Container, codec, duration, sample rate and channels of a media file,
+    from its headers alone. Fields the headers do not give are None; the
+    result is None for files that are not a supported format.
+    """
+    with open(path, "rb") as f:
+        head = f.read(SNIFF_BYTES)
+        container = sniff_container(head)
+        if container is None:
+            return None
+        prober = _PROBERS.get(container)
+        if prober is None:
+            return MediaInfo(container)
+        try:
+            return prober(f, head, os.fstat(f.fileno()).st_size)
+        except (struct.error, ValueError, IndexError, KeyError):
+            # Damaged or truncated headers
+            return MediaInfo(container)
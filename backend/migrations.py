@@ -0,0 +1,274 @@
+"""
+Index management and schema migrations for the MongoDB collections.
+
+server.py runs migrate() at startup. It can also be run by hand:
+
+    python migrations.py           # create missing indexes, apply pending migrations
+    python migrations.py --check   # report missing indexes and slow query plans
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Set, Tuple
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+
+from search import TEXT_SEARCH_LANGUAGES
+
+logger = logging.getLogger(__name__)
+
+# Every query the API runs should be served by one of these
+INDEXES: Dict[str, List[IndexModel]] = {
+    "transcriptions": [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+        IndexModel([("timestamp", DESCENDING), ("id", DESCENDING)], name="timestamp_id_desc"),
+        IndexModel([("content_hash", ASCENDING)], name="content_hash"),
+        # Text searches always name one language, so it leads the index
+        IndexModel(
+            [("search_language", ASCENDING), ("text", TEXT)],
+            name="text_search", default_language="none", language_override="search_language"
+        ),
+        IndexModel([("search_language", ASCENDING)], name="search_language"),
+    ],
+    "summaries": [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+        IndexModel([("transcription_id", ASCENDING), ("timestamp", DESCENDING)], name="transcription_timestamp"),
+        IndexModel(
+            [("transcription_id", ASCENDING), ("language", ASCENDING), ("prompt_version", ASCENDING), ("timestamp", DESCENDING)],
+            name="summary_cache_key"
+        ),
+        IndexModel(
+            [("search_language", ASCENDING), ("summary", TEXT)],
+            name="text_search", default_language="none", language_override="search_language"
+        ),
+        IndexModel([("search_language", ASCENDING)], name="search_language"),
+    ],
+    "transcription_cache": [
+        IndexModel(
+            [("content_hash", ASCENDING), ("language", ASCENDING), ("trim_silence", ASCENDING), ("model", ASCENDING)],
+            unique=True, name="cache_key_unique"
+        ),
+        IndexModel([("transcription_id", ASCENDING)], name="transcription_id"),
+    ],
+    "transcription_jobs": [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+        IndexModel([("state", ASCENDING), ("created_at", ASCENDING)], name="state_created_at"),
+        IndexModel([("created_at", DESCENDING)], name="created_at_desc"),
+    ],
+    "upload_sessions": [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at"),
+    ],
+}
+
+# Representative queries checked with explain() by --check: (collection, filter, sort)
+QUERY_PLANS: List[Tuple[str, dict, List[Tuple[str, int]]]] = [
+    ("transcriptions", {"id": "x"}, []),
+    ("transcriptions", {}, [("timestamp", DESCENDING), ("id", DESCENDING)]),
+    ("transcriptions", {"$or": [{"timestamp": {"$lt": datetime(2000, 1, 1)}}, {"timestamp": datetime(2000, 1, 1), "id": {"$lt": "x"}}]},
+     [("timestamp", DESCENDING), ("id", DESCENDING)]),
+    ("transcriptions", {"$text": {"$search": "x", "$language": "english"}, "search_language": "english"}, []),
+    ("summaries", {"transcription_id": "x"}, [("timestamp", DESCENDING)]),
+    ("summaries", {"transcription_id": "x", "language": "en", "prompt_version": "x"}, [("timestamp", DESCENDING)]),
+    ("summaries", {"$text": {"$search": "x", "$language": "english"}, "search_language": "english"}, []),
+    ("transcription_cache", {"content_hash": "x", "language": "auto", "trim_silence": False, "model": "whisper-1"}, []),
+    ("transcription_cache", {"transcription_id": "x"}, []),
+    ("transcription_jobs", {"id": "x"}, []),
+    ("transcription_jobs", {"state": "queued"}, [("created_at", ASCENDING)]),
+    ("transcription_jobs", {}, [("created_at", DESCENDING)]),
+    ("upload_sessions", {"id": "x"}, []),
+    ("upload_sessions", {"expires_at": {"$lt": datetime(2000, 1, 1)}}, []),
+]
+
+# Data migrations, applied once each in order: (version, description, step)
+Migration = Tuple[int, str, Callable[[AsyncIOMotorDatabase], Awaitable[None]]]
+
+
+async def _initial_schema(db: AsyncIOMotorDatabase):
+    # Indexes are handled by ensure_indexes(); nothing to convert yet
+    pass
+
+
+async def _drop_timestamp_index(db: AsyncIOMotorDatabase):
+    # Superseded by timestamp_id_desc, which also serves keyset pagination
+    indexes = await db.transcriptions.index_information()
+    if "timestamp_desc" in indexes:
+        await db.transcriptions.drop_index("timestamp_desc")
+
+
+async def _backfill_search_language(db: AsyncIOMotorDatabase):
+    # Text indexes stem each document in its search_language
+    for collection in (db.transcriptions, db.summaries):
+        for code, language in TEXT_SEARCH_LANGUAGES.items():
+            await collection.update_many(
+                {"language": code, "search_language": {"$exists": False}},
+                {"$set": {"search_language": language}}
+            )
+        await collection.update_many({"search_language": {"$exists": False}}, {"$set": {"search_language": "none"}})
+
+
+async def _backfill_requested_language(db: AsyncIOMotorDatabase):
+    # language held the requested language, "auto" included, until detection was added
+    for code in await db.transcriptions.distinct("language", {"requested_language": {"$exists": False}}):
+        await db.transcriptions.update_many(
+            {"language": code, "requested_language": {"$exists": False}},
+            {"$set": {"requested_language": code}}
+        )
+
+
+async def _cache_key_trim_silence(db: AsyncIOMotorDatabase):
+    # Entries made before trim_silence joined the key cannot tell whether their
+    # transcript was trimmed, so they are dropped and the cache refills
+    indexes = await db.transcription_cache.index_information()
+    if "trim_silence" not in dict(indexes.get("cache_key_unique", {}).get("key", [])):
+        if "cache_key_unique" in indexes:
+            await db.transcription_cache.drop_index("cache_key_unique")
+        await db.transcription_cache.delete_many({"trim_silence": {"$exists": False}})
+        await db.transcription_cache.create_indexes(INDEXES["transcription_cache"])
+
+
+MIGRATIONS: List[Migration] = [
+    (1, "Initial indexes", _initial_schema),
+    (2, "Paginate transcriptions on (timestamp, id)", _drop_timestamp_index),
+    (3, "Full-text search languages", _backfill_search_language),
+    (4, "Requested and detected transcription languages", _backfill_requested_language),
+    (5, "Cache transcriptions per trim_silence setting", _cache_key_trim_silence),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+# Collections whose indexes a migration rebuilds: their old index specs would
+# conflict with INDEXES, so ensure_indexes() leaves them until it has run
+REBUILT_INDEXES: Dict[int, List[str]] = {
+    5: ["transcription_cache"],
+}
+
+
+async def ensure_indexes(db: AsyncIOMotorDatabase, skip: Set[str] = frozenset()):
+    for collection, indexes in INDEXES.items():
+        if collection in skip:
+            continue
+        try:
+            await db[collection].create_indexes(indexes)
+        except OperationFailure as e:
+            # e.g. existing duplicate ids; keep serving and let --check report it
+            logger.error(f"Could not create indexes on {collection}: {str(e)}")
+
+
+async def get_schema_version(db: AsyncIOMotorDatabase) -> int:
+    state = await db.schema_migrations.find_one({"_id": "schema"})
+    return state["version"] if state else 0
+
+
+async def migrate(db: AsyncIOMotorDatabase):
+    """
+    Ensure all indexes exist and apply pending migrations
+    """
+    version = await get_schema_version(db)
+    rebuilt = {
+        collection for target, collections in REBUILT_INDEXES.items() if target > version for collection in collections
+    }
+    await ensure_indexes(db, skip=rebuilt)
+    for target, description, step in MIGRATIONS:
+        if target <= version:
+            continue
+        logger.info(f"Applying schema migration {target}: {description}")
+        await step(db)
+        await db.schema_migrations.update_one(
+            {"_id": "schema"},
+            {"$set": {"version": target, "description": description, "applied_at": datetime.utcnow()}},
+            upsert=True
+        )
+        version = target
+    if rebuilt:
+        await ensure_indexes(db, skip=set(INDEXES) - rebuilt)
+
+
+def _index_key(keys) -> List[Tuple[str, object]]:
+    """
+    Index keys as MongoDB reports them: the text fields of a text index are
+    listed as one _fts/_ftsx pair
+    """
+    normalized = []
+    for field, kind in keys:
+        if field in ("_fts", "_ftsx") or kind != TEXT:
+            normalized.append((field, kind))
+        elif ("_fts", TEXT) not in normalized:
+            normalized.extend([("_fts", TEXT), ("_ftsx", 1)])
+    return normalized
+
+
+def _plan_stages(plan: dict) -> List[str]:
+    stages = [plan.get("stage", "")]
+    for child in [plan.get("inputStage")] + plan.get("inputStages", []):
+        if child:
+            stages.extend(_plan_stages(child))
+    return stages
+
+
+async def check(db: AsyncIOMotorDatabase) -> List[str]:
+    """
+    Report missing indexes, pending migrations and queries that would scan
+    a whole collection or sort in memory
+    """
+    problems = []
+
+    version = await get_schema_version(db)
+    if version < SCHEMA_VERSION:
+        problems.append(f"schema version {version} is behind {SCHEMA_VERSION}")
+
+    for collection, indexes in INDEXES.items():
+        existing = {index["name"]: _index_key(index["key"].items()) async for index in db[collection].list_indexes()}
+        for index in indexes:
+            name, expected = index.document["name"], _index_key(index.document["key"].items())
+            if name not in existing:
+                problems.append(f"{collection}: missing index {name}")
+            elif existing[name] != expected:
+                problems.append(f"{collection}: index {name} has keys {existing[name]}, expected {expected}")
+
+    for collection, query, sort in QUERY_PLANS:
+        cursor = db[collection].find(query).limit(1)
+        if sort:
+            cursor = cursor.sort(sort)
+        explained = await cursor.explain()
+        stages = _plan_stages(explained["queryPlanner"]["winningPlan"])
+        slow = [stage for stage in stages if stage in ("COLLSCAN", "SORT")]
+        if slow:
+            description = f"{query or '{}'}" + (f" sorted by {sort}" if sort else "")
+            problems.append(f"{collection}: {description} uses {', '.join(slow)}")
+
+    return problems
+
+
+async def main(check_only: bool) -> int:
+    load_dotenv(Path(__file__).parent / ".env")
+    client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+    db = client[os.environ["DB_NAME"]]
+    try:
+        if not check_only:
+            await migrate(db)
+            print(f"Schema is at version {await get_schema_version(db)}")
+        problems = await check(db)
+    finally:
+        client.close()
+
+    for problem in problems:
+        print(f"❌ {problem}")
+    if not problems:
+        print("✅ All indexes present and every query plan uses an index")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage MongoDB indexes and schema migrations")
+    parser.add_argument("--check", action="store_true", help="only report missing indexes and slow query plans")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    sys.exit(asyncio.run(main(args.check)))
@@ -0,0 +1,103 @@
+"""
+Helpers for full-text search over transcriptions and summaries.
+
+Both collections carry a MongoDB text index that stems each document in the
+language named by its search_language field. Mongo only stems a fixed set of
+languages, so every other language (and "auto") is indexed without stemming.
+"""
+import re
+from typing import List, Optional, Tuple
+
+# ISO 639-1 codes MongoDB text search can stem
+# https://www.mongodb.com/docs/manual/reference/text-search-languages/
+TEXT_SEARCH_LANGUAGES = {
+    "da": "danish",
+    "de": "german",
+    "en": "english",
+    "es": "spanish",
+    "fi": "finnish",
+    "fr": "french",
+    "hu": "hungarian",
+    "it": "italian",
+    "nb": "norwegian",
+    "nl": "dutch",
+    "pt": "portuguese",
+    "ro": "romanian",
+    "ru": "russian",
+    "sv": "swedish",
+    "tr": "turkish",
+}
+
+# Prefix of each query word matched when highlighting, so "meetings" also
+# marks "meeting" the way the stemmer matched it
+_HIGHLIGHT_STEM_CHARS = 5
+
+_QUERY_TOKEN = re.compile(r'-?"[^"]*"|\S+')
+_WORD = re.compile(r"\w+")
+
+
+def search_language(language: Optional[str]) -> str:
+    """
+    Text index language for a stored language code
+    """
+    return TEXT_SEARCH_LANGUAGES.get((language or "").split("-")[0].lower(), "none")
+
+
+def query_terms(query: str) -> List[str]:
+    """
+    Lower-cased words to highlight: every word of the query except negated
+    ones ("-word" or -"a phrase")
+    """
+    terms: List[str] = []
+    for token in _QUERY_TOKEN.findall(query):
+        if token.startswith("-"):
+            continue
+        terms.extend(word.lower() for word in _WORD.findall(token))
+    return list(dict.fromkeys(terms))
+
+
+def snippet(text: str, terms: List[str], width: int) -> Tuple[str, List[Tuple[int, int]]]:
+    """
+    Cut a window of about width characters around the densest cluster of
+    query terms and return it with the (start, end) offsets of every term
+    match inside it
+    """
+    matches: List[Tuple[int, int]] = []
+    if terms:
+        stems = sorted({term[:_HIGHLIGHT_STEM_CHARS] for term in terms}, key=len, reverse=True)
+        pattern = re.compile(r"\b(?:" + "|".join(re.escape(stem) for stem in stems) + r")\w*", re.IGNORECASE)
+        matches = [match.span() for match in pattern.finditer(text)]
+
+    if len(text) <= width:
+        return text, matches
+
+    # Slide a window over the matches and keep the one that covers the most
+    start = 0
+    if matches:
+        best, right = 0, 0
+        for left in range(len(matches)):
+            while right < len(matches) and matches[right][1] - matches[left][0] <= width:
+                right += 1
+            if right - left > best:
+                best, start = right - left, matches[left][0]
+        # Give the first match some leading context
+        start = max(0, start - width // 4)
+    start = min(start, len(text) - width)
+    end = start + width
+
+    # Do not cut words in half
+    if start > 0:
+        space = text.find(" ", start, start + 20)
+        start = space + 1 if space >= 0 else start
+    if end < len(text):
+        space = text.rfind(" ", end - 20, end)
+        end = space if space > start else end
+
+    prefix = "…" if start > 0 else ""
+    suffix = "…" if end < len(text) else ""
+    highlights = [
+        (match_start - start + len(prefix), match_end - start + len(prefix))
+        for match_start, match_end in matches
+        if match_start >= start and match_end <= end
+    ]
+    return prefix + text[start:end] + suffix, highlights
@@ -1,33 +1,136 @@
-from fastapi import FastAPI, APIRouter, File, UploadFile, HTTPException, Form
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, APIRouter, File, UploadFile, HTTPException, Form, Query, Request, WebSocket
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from migrations import migrate
+import metrics
+from admission import UploadAdmissionMiddleware, admission_rule
+from demux import VIDEO_CONTAINERS, demux_audio
+from media_probe import SNIFF_BYTES, MediaInfo, is_supported_type, probe_media, sniff_container
+from search import query_terms, search_language, snippet
+from vector_index import VectorIndex, embed
+from transcription_backends import (
+    FasterWhisperBackend, OpenAIBackend, StubBackend, Transcript, TranscriptionBackend
+)
 import os
+import re
+import json
+import asyncio
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, Field, TypeAdapter
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Tuple
 import uuid
-from datetime import datetime
-from openai import OpenAI
+import socket
+import base64
+import hashlib
+import time
+from dataclasses import asdict
+from datetime import datetime, timedelta
+from enum import Enum
+from openai import AsyncOpenAI
 import aiofiles
-import tempfile
-import shutil
+import numpy as np
+from audio_processing import (
+    AudioFormatError, PCMAudio, decode_to_wav, detect_speech, plan_windows, read_wav, resample_to_wav,
+    stitch_transcripts, wav_header, write_spans, write_wav
+)
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Metrics, served in Prometheus text format at /metrics
+TRANSCRIPTION_STAGE_SECONDS = metrics.histogram(
+    "transcription_stage_seconds",
+    "Time spent in each stage of a transcription request",
+    ["stage"]
+)
+UPSTREAM_REQUEST_SECONDS = metrics.histogram(
+    "upstream_request_seconds", "Duration of individual OpenAI API calls", ["service"]
+)
+UPSTREAM_IN_FLIGHT = metrics.gauge(
+    "upstream_requests_in_flight", "OpenAI API calls currently in progress", ["service"]
+)
+BYTES_RECEIVED = metrics.counter("bytes_received_total", "Bytes received, by source", ["source"])
+BYTES_SENT = metrics.counter("bytes_sent_total", "Bytes sent upstream, by destination", ["destination"])
+OPENAI_TOKENS = metrics.counter("openai_tokens_total", "Tokens used by chat completions", ["model", "kind"])
+MONGO_POOL_CONNECTIONS = metrics.gauge("mongo_pool_connections", "Open MongoDB connections", ["state"])
+metrics.gauge(
+    "process_resident_memory_bytes", "Resident memory size in bytes", function=metrics.resident_memory_bytes
+)
+
+class MongoPoolMetrics(monitoring.ConnectionPoolListener):
+    """
+    Track open and checked-out connections; called from pymongo's threads
+    """
+    def connection_created(self, event):
+        MONGO_POOL_CONNECTIONS.inc(state="open")
+
+    def connection_closed(self, event):
+        MONGO_POOL_CONNECTIONS.dec(state="open")
+
+    def connection_checked_out(self, event):
+        MONGO_POOL_CONNECTIONS.inc(state="in_use")
+
+    def connection_checked_in(self, event):
+        MONGO_POOL_CONNECTIONS.dec(state="in_use")
+
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_cleared(self, event): pass
+    def pool_closed(self, event): pass
+    def connection_ready(self, event): pass
+    def connection_check_out_started(self, event): pass
+    def connection_check_out_failed(self, event): pass
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, event_listeners=[MongoPoolMetrics()])
 db = client[os.environ['DB_NAME']]
 
-# OpenAI client
-openai_client = OpenAI(
-    api_key=os.environ['OPENAI_API_KEY']
+# OpenAI client (async, one shared HTTP connection pool per process)
+OPENAI_TIMEOUT = float(os.environ.get('OPENAI_TIMEOUT', '600'))
+openai_client = AsyncOpenAI(
+    api_key=os.environ['OPENAI_API_KEY'],
+    timeout=OPENAI_TIMEOUT
 )
 
+# Per-process caps on concurrent upstream calls
+WHISPER_MAX_CONCURRENCY = int(os.environ.get('WHISPER_MAX_CONCURRENCY', '4'))
+GPT_MAX_CONCURRENCY = int(os.environ.get('GPT_MAX_CONCURRENCY', '8'))
+WHISPER_MODEL = "whisper-1"
+gpt_semaphore = asyncio.Semaphore(GPT_MAX_CONCURRENCY)
+
+# Speech-to-text engine: openai, local (faster-whisper on the CPU), stub
+# (deterministic fake text) or auto (local for short clips, OpenAI otherwise)
+TRANSCRIPTION_BACKEND = os.environ.get('TRANSCRIPTION_BACKEND', 'openai').lower()
+LOCAL_WHISPER_MODEL = os.environ.get('LOCAL_WHISPER_MODEL', 'base')
+LOCAL_WHISPER_CONCURRENCY = int(os.environ.get('LOCAL_WHISPER_CONCURRENCY', '1'))
+LOCAL_TRANSCRIBE_MAX_SECONDS = float(os.environ.get('LOCAL_TRANSCRIBE_MAX_SECONDS', '30'))
+
+openai_backend = OpenAIBackend(openai_client, WHISPER_MODEL, WHISPER_MAX_CONCURRENCY)
+if TRANSCRIPTION_BACKEND in ("local", "auto"):
+    local_backend: Optional[TranscriptionBackend] = FasterWhisperBackend(LOCAL_WHISPER_MODEL, LOCAL_WHISPER_CONCURRENCY)
+elif TRANSCRIPTION_BACKEND == "stub":
+    local_backend = StubBackend()
+elif TRANSCRIPTION_BACKEND == "openai":
+    local_backend = None
+else:
+    raise ValueError(f"Unknown TRANSCRIPTION_BACKEND: {TRANSCRIPTION_BACKEND}")
+
+# Cached transcriptions are keyed on this, so switching engines never serves
+# text produced by another one
+if TRANSCRIPTION_BACKEND == "auto":
+    TRANSCRIPTION_CACHE_MODEL = f"auto:{local_backend.model}<={LOCAL_TRANSCRIBE_MAX_SECONDS:g}s:{WHISPER_MODEL}"
+elif local_backend:
+    TRANSCRIPTION_CACHE_MODEL = f"{local_backend.name}:{local_backend.model}"
+else:
+    TRANSCRIPTION_CACHE_MODEL = WHISPER_MODEL
+
 # Create the main app without a prefix
 app = FastAPI(title="Whisper AI API", description="AI-powered transcription service")
 
@@ -38,6 +141,168 @@ api_router = APIRouter(prefix="/api")
 UPLOAD_DIR = ROOT_DIR / "uploads"
 UPLOAD_DIR.mkdir(exist_ok=True)
 
+# Background transcription jobs
+TRANSCRIPTION_JOB_WORKERS = int(os.environ.get('TRANSCRIPTION_JOB_WORKERS', '2'))
+TRANSCRIPTION_JOB_QUEUE_SIZE = int(os.environ.get('TRANSCRIPTION_JOB_QUEUE_SIZE', '100'))
+job_workers: List[asyncio.Task] = []
+
+# Shortest job first: queued jobs run in order of when they would finish if
+# started on arrival, so short uploads overtake long ones without starving them.
+# Processing time is estimated from the duration in the media headers.
+TRANSCRIPTION_SECONDS_PER_AUDIO_SECOND = float(os.environ.get('TRANSCRIPTION_SECONDS_PER_AUDIO_SECOND', '0.1'))
+TRANSCRIPTION_JOB_OVERHEAD_SECONDS = float(os.environ.get('TRANSCRIPTION_JOB_OVERHEAD_SECONDS', '2'))
+ASSUMED_MEDIA_BYTES_PER_SECOND = 16000  # 128 kbps, for media whose headers give no duration
+job_queue: asyncio.PriorityQueue = asyncio.PriorityQueue(maxsize=TRANSCRIPTION_JOB_QUEUE_SIZE)
+
+# A running job is leased to the process running it, which renews the lease
+# while it works; a job whose lease lapsed (its process died) is queued again.
+# Several server processes can share the jobs collection this way.
+TRANSCRIPTION_JOB_LEASE_SECONDS = float(os.environ.get('TRANSCRIPTION_JOB_LEASE_SECONDS', '60'))
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# Batch transcription: files per request and how many are processed at once
+TRANSCRIBE_BATCH_MAX_FILES = int(os.environ.get('TRANSCRIBE_BATCH_MAX_FILES', '50'))
+TRANSCRIBE_BATCH_CONCURRENCY = int(os.environ.get('TRANSCRIBE_BATCH_CONCURRENCY', '4'))
+
+# Summary generation
+SUMMARY_MODEL = "gpt-4"
+SUMMARY_MAX_TOKENS = 1500
+SUMMARY_TEMPERATURE = 0.3
+
+# Language mapping for prompts
+SUMMARY_LANGUAGE_NAMES = {
+    "ru": "русском языке",
+    "en": "English",
+    "es": "español",
+    "fr": "français", 
+    "de": "Deutsch",
+    "it": "italiano",
+    "pt": "português",
+    "ja": "日本語",
+    "ko": "한국어",
+    "zh": "中文",
+    "ar": "العربية"
+}
+
+SUMMARY_SYSTEM_PROMPT = "You are a helpful assistant that creates structured summaries in {target_language}. Always format your response clearly with the requested sections."
+
+# Create structured summary prompt
+SUMMARY_USER_PROMPT = """Please create a structured summary of the following transcription in {target_language}. 
+
+Format the summary with these sections:
+1. **Основные темы** (Main Topics) - key themes discussed
+2. **Ключевые моменты** (Key Points) - most important points mentioned
+3. **Выводы и заключения** (Conclusions) - main conclusions or takeaways
+4. **Дополнительные детали** (Additional Details) - any noteworthy details
+
+Make the summary comprehensive but concise, highlighting the most important information.
+
+Transcription text:
+{transcription_text}
+
+Please provide the summary in {target_language}:"""
+
+# Transcripts too long for one prompt are summarized part by part (map), then
+# the partial summaries are merged into the structured summary (reduce)
+SUMMARY_MAP_REDUCE_THRESHOLD_TOKENS = int(os.environ.get('SUMMARY_MAP_REDUCE_THRESHOLD_TOKENS', '5000'))
+SUMMARY_CHUNK_TOKENS = int(os.environ.get('SUMMARY_CHUNK_TOKENS', '3000'))
+SUMMARY_CHUNK_CONCURRENCY = int(os.environ.get('SUMMARY_CHUNK_CONCURRENCY', '4'))
+SUMMARY_CHUNK_MAX_TOKENS = 500
+
+SUMMARY_MAP_PROMPT = """Summarize part {part} of {parts} of a transcription in {target_language}.
+
+Keep every main topic, key point, conclusion and noteworthy detail; these notes will be merged with the notes for the other parts into one structured summary.
+
+Transcription excerpt:
+{chunk_text}"""
+
+SUMMARY_REDUCE_PROMPT = """The following are notes on consecutive parts of one long transcription. Please combine them into a single structured summary of the whole transcription in {target_language}. 
+
+Format the summary with these sections:
+1. **Основные темы** (Main Topics) - key themes discussed
+2. **Ключевые моменты** (Key Points) - most important points mentioned
+3. **Выводы и заключения** (Conclusions) - main conclusions or takeaways
+4. **Дополнительные детали** (Additional Details) - any noteworthy details
+
+Make the summary comprehensive but concise, highlighting the most important information.
+
+Notes:
+{partial_summaries}
+
+Please provide the summary in {target_language}:"""
+
+# Cached summaries are keyed on this, so editing the prompt or model invalidates them
+SUMMARY_PROMPT_VERSION = hashlib.sha256(
+    "\n".join([
+        SUMMARY_MODEL, str(SUMMARY_MAX_TOKENS), str(SUMMARY_TEMPERATURE),
+        SUMMARY_SYSTEM_PROMPT, SUMMARY_USER_PROMPT, SUMMARY_MAP_PROMPT, SUMMARY_REDUCE_PROMPT
+    ]).encode()
+).hexdigest()[:16]
+
+# Chunked transcription of long media
+WHISPER_MAX_UPLOAD_BYTES = 24 * 1024 * 1024  # Whisper rejects uploads over 25MB
+TRANSCRIBE_CHUNK_SECONDS = float(os.environ.get('TRANSCRIBE_CHUNK_SECONDS', '600'))
+TRANSCRIBE_CHUNK_OVERLAP_SECONDS = float(os.environ.get('TRANSCRIBE_CHUNK_OVERLAP_SECONDS', '2'))
+TRANSCRIBE_CHUNK_CONCURRENCY = int(os.environ.get('TRANSCRIBE_CHUNK_CONCURRENCY', '4'))
+TRANSCRIBE_CHUNK_RETRIES = int(os.environ.get('TRANSCRIBE_CHUNK_RETRIES', '2'))
+
+# Language detection for language="auto": the first seconds of long audio are
+# transcribed once and the detected language is passed explicitly to every
+# chunk, so chunks cannot disagree. Whisper itself listens to 30 seconds.
+DETECT_LANGUAGE = os.environ.get('DETECT_LANGUAGE', 'true').lower() == 'true'
+LANGUAGE_PROBE_SECONDS = float(os.environ.get('LANGUAGE_PROBE_SECONDS', '30'))
+
+# Copy the audio track out of video uploads (no re-encoding) before upload
+DEMUX_VIDEO = os.environ.get('DEMUX_VIDEO', 'true').lower() == 'true'
+
+# Downsample PCM audio to 16 kHz mono before upload
+NORMALIZE_AUDIO = os.environ.get('NORMALIZE_AUDIO', 'true').lower() == 'true'
+NORMALIZE_SAMPLE_RATE = int(os.environ.get('NORMALIZE_SAMPLE_RATE', '16000'))
+
+# Silence trimming (voice-activity detection) before upload
+TRIM_SILENCE_DEFAULT = os.environ.get('TRIM_SILENCE_DEFAULT', 'false').lower() == 'true'
+VAD_MIN_SAVINGS_RATIO = float(os.environ.get('VAD_MIN_SAVINGS_RATIO', '0.05'))
+
+# Transcription history listing
+TRANSCRIPTION_PREVIEW_CHARS = 200
+TRANSCRIPTION_LIST_DEFAULT_FIELDS = ["id", "language", "filename", "file_size", "duration", "timestamp", "preview"]
+
+# Full-text search
+SEARCH_SNIPPET_CHARS = 200
+SEARCH_MAX_RESULTS = 500  # deepest skip + limit a search can page to
+
+# Local semantic search over transcript chunks
+VECTOR_INDEX_DIR = Path(os.environ.get('VECTOR_INDEX_DIR', str(ROOT_DIR / "vector_index")))
+vector_index = VectorIndex(VECTOR_INDEX_DIR)
+
+# Server-sent events must not be buffered or cached by proxies
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+# Live transcription over a WebSocket: 16-bit mono PCM is cut into windows
+# that are transcribed as soon as they fill, so final text trails speech by
+# about one window; partial text for the unfinished window is sent in between
+LIVE_WINDOW_SECONDS = float(os.environ.get('LIVE_WINDOW_SECONDS', '5'))
+LIVE_WINDOW_OVERLAP_SECONDS = float(os.environ.get('LIVE_WINDOW_OVERLAP_SECONDS', '1'))
+LIVE_WINDOW_CONCURRENCY = int(os.environ.get('LIVE_WINDOW_CONCURRENCY', '3'))
+LIVE_PARTIAL_INTERVAL_SECONDS = float(os.environ.get('LIVE_PARTIAL_INTERVAL_SECONDS', '1.5'))
+LIVE_IDLE_TIMEOUT_SECONDS = float(os.environ.get('LIVE_IDLE_TIMEOUT_SECONDS', '30'))
+LIVE_MAX_SECONDS = float(os.environ.get('LIVE_MAX_SECONDS', str(4 * 3600)))
+LIVE_SAMPLE_RATES = (8000, 16000, 22050, 24000, 32000, 44100, 48000)
+
+# Upload limits
+MAX_UPLOAD_SIZE = 200 * 1024 * 1024  # 200MB
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # Read uploads in 1MB chunks
+UPLOAD_FORM_OVERHEAD = 64 * 1024  # Multipart boundaries, headers and form fields around a file
+
+# Resumable uploads: byte ranges are written into a preallocated file in
+# UPLOAD_DIR, and sessions left idle for longer than the TTL are removed
+UPLOAD_SESSION_TTL_HOURS = float(os.environ.get('UPLOAD_SESSION_TTL_HOURS', '24'))
+UPLOAD_SESSION_GC_INTERVAL_SECONDS = float(os.environ.get('UPLOAD_SESSION_GC_INTERVAL_SECONDS', '600'))
+UPLOAD_SESSION_CHUNK_SIZE = 8 * 1024 * 1024  # Suggested size of each PUT
+# A completion claim older than this was left by a process that died, and is taken again
+UPLOAD_COMPLETE_CLAIM_SECONDS = float(os.environ.get('UPLOAD_COMPLETE_CLAIM_SECONDS', '120'))
+CONTENT_RANGE = re.compile(r"bytes (\d+)-(\d+)/(\d+|\*)")
+
 # Define Models
 class StatusCheck(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -50,18 +315,122 @@ class StatusCheckCreate(BaseModel):
 class TranscriptionRequest(BaseModel):
     language: Optional[str] = "auto"
 
+class PreprocessingStage(BaseModel):
+    name: str
+    seconds_saved: float = 0.0
+    bytes_saved: int = 0
+
 class TranscriptionResponse(BaseModel):
     id: str
     text: str
-    language: str
+    language: str  # detected when "auto" was requested
+    requested_language: Optional[str] = None
     filename: str
     file_size: int
     duration: Optional[float] = None
     timestamp: datetime
+    cached: bool = False
+    preprocessing: List[PreprocessingStage] = []
+
+class BatchTranscriptionItem(BaseModel):
+    filename: Optional[str] = None
+    result: Optional[TranscriptionResponse] = None
+    error: Optional[str] = None
+    status_code: int = 200
+
+class BatchTranscriptionResponse(BaseModel):
+    results: List[BatchTranscriptionItem]
+    succeeded: int
+    failed: int
+
+class TranscriptionListItem(BaseModel):
+    id: str
+    language: Optional[str] = None
+    filename: Optional[str] = None
+    file_size: Optional[int] = None
+    duration: Optional[float] = None
+    timestamp: datetime
+    preview: Optional[str] = None
+    text: Optional[str] = None
+
+transcription_list_adapter = TypeAdapter(List[TranscriptionListItem])
+
+class SearchHit(BaseModel):
+    type: str  # "transcription" or "summary"
+    id: str
+    transcription_id: str
+    filename: Optional[str] = None
+    language: str
+    timestamp: datetime
+    score: float
+    snippet: str
+    highlights: List[Tuple[int, int]] = []
+
+class SearchResponse(BaseModel):
+    query: str
+    hits: List[SearchHit]
+    next_skip: Optional[int] = None
+
+class SemanticSearchHit(BaseModel):
+    transcription_id: str
+    filename: Optional[str] = None
+    language: Optional[str] = None
+    timestamp: datetime
+    score: float
+    start: int
+    end: int
+    text: str
+
+class JobState(str, Enum):
+    queued = "queued"
+    running = "running"
+    done = "done"
+    failed = "failed"
+
+class TranscriptionJob(BaseModel):
+    id: str
+    state: JobState
+    progress: float = 0.0
+    filename: str
+    file_size: int
+    language: str
+    duration: Optional[float] = None
+    estimated_seconds: Optional[float] = None
+    error: Optional[str] = None
+    transcription_id: Optional[str] = None
+    result: Optional[TranscriptionResponse] = None
+    created_at: datetime
+    updated_at: datetime
+
+class UploadSessionCreate(BaseModel):
+    filename: str
+    file_size: int = Field(gt=0)
+    content_type: Optional[str] = None
+    language: str = "auto"
+    use_cache: bool = True
+    trim_silence: bool = TRIM_SILENCE_DEFAULT
+
+class UploadState(str, Enum):
+    uploading = "uploading"
+    completing = "completing"  # claimed by POST /uploads/{id}/complete
+
+class UploadSession(BaseModel):
+    id: str
+    state: UploadState = UploadState.uploading
+    filename: str
+    file_size: int
+    language: str
+    received: int  # bytes stored so far
+    offset: int  # every byte before this one has been stored
+    missing: List[Tuple[int, int]]  # [start, end) byte ranges still to send
+    chunk_size: int = UPLOAD_SESSION_CHUNK_SIZE
+    created_at: datetime
+    expires_at: datetime
 
 class SummaryRequest(BaseModel):
     transcription_id: str
     summary_language: str
+    force_refresh: bool = False
 
 class SummaryResponse(BaseModel):
     id: str
@@ -69,6 +438,45 @@ class SummaryResponse(BaseModel):
     summary: str
     language: str
     timestamp: datetime
+    cached: bool = False
+
+async def spool_upload(file: UploadFile) -> Tuple[Path, int, str]:
+    """
+    Stream an upload into UPLOAD_DIR in fixed-size chunks.
+
+    Returns the spool path, the number of bytes written and the SHA-256 of
+    the content. The body is never held in memory as a whole; the size limit
+    and the magic-byte check are enforced while reading, and the partial file
+    is removed if anything goes wrong.
+    """
+    spool_path = UPLOAD_DIR / f"{uuid.uuid4()}{Path(file.filename or '').suffix.lower()}"
+    file_size = 0
+    content_hash = hashlib.sha256()
+    read_seconds = write_seconds = 0.0
+    try:
+        async with aiofiles.open(spool_path, "wb") as out:
+            while True:
+                started = time.perf_counter()
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                read_seconds += time.perf_counter() - started
+                if not chunk:
+                    break
+                if not file_size and sniff_container(chunk[:SNIFF_BYTES]) is None:
+                    raise HTTPException(status_code=400, detail="File content is not a supported audio or video format")
+                file_size += len(chunk)
+                if file_size > MAX_UPLOAD_SIZE:
+                    raise HTTPException(status_code=413, detail="File size exceeds 200MB limit")
+                content_hash.update(chunk)
+                started = time.perf_counter()
+                await out.write(chunk)
+                write_seconds += time.perf_counter() - started
+    except BaseException:
+        spool_path.unlink(missing_ok=True)
+        raise
+    TRANSCRIPTION_STAGE_SECONDS.observe(read_seconds, stage="body_read")
+    TRANSCRIPTION_STAGE_SECONDS.observe(write_seconds, stage="spool_write")
+    BYTES_RECEIVED.inc(file_size, source="upload")
+    return spool_path, file_size, content_hash.hexdigest()
 
 # Add your routes to the router instead of directly to app
 @api_router.get("/")
@@ -87,99 +495,1191 @@ async def get_status_checks():
     status_checks = await db.status_checks.find().to_list(1000)
     return [StatusCheck(**status_check) for status_check in status_checks]
 
-@api_router.post("/transcribe", response_model=TranscriptionResponse)
+def select_transcription_backend(duration: Optional[float]) -> TranscriptionBackend:
+    """
+    Engine for an upload of the given duration (None when unknown)
+    """
+    if TRANSCRIPTION_BACKEND == "auto":
+        if duration is not None and duration <= LOCAL_TRANSCRIBE_MAX_SECONDS:
+            return local_backend
+        return openai_backend
+    return local_backend or openai_backend
+
+async def whisper_transcribe(audio_path: Path, language: str, backend: TranscriptionBackend) -> Transcript:
+    """
+    Transcribe one file with the given engine without blocking the event loop.
+    Concurrency is capped per engine (WHISPER_MAX_CONCURRENCY for OpenAI).
+    """
+    async with backend.slots:
+        if backend is openai_backend:
+            BYTES_SENT.inc(audio_path.stat().st_size, destination="whisper")
+        with UPSTREAM_IN_FLIGHT.track_inprogress(service=backend.name), UPSTREAM_REQUEST_SECONDS.time(service=backend.name):
+            return await backend.transcribe(audio_path, language if language != "auto" else None)
+
+def record_token_usage(model: str, usage):
+    if usage:
+        OPENAI_TOKENS.inc(usage.prompt_tokens, model=model, kind="prompt")
+        OPENAI_TOKENS.inc(usage.completion_tokens, model=model, kind="completion")
+
+async def chat_completion(**kwargs):
+    """
+    Call the chat completions API, capped by GPT_MAX_CONCURRENCY
+    """
+    async with gpt_semaphore:
+        with UPSTREAM_IN_FLIGHT.track_inprogress(service="gpt"), UPSTREAM_REQUEST_SECONDS.time(service="gpt"):
+            response = await openai_client.chat.completions.create(**kwargs)
+    record_token_usage(kwargs["model"], response.usage)
+    return response
+
+async def chat_completion_stream(**kwargs) -> AsyncIterator[str]:
+    """
+    Stream a chat completion as text pieces. The GPT_MAX_CONCURRENCY slot is
+    held until the stream is finished.
+    """
+    async with gpt_semaphore:
+        with UPSTREAM_IN_FLIGHT.track_inprogress(service="gpt"), UPSTREAM_REQUEST_SECONDS.time(service="gpt"):
+            stream = await openai_client.chat.completions.create(
+                stream=True, stream_options={"include_usage": True}, **kwargs
+            )
+            async for chunk in stream:
+                # The last chunk carries the token usage and no choices
+                if getattr(chunk, "usage", None):
+                    record_token_usage(kwargs["model"], chunk.usage)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+def validate_upload_type(filename: str, content_type: Optional[str]):
+    """
+    Reject uploads whose content type and extension are both unsupported
+    """
+    # Files with common extensions are allowed even if the content type is not recognized
+    if not is_supported_type(filename, content_type):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported file type: {content_type}. Supported formats: MP3, WAV, M4A, MP4, MOV, AVI, FLAC, WebM"
+        )
+
+async def lookup_cached_transcription(
+    content_hash: str, language: str, trim_silence: bool
+) -> Optional[TranscriptionResponse]:
+    """
+    Return the stored transcription for identical content, language, silence
+    trimming (which remaps the timeline) and model
+    """
+    key = {
+        "content_hash": content_hash,
+        "language": language,
+        "trim_silence": trim_silence,
+        "model": TRANSCRIPTION_CACHE_MODEL
+    }
+    entry = await db.transcription_cache.find_one(key)
+    if not entry:
+        return None
+    
+    transcription = await db.transcriptions.find_one({"id": entry["transcription_id"]})
+    if not transcription:
+        # The transcription was deleted after it was cached
+        await db.transcription_cache.delete_one(key)
+        return None
+    return TranscriptionResponse(**transcription, cached=True)
+
+def transcription_cache_entry(content_hash: str, language: str, trim_silence: bool, transcription_id: str) -> dict:
+    return {
+        "content_hash": content_hash,
+        "language": language,
+        "trim_silence": trim_silence,
+        "model": TRANSCRIPTION_CACHE_MODEL,
+        "transcription_id": transcription_id,
+        "created_at": datetime.utcnow()
+    }
+
+async def remember_transcription(content_hash: str, language: str, trim_silence: bool, transcription_id: str):
+    try:
+        await db.transcription_cache.insert_one(
+            transcription_cache_entry(content_hash, language, trim_silence, transcription_id)
+        )
+    except DuplicateKeyError:
+        # A concurrent upload of the same content got there first
+        pass
+
+async def load_pcm_audio(
+    spool_path: Path, file_size: int, temp_paths: List[Path], decode_small: bool = False
+) -> Optional[PCMAudio]:
+    """
+    Map the upload as PCM samples when possible. WAV is read in place; other
+    formats are decoded with ffmpeg only when they are too big to send upstream
+    in one piece or decode_small is set. Returns None for audio that has to be
+    sent as-is.
+    """
+    try:
+        return read_wav(spool_path)
+    except AudioFormatError:
+        pass
+    
+    if file_size <= WHISPER_MAX_UPLOAD_BYTES and not decode_small:
+        return None
+    decoded_path = spool_path.with_name(f"{spool_path.stem}.decoded.wav")
+    temp_paths.append(decoded_path)
+    if not await decode_to_wav(spool_path, decoded_path):
+        return None
+    try:
+        return read_wav(decoded_path)
+    except AudioFormatError:
+        return None
+
+async def demux_video(
+    media: MediaInfo, upload_path: Path, temp_paths: List[Path]
+) -> Optional[Tuple[Path, PreprocessingStage]]:
+    """
+    Copy the audio track of a video upload into an audio-only file, so the
+    video bytes are never sent upstream. Returns None when there is no video
+    to drop or the audio cannot be copied out.
+    """
+    audio_path = await demux_audio(upload_path, UPLOAD_DIR / f"{upload_path.stem}.audio", media)
+    if audio_path is None:
+        return None
+    temp_paths.append(audio_path)
+    
+    stage = PreprocessingStage(
+        name="demux",
+        bytes_saved=upload_path.stat().st_size - audio_path.stat().st_size
+    )
+    return audio_path, stage
+
+async def normalize_audio(
+    audio: PCMAudio, upload_path: Path, temp_paths: List[Path]
+) -> Tuple[PCMAudio, Path, PreprocessingStage]:
+    """
+    Re-encode PCM audio as 16-bit mono at NORMALIZE_SAMPLE_RATE, which is all
+    the speech model uses, so far fewer bytes are sent upstream
+    """
+    normalized_path = UPLOAD_DIR / f"{upload_path.stem}.mono{NORMALIZE_SAMPLE_RATE}.wav"
+    temp_paths.append(normalized_path)
+    normalized = await asyncio.to_thread(resample_to_wav, audio, normalized_path, NORMALIZE_SAMPLE_RATE)
+    
+    stage = PreprocessingStage(
+        name="resample",
+        bytes_saved=upload_path.stat().st_size - normalized_path.stat().st_size
+    )
+    return normalized, normalized_path, stage
+
+async def remove_silence(
+    audio: PCMAudio, upload_path: Path, temp_paths: List[Path]
+) -> Optional[Tuple[PCMAudio, Path, List[Tuple[float, float]], PreprocessingStage]]:
+    """
+    Cut non-speech regions out of the audio before it is sent upstream.
+    Returns None when there is too little silence to be worth it. The speech
+    spans returned are the timeline mapping: TimelineMap.from_spans() projects
+    times in the trimmed audio back onto the upload.
+    """
+    spans = await asyncio.to_thread(detect_speech, audio)
+    kept_frames = sum(end - start for start, end in spans)
+    if not spans or audio.frames - kept_frames < audio.frames * VAD_MIN_SAVINGS_RATIO:
+        return None
+    
+    trimmed_path = UPLOAD_DIR / f"{upload_path.stem}.speech.wav"
+    temp_paths.append(trimmed_path)
+    timeline = await asyncio.to_thread(write_spans, audio, spans, trimmed_path)
+    trimmed = read_wav(trimmed_path)
+    
+    stage = PreprocessingStage(
+        name="silence_trim",
+        seconds_saved=round(audio.duration - trimmed.duration, 3),
+        bytes_saved=upload_path.stat().st_size - trimmed_path.stat().st_size
+    )
+    return trimmed, trimmed_path, timeline.spans(), stage
+
+async def transcribe_chunked(
+    audio: PCMAudio,
+    language: str,
+    chunk_prefix: str,
+    backend: TranscriptionBackend,
+    on_progress: Optional[Callable[[float], Awaitable[None]]] = None
+) -> str:
+    """
+    Transcribe overlapping windows concurrently and stitch the text in order.
+    Each window is retried on its own, so one failure never repeats the rest.
+    """
+    # Keep every 16-bit chunk below the upstream upload limit
+    bytes_per_second = audio.sample_rate * audio.channels * 2
+    window_seconds = min(TRANSCRIBE_CHUNK_SECONDS, WHISPER_MAX_UPLOAD_BYTES / bytes_per_second)
+    windows = plan_windows(audio.frames, audio.sample_rate, window_seconds, TRANSCRIBE_CHUNK_OVERLAP_SECONDS)
+    
+    fan_out = asyncio.Semaphore(TRANSCRIBE_CHUNK_CONCURRENCY)
+    finished = 0
+    
+    async def transcribe_window(index: int, start: int, end: int) -> str:
+        nonlocal finished
+        chunk_path = UPLOAD_DIR / f"{chunk_prefix}.chunk{index}.wav"
+        async with fan_out:
+            try:
+                await asyncio.to_thread(write_wav, chunk_path, audio.samples[start:end], audio.sample_rate)
+                for attempt in range(TRANSCRIBE_CHUNK_RETRIES + 1):
+                    try:
+                        transcript = await whisper_transcribe(chunk_path, language, backend)
+                        break
+                    except Exception as e:
+                        if attempt == TRANSCRIBE_CHUNK_RETRIES:
+                            raise
+                        logger.warning(f"Chunk {index} failed (attempt {attempt + 1}), retrying: {str(e)}")
+                        await asyncio.sleep(2 ** attempt)
+            finally:
+                chunk_path.unlink(missing_ok=True)
+        
+        finished += 1
+        if on_progress:
+            await on_progress(0.1 + 0.8 * finished / len(windows))
+        return transcript.text
+    
+    tasks = [
+        asyncio.ensure_future(transcribe_window(index, start, end)) for index, (start, end) in enumerate(windows)
+    ]
+    try:
+        texts = await asyncio.gather(*tasks)
+    except BaseException:
+        # A window failed for good (or the request was cancelled): stop the
+        # others instead of letting them keep calling upstream
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    return stitch_transcripts(texts)
+
+async def detect_language(audio: PCMAudio, clip_prefix: str, backend: TranscriptionBackend) -> Optional[str]:
+    """
+    Language spoken in the first LANGUAGE_PROBE_SECONDS of the audio, from one
+    short upstream call. None if it could not be detected.
+    """
+    clip_path = UPLOAD_DIR / f"{clip_prefix}.language.wav"
+    frames = min(audio.frames, int(LANGUAGE_PROBE_SECONDS * audio.sample_rate))
+    try:
+        await asyncio.to_thread(write_wav, clip_path, audio.samples[:frames], audio.sample_rate)
+        return (await whisper_transcribe(clip_path, "auto", backend)).language
+    except Exception as e:
+        logger.warning(f"Language detection failed, chunks will detect it on their own: {str(e)}")
+        return None
+    finally:
+        clip_path.unlink(missing_ok=True)
+
+async def index_transcription(transcription_id: str, text: str, if_missing: bool = False):
+    """
+    Add a transcript to the semantic search index. A failure only means the
+    transcript is missing from semantic search until the next startup sync.
+    """
+    try:
+        await asyncio.to_thread(vector_index.add_text, transcription_id, text, if_missing)
+    except Exception as e:
+        logger.error(f"Error indexing transcription {transcription_id}: {str(e)}")
+
+async def transcribe_upload(
+    spool_path: Path,
+    filename: str,
+    file_size: int,
+    language: str,
+    content_hash: Optional[str] = None,
+    trim_silence: bool = False,
+    on_progress: Optional[Callable[[float], Awaitable[None]]] = None
+) -> dict:
+    """
+    Transcribe a spooled upload into a db.transcriptions document (not saved).
+    The duration comes from the media headers; video uploads are cut down to
+    their audio track, PCM audio is downsampled to 16 kHz mono and silence is
+    optionally cut out first; long audio is split into overlapping windows
+    that are transcribed in parallel, in the language detected from its start.
+    """
+    temp_paths: List[Path] = []
+    preprocessing: List[PreprocessingStage] = []
+    speech_spans = None
+    try:
+        with TRANSCRIPTION_STAGE_SECONDS.time(stage="preprocessing"):
+            media = await probe_upload(spool_path)
+            upload_path, upload_size = spool_path, file_size
+            if media and DEMUX_VIDEO and media.container in VIDEO_CONTAINERS:
+                demuxed = await demux_video(media, upload_path, temp_paths)
+                if demuxed:
+                    upload_path, stage = demuxed
+                    upload_size = upload_path.stat().st_size
+                    preprocessing.append(stage)
+            
+            audio = await load_pcm_audio(upload_path, upload_size, temp_paths, decode_small=trim_silence)
+            # Compressed media is not decoded here; its headers still give the duration
+            duration = audio.duration if audio else (media.duration if media else None)
+            
+            if audio and NORMALIZE_AUDIO and (
+                audio.sample_rate > NORMALIZE_SAMPLE_RATE or audio.channels > 1 or audio.samples.dtype != np.int16
+            ):
+                audio, upload_path, stage = await normalize_audio(audio, upload_path, temp_paths)
+                preprocessing.append(stage)
+            
+            if audio and trim_silence:
+                trimmed = await remove_silence(audio, upload_path, temp_paths)
+                if trimmed:
+                    audio, upload_path, speech_spans, stage = trimmed
+                    preprocessing.append(stage)
+        
+        backend = select_transcription_backend(audio.duration if audio else duration)
+        chunked = audio and (
+            upload_path.stat().st_size > WHISPER_MAX_UPLOAD_BYTES or audio.duration > TRANSCRIBE_CHUNK_SECONDS
+        )
+        detected_language = None
+        if chunked and language == "auto" and DETECT_LANGUAGE:
+            with TRANSCRIPTION_STAGE_SECONDS.time(stage="language_detection"):
+                detected_language = await detect_language(audio, spool_path.stem, backend)
+        
+        with TRANSCRIPTION_STAGE_SECONDS.time(stage="whisper"):
+            if chunked:
+                text = await transcribe_chunked(
+                    audio, detected_language or language, spool_path.stem, backend, on_progress
+                )
+            else:
+                transcript = await whisper_transcribe(upload_path, language, backend)
+                text, detected_language = transcript.text, transcript.language
+    finally:
+        for path in temp_paths:
+            path.unlink(missing_ok=True)
+    if on_progress:
+        await on_progress(0.9)
+    
+    # Create transcription record; "auto" is replaced by the detected language
+    if language == "auto" and detected_language:
+        language, requested_language = detected_language, "auto"
+    else:
+        requested_language = language
+    transcription_id = str(uuid.uuid4())
+    transcription_data = {
+        "id": transcription_id,
+        "text": text,
+        "language": language,
+        "requested_language": requested_language,
+        "filename": filename,
+        "file_size": file_size,
+        "duration": duration,
+        "media": asdict(media) if media else None,
+        "preprocessing": [stage.dict() for stage in preprocessing],
+        "speech_spans": speech_spans,
+        "content_hash": content_hash,
+        "model": f"{backend.name}:{backend.model}",
+        "search_language": search_language(language),
+        "timestamp": datetime.utcnow()
+    }
+    return transcription_data
+
+async def run_transcription(
+    spool_path: Path,
+    filename: str,
+    file_size: int,
+    language: str,
+    content_hash: Optional[str] = None,
+    trim_silence: bool = False,
+    on_progress: Optional[Callable[[float], Awaitable[None]]] = None
+) -> TranscriptionResponse:
+    """
+    Transcribe a spooled upload and store the result in db.transcriptions
+    """
+    transcription_data = await transcribe_upload(
+        spool_path, filename, file_size, language, content_hash, trim_silence, on_progress
+    )
+    
+    # Save to database
+    with TRANSCRIPTION_STAGE_SECONDS.time(stage="mongo_insert"):
+        await db.transcriptions.insert_one(transcription_data)
+    if content_hash:
+        await remember_transcription(content_hash, language, trim_silence, transcription_data["id"])
+    await index_transcription(transcription_data["id"], transcription_data["text"])
+    
+    return TranscriptionResponse(**transcription_data)
+
+async def update_job(job_id: str, **fields):
+    fields["updated_at"] = datetime.utcnow()
+    await db.transcription_jobs.update_one({"id": job_id}, {"$set": fields})
+
+async def process_job(job_id: str):
+    """
+    Run a single queued transcription job to completion
+    """
+    # Claim the job atomically so a job is never processed twice
+    now = datetime.utcnow()
+    job = await db.transcription_jobs.find_one_and_update(
+        {"id": job_id, "state": JobState.queued},
+        {"$set": {"state": JobState.running, "progress": 0.1, "owner": WORKER_ID, "heartbeat_at": now, "updated_at": now}}
+    )
+    if not job:
+        return
+    
+    spool_path = Path(job["spool_path"])
+    
+    async def report_progress(progress: float):
+        await update_job(job_id, progress=progress)
+    
+    lease = asyncio.create_task(renew_job_lease(job_id))
+    try:
+        result = await run_transcription(
+            spool_path, job["filename"], job["file_size"], job["language"],
+            content_hash=job.get("content_hash"), trim_silence=job.get("trim_silence", False),
+            on_progress=report_progress
+        )
+        await update_job(job_id, state=JobState.done, progress=1.0, transcription_id=result.id)
+    except asyncio.CancelledError:
+        # Shutting down: the job keeps its upload and goes back in the queue
+        # for the next process to start; if this fails the lease runs out instead
+        try:
+            await update_job(job_id, state=JobState.queued, progress=0.0, owner=None, heartbeat_at=None)
+        except Exception as e:
+            logger.error(f"Could not release job {job_id}: {str(e)}")
+        raise
+    except Exception as e:
+        logger.error(f"Transcription job {job_id} failed: {str(e)}")
+        await update_job(job_id, state=JobState.failed, error=str(e))
+    finally:
+        lease.cancel()
+    spool_path.unlink(missing_ok=True)
+
+async def renew_job_lease(job_id: str):
+    while True:
+        await asyncio.sleep(TRANSCRIPTION_JOB_LEASE_SECONDS / 3)
+        try:
+            await db.transcription_jobs.update_one(
+                {"id": job_id, "owner": WORKER_ID, "state": JobState.running},
+                {"$set": {"heartbeat_at": datetime.utcnow()}}
+            )
+        except Exception as e:
+            logger.error(f"Could not renew the lease of job {job_id}: {str(e)}")
+
+async def transcription_worker():
+    while True:
+        _, job_id = await job_queue.get()
+        try:
+            await process_job(job_id)
+        except Exception as e:
+            logger.error(f"Transcription worker error on job {job_id}: {str(e)}")
+        finally:
+            job_queue.task_done()
+
+def estimate_processing_seconds(duration: Optional[float], file_size: int) -> float:
+    """
+    Expected processing time of a transcription, from the media duration
+    when it is known and from the file size otherwise
+    """
+    if duration is None:
+        duration = file_size / ASSUMED_MEDIA_BYTES_PER_SECOND
+    return TRANSCRIPTION_JOB_OVERHEAD_SECONDS + duration * TRANSCRIPTION_SECONDS_PER_AUDIO_SECOND
+
+def job_priority(job: dict) -> float:
+    estimated_seconds = job.get("estimated_seconds")
+    if estimated_seconds is None:
+        estimated_seconds = estimate_processing_seconds(job.get("duration"), job["file_size"])
+    return job["created_at"].timestamp() + estimated_seconds
+
+async def probe_upload(path: Path) -> Optional[MediaInfo]:
+    """
+    Header-only probe of a spooled upload (well under a millisecond)
+    """
+    try:
+        return await asyncio.to_thread(probe_media, path)
+    except OSError as e:
+        logger.warning(f"Could not probe {path.name}: {str(e)}")
+        return None
+
+async def enqueue_transcription_job(
+    spool_path: Path,
+    filename: str,
+    file_size: int,
+    language: str,
+    content_hash: Optional[str] = None,
+    trim_silence: bool = False
+) -> TranscriptionJob:
+    if job_queue.full():
+        spool_path.unlink(missing_ok=True)
+        raise HTTPException(status_code=503, detail="Transcription queue is full, please retry later")
+    
+    media = await probe_upload(spool_path)
+    duration = media.duration if media else None
+    now = datetime.utcnow()
+    job = TranscriptionJob(
+        id=str(uuid.uuid4()),
+        state=JobState.queued,
+        filename=filename,
+        file_size=file_size,
+        language=language,
+        duration=duration,
+        estimated_seconds=estimate_processing_seconds(duration, file_size),
+        created_at=now,
+        updated_at=now
+    )
+    job_document = {
+        **job.dict(),
+        "spool_path": str(spool_path),
+        "content_hash": content_hash,
+        "trim_silence": trim_silence
+    }
+    await db.transcription_jobs.insert_one(job_document)
+    try:
+        job_queue.put_nowait((job_priority(job_document), job.id))
+    except asyncio.QueueFull:
+        # Other uploads took the last slots while this one was probed and stored
+        spool_path.unlink(missing_ok=True)
+        await update_job(job.id, state=JobState.failed, error="Transcription queue was full")
+        raise HTTPException(status_code=503, detail="Transcription queue is full, please retry later")
+    return job
+
+async def record_cached_job(filename: str, file_size: int, language: str, cached: TranscriptionResponse) -> TranscriptionJob:
+    """
+    Record an already-finished job for a background upload served from the cache
+    """
+    now = datetime.utcnow()
+    job = TranscriptionJob(
+        id=str(uuid.uuid4()),
+        state=JobState.done,
+        progress=1.0,
+        filename=filename,
+        file_size=file_size,
+        language=language,
+        transcription_id=cached.id,
+        result=cached,
+        created_at=now,
+        updated_at=now
+    )
+    await db.transcription_jobs.insert_one(job.dict(exclude={"result"}))
+    return job
+
+@api_router.post(
+    "/transcribe",
+    response_model=TranscriptionResponse,
+    responses={202: {"model": TranscriptionJob, "description": "Job accepted (background=true)"}}
+)
 async def transcribe_audio(
     file: UploadFile = File(...),
-    language: str = Form(default="auto")
+    language: str = Form(default="auto"),
+    background: bool = Form(default=False),
+    use_cache: bool = Form(default=True),
+    trim_silence: bool = Form(default=TRIM_SILENCE_DEFAULT)
 ):
     """
-    Transcribe audio/video file using OpenAI Whisper API
+    Transcribe audio/video file using OpenAI Whisper API.
+    With background=true the file is queued and a job is returned immediately.
+    Identical content is served from the transcription cache unless use_cache=false.
+    With trim_silence=true non-speech regions are removed before upload.
     """
     try:
-        # Read file content
-        content = await file.read()
-        file_size = len(content)
-        
-        # Validate file size (200MB limit as requested)
-        if file_size > 200 * 1024 * 1024:
-            raise HTTPException(status_code=413, detail="File size exceeds 200MB limit")
+        validate_upload_type(file.filename, file.content_type)
         
-        # Validate file type
-        allowed_types = [
-            "audio/mpeg", "audio/wav", "audio/x-wav", "audio/mp4", "audio/m4a",
-            "video/mp4", "video/mpeg", "video/quicktime", "video/x-msvideo",
-            "audio/flac", "audio/webm", "video/webm", "audio/mp3"
-        ]
+        # Stream the upload to disk (enforces the 200MB limit as it goes)
+        spool_path, file_size, content_hash = await spool_upload(file)
         
-        if file.content_type not in allowed_types:
-            # Allow files with common extensions even if content-type is not recognized
-            allowed_extensions = ['.mp3', '.wav', '.m4a', '.mp4', '.mov', '.avi', '.flac', '.webm']
-            file_extension = Path(file.filename).suffix.lower()
-            if file_extension not in allowed_extensions:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Unsupported file type: {file.content_type}. Supported formats: MP3, WAV, M4A, MP4, MOV, AVI, FLAC, WebM"
-                )
+        if use_cache:
+            cached = await lookup_cached_transcription(content_hash, language, trim_silence)
+            if cached:
+                spool_path.unlink(missing_ok=True)
+                if background:
+                    job = await record_cached_job(file.filename, file_size, language, cached)
+                    return JSONResponse(status_code=202, content=jsonable_encoder(job))
+                return cached
         
-        # Create temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=Path(file.filename).suffix) as tmp_file:
-            # Write content to temporary file
-            tmp_file.write(content)
-            tmp_file_path = tmp_file.name
+        if background:
+            job = await enqueue_transcription_job(
+                spool_path, file.filename, file_size, language, content_hash, trim_silence
+            )
+            return JSONResponse(status_code=202, content=jsonable_encoder(job))
         
         try:
-            # Transcribe using OpenAI Whisper
-            with open(tmp_file_path, "rb") as audio_file:
-                transcript = openai_client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file,
-                    language=language if language != "auto" else None
-                )
-            
-            # Create transcription record
-            transcription_id = str(uuid.uuid4())
-            transcription_data = {
-                "id": transcription_id,
-                "text": transcript.text,
-                "language": language,
-                "filename": file.filename,
-                "file_size": file_size,
-                "timestamp": datetime.utcnow()
-            }
-            
-            # Save to database
-            await db.transcriptions.insert_one(transcription_data)
-            
-            # Return response
-            return TranscriptionResponse(
-                id=transcription_id,
-                text=transcript.text,
-                language=language,
-                filename=file.filename,
-                file_size=file_size,
-                timestamp=transcription_data["timestamp"]
+            return await run_transcription(
+                spool_path, file.filename, file_size, language, content_hash, trim_silence
             )
-            
         finally:
-            # Clean up temporary file
-            if os.path.exists(tmp_file_path):
-                os.unlink(tmp_file_path)
+            # Clean up spooled upload
+            spool_path.unlink(missing_ok=True)
                 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Transcription error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
 
-@api_router.get("/transcriptions", response_model=List[dict])
-async def get_transcriptions():
+@api_router.post("/transcribe/batch", response_model=BatchTranscriptionResponse)
+async def transcribe_audio_batch(
+    files: List[UploadFile] = File(...),
+    language: str = Form(default="auto"),
+    use_cache: bool = Form(default=True),
+    trim_silence: bool = Form(default=TRIM_SILENCE_DEFAULT)
+):
+    """
+    Transcribe many files from one multipart body, a few at a time.
+    All new transcriptions are stored with a single insert_many. Results are
+    returned in upload order; a file that fails gets an error and status_code
+    instead of a result and does not affect the others.
+    """
+    if len(files) > TRANSCRIBE_BATCH_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"At most {TRANSCRIBE_BATCH_MAX_FILES} files per batch")
+    fan_out = asyncio.Semaphore(TRANSCRIBE_BATCH_CONCURRENCY)
+    
+    async def transcribe_file(file: UploadFile):
+        async with fan_out:
+            try:
+                validate_upload_type(file.filename, file.content_type)
+                spool_path, file_size, content_hash = await spool_upload(file)
+                try:
+                    if use_cache:
+                        cached = await lookup_cached_transcription(content_hash, language, trim_silence)
+                        if cached:
+                            return cached
+                    return await transcribe_upload(
+                        spool_path, file.filename, file_size, language, content_hash, trim_silence
+                    )
+                finally:
+                    spool_path.unlink(missing_ok=True)
+            except HTTPException as e:
+                return BatchTranscriptionItem(filename=file.filename, error=e.detail, status_code=e.status_code)
+            except Exception as e:
+                logger.error(f"Transcription error for {file.filename}: {str(e)}")
+                return BatchTranscriptionItem(
+                    filename=file.filename, error=f"Transcription failed: {str(e)}", status_code=500
+                )
+    
+    outcomes = await asyncio.gather(*(transcribe_file(file) for file in files))
+    documents = [outcome for outcome in outcomes if isinstance(outcome, dict)]
+    
+    if documents:
+        try:
+            with TRANSCRIPTION_STAGE_SECONDS.time(stage="mongo_insert"):
+                await db.transcriptions.insert_many(documents)
+        except Exception as e:
+            logger.error(f"Error storing batch transcriptions: {str(e)}")
+            raise HTTPException(status_code=500, detail="Failed to store transcriptions")
+        
+        cache_entries = [
+            transcription_cache_entry(document["content_hash"], language, trim_silence, document["id"])
+            for document in documents if document["content_hash"]
+        ]
+        try:
+            if cache_entries:
+                await db.transcription_cache.insert_many(cache_entries, ordered=False)
+        except BulkWriteError as e:
+            # Duplicates mean the same content was cached meanwhile; anything else is worth a log line
+            if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                logger.error(f"Error caching batch transcriptions: {str(e)}")
+        for document in documents:
+            await index_transcription(document["id"], document["text"])
+    
+    results = []
+    for outcome in outcomes:
+        if isinstance(outcome, dict):
+            outcome = TranscriptionResponse(**outcome)
+        if isinstance(outcome, TranscriptionResponse):
+            outcome = BatchTranscriptionItem(filename=outcome.filename, result=outcome)
+        results.append(outcome)
+    succeeded = sum(1 for item in results if item.result)
+    return BatchTranscriptionResponse(results=results, succeeded=succeeded, failed=len(results) - succeeded)
+
+def upload_part_path(upload_id: str) -> Path:
+    return UPLOAD_DIR / f"{upload_id}.part"
+
+def upload_session_status(session: dict) -> UploadSession:
+    """
+    Merge the byte ranges stored for a session into its progress
+    """
+    stored: List[List[int]] = []
+    for start, end in sorted(session.get("ranges", [])):
+        if stored and start <= stored[-1][1]:
+            stored[-1][1] = max(stored[-1][1], end)
+        else:
+            stored.append([start, end])
+    
+    missing = []
+    position = 0
+    for start, end in stored + [[session["file_size"], session["file_size"]]]:
+        if start > position:
+            missing.append((position, start))
+        position = max(position, end)
+    return UploadSession(
+        **session,
+        received=sum(end - start for start, end in stored),
+        offset=missing[0][0] if missing else session["file_size"],
+        missing=missing
+    )
+
+def file_sha256(path: Path) -> str:
+    content_hash = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b""):
+            content_hash.update(chunk)
+    return content_hash.hexdigest()
+
+@api_router.post("/uploads", response_model=UploadSession, status_code=201)
+async def create_upload(request: UploadSessionCreate):
+    """
+    Start a resumable upload. Send the file with PUT /uploads/{id} and a
+    Content-Range header, in any order and in parallel if you like; GET
+    /uploads/{id} tells what is still missing after an interruption, and
+    POST /uploads/{id}/complete queues the transcription job.
+    """
+    validate_upload_type(request.filename, request.content_type)
+    if request.file_size > MAX_UPLOAD_SIZE:
+        raise HTTPException(status_code=413, detail="File size exceeds 200MB limit")
+    
+    upload_id = str(uuid.uuid4())
+    try:
+        # Sparse file of the final size, so ranges can land in any order
+        async with aiofiles.open(upload_part_path(upload_id), "wb") as f:
+            await f.truncate(request.file_size)
+        
+        now = datetime.utcnow()
+        session = {
+            **request.dict(),
+            "id": upload_id,
+            "state": UploadState.uploading,
+            "ranges": [],
+            "created_at": now,
+            "updated_at": now,
+            "expires_at": now + timedelta(hours=UPLOAD_SESSION_TTL_HOURS)
+        }
+        await db.upload_sessions.insert_one(session)
+        return upload_session_status(session)
+    except Exception as e:
+        upload_part_path(upload_id).unlink(missing_ok=True)
+        logger.error(f"Error creating upload session: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to create upload session")
+
+@api_router.get("/uploads/{upload_id}", response_model=UploadSession)
+async def get_upload(upload_id: str):
+    """
+    Progress of a resumable upload, including the byte ranges still missing
+    """
+    session = await db.upload_sessions.find_one({"id": upload_id}, {"_id": 0})
+    if not session:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return upload_session_status(session)
+
+@api_router.put("/uploads/{upload_id}", response_model=UploadSession)
+async def upload_range(upload_id: str, request: Request):
+    """
+    Store one byte range of a resumable upload. The body is the raw bytes
+    named by the Content-Range header (e.g. "bytes 0-8388607/209715200").
+    Sending a range again is harmless.
+    """
+    try:
+        session = await db.upload_sessions.find_one({"id": upload_id}, {"_id": 0})
+        if not session:
+            raise HTTPException(status_code=404, detail="Upload session not found")
+        if session.get("state", UploadState.uploading) != UploadState.uploading:
+            raise HTTPException(status_code=409, detail="Upload is being completed")
+        
+        match = CONTENT_RANGE.fullmatch(request.headers.get("content-range", ""))
+        if not match:
+            raise HTTPException(status_code=400, detail="A Content-Range header like 'bytes 0-1023/4096' is required")
+        start, end = int(match.group(1)), int(match.group(2)) + 1
+        if start >= end or end > session["file_size"] or match.group(3) not in ("*", str(session["file_size"])):
+            raise HTTPException(
+                status_code=416, detail=f"Range must lie within the {session['file_size']} byte upload"
+            )
+        
+        written = 0
+        async with aiofiles.open(upload_part_path(upload_id), "r+b") as f:
+            await f.seek(start)
+            async for chunk in request.stream():
+                written += len(chunk)
+                if start + written > end:
+                    raise HTTPException(status_code=400, detail="Body is longer than the Content-Range")
+                await f.write(chunk)
+        if written != end - start:
+            # Only whole ranges are recorded; the client sends this one again
+            raise HTTPException(status_code=400, detail=f"Body has {written} bytes, Content-Range names {end - start}")
+        BYTES_RECEIVED.inc(written, source="upload")
+        
+        now = datetime.utcnow()
+        # Only recorded if no completion claimed the session while the range was written
+        accepted = await db.upload_sessions.update_one(
+            {"id": upload_id, "state": {"$ne": UploadState.completing}},
+            {
+                "$push": {"ranges": [start, end]},
+                "$set": {"updated_at": now, "expires_at": now + timedelta(hours=UPLOAD_SESSION_TTL_HOURS)}
+            }
+        )
+        if not accepted.matched_count and await db.upload_sessions.find_one({"id": upload_id}, {"_id": 1}):
+            raise HTTPException(status_code=409, detail="Upload is being completed")
+        session = await db.upload_sessions.find_one({"id": upload_id}, {"_id": 0})
+        if not session:
+            # Expired or completed while this range was being written
+            raise HTTPException(status_code=404, detail="Upload session not found")
+        return upload_session_status(session)
+    except HTTPException:
+        raise
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    except Exception as e:
+        logger.error(f"Error storing upload range: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to store upload range")
+
+@api_router.post("/uploads/{upload_id}/complete", response_model=TranscriptionJob, status_code=202)
+async def complete_upload(upload_id: str):
     """
-    Get all transcriptions from database
+    Finish a resumable upload and queue its transcription (see GET /jobs/{id})
     """
     try:
-        transcriptions = await db.transcriptions.find().sort("timestamp", -1).to_list(100)
-        return transcriptions
+        session = await db.upload_sessions.find_one({"id": upload_id}, {"_id": 0})
+        if not session:
+            raise HTTPException(status_code=404, detail="Upload session not found")
+        status = upload_session_status(session)
+        if status.missing:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Upload is incomplete: {session['file_size'] - status.received} bytes missing from offset {status.offset}"
+            )
+        
+        # Claim the session, so completing twice never queues two jobs
+        claimed_at = datetime.utcnow()
+        claimed = await db.upload_sessions.find_one_and_update(
+            {"id": upload_id, "$or": [
+                {"state": {"$ne": UploadState.completing}},
+                {"claimed_at": {"$lt": claimed_at - timedelta(seconds=UPLOAD_COMPLETE_CLAIM_SECONDS)}}
+            ]},
+            {"$set": {"state": UploadState.completing, "claimed_at": claimed_at, "updated_at": claimed_at}}
+        )
+        if not claimed:
+            raise HTTPException(status_code=409, detail="Upload is already being completed")
+        
+        part_path = upload_part_path(upload_id)
+        spool_path = UPLOAD_DIR / f"{uuid.uuid4()}{Path(session['filename']).suffix.lower()}"
+        language = session["language"]
+        try:
+            content_hash = await asyncio.to_thread(file_sha256, part_path)
+            cached = None
+            if session["use_cache"]:
+                cached = await lookup_cached_transcription(content_hash, language, session["trim_silence"])
+            if cached:
+                job = await record_cached_job(session["filename"], session["file_size"], language, cached)
+            else:
+                # A second link, so the upload survives if the job cannot be queued
+                spool_path.hardlink_to(part_path)
+                job = await enqueue_transcription_job(
+                    spool_path, session["filename"], session["file_size"], language, content_hash, session["trim_silence"]
+                )
+        except Exception:
+            # Hand the session back so the client can complete it again
+            spool_path.unlink(missing_ok=True)
+            await db.upload_sessions.update_one(
+                {"id": upload_id, "claimed_at": claimed_at}, {"$set": {"state": UploadState.uploading}}
+            )
+            raise
+        
+        await db.upload_sessions.delete_one({"id": upload_id})
+        part_path.unlink(missing_ok=True)
+        return job
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error completing upload {upload_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to complete upload: {str(e)}")
+
+@api_router.delete("/uploads/{upload_id}")
+async def delete_upload(upload_id: str):
+    """
+    Abandon a resumable upload and free its disk space
+    """
+    result = await db.upload_sessions.delete_one({"id": upload_id})
+    if result.deleted_count == 0:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    upload_part_path(upload_id).unlink(missing_ok=True)
+    return {"message": "Upload deleted successfully"}
+
+@api_router.websocket("/ws/transcribe")
+async def live_transcribe(
+    websocket: WebSocket,
+    language: str = "auto",
+    sample_rate: int = 16000,
+    filename: str = "Live recording"
+):
+    """
+    Live transcription. The client streams 16-bit little-endian mono PCM at
+    sample_rate as binary messages and sends {"type": "stop"} (or closes the
+    socket) when the recording ends. The server answers with JSON events:
+    partial (provisional text of the window being recorded), final (text of a
+    finished window, appended to the transcript for good), error, and done
+    (the stored transcription). The transcript is saved to db.transcriptions
+    whichever way the session ends.
+    """
+    await websocket.accept()
+    if sample_rate not in LIVE_SAMPLE_RATES:
+        await websocket.send_json({
+            "type": "error",
+            "detail": f"Unsupported sample_rate. Supported: {', '.join(map(str, LIVE_SAMPLE_RATES))}"
+        })
+        await websocket.close(code=1003)
+        return
+    
+    session_id = str(uuid.uuid4())
+    requested_language = language
+    backend = select_transcription_backend(LIVE_WINDOW_SECONDS)
+    window_frames = int(LIVE_WINDOW_SECONDS * sample_rate)
+    overlap_frames = int(LIVE_WINDOW_OVERLAP_SECONDS * sample_rate)
+    
+    buffer = bytearray()  # audio not yet transcribed for good, from frame buffer_start on
+    buffer_start = 0
+    received = 0  # frames
+    windows_cut = 0
+    windows_pending = 0
+    words: List[str] = []
+    windows: asyncio.Queue = asyncio.Queue()
+    fan_out = asyncio.Semaphore(LIVE_WINDOW_CONCURRENCY)
+    send_lock = asyncio.Lock()
+    connected = True
+    tasks: List[asyncio.Task] = []
+    
+    async def send(event: dict):
+        nonlocal connected
+        if not connected:
+            return
+        try:
+            async with send_lock:
+                await websocket.send_json(event)
+        except Exception:
+            # The client went away; keep transcribing so the recording is still saved
+            connected = False
+    
+    async def transcribe_pcm(pcm: bytes, name: str) -> str:
+        nonlocal language
+        path = UPLOAD_DIR / f"{session_id}.{name}.wav"
+        try:
+            async with aiofiles.open(path, "wb") as f:
+                await f.write(wav_header(1, sample_rate, len(pcm)) + pcm)
+            transcript = await whisper_transcribe(path, language, backend)
+        finally:
+            path.unlink(missing_ok=True)
+        if language == "auto" and transcript.language:
+            # Later windows are sent in the language the first one was heard in
+            language = transcript.language
+        return transcript.text
+    
+    def new_words(text: str) -> List[str]:
+        # Drop the words the overlap with the previous window repeats
+        tail = words[-30:]
+        return stitch_transcripts([" ".join(tail), text]).split()[len(tail):]
+    
+    async def transcribe_window(index: int, pcm: bytes) -> str:
+        async with fan_out:
+            with TRANSCRIPTION_STAGE_SECONDS.time(stage="live_window"):
+                return await transcribe_pcm(pcm, f"window{index}")
+    
+    def cut_window(end: int):
+        nonlocal buffer_start, windows_cut, windows_pending
+        pcm = bytes(buffer[:(end - buffer_start) * 2])
+        task = asyncio.create_task(transcribe_window(windows_cut, pcm))
+        tasks.append(task)
+        windows.put_nowait((windows_cut, buffer_start, end, task))
+        windows_cut += 1
+        windows_pending += 1
+        # The next window starts a little early so no word is cut in half
+        next_start = max(end - overlap_frames, buffer_start)
+        del buffer[:(next_start - buffer_start) * 2]
+        buffer_start = next_start
+    
+    async def emit_finals():
+        # Windows are transcribed concurrently but appended strictly in order
+        nonlocal windows_pending
+        while True:
+            item = await windows.get()
+            if item is None:
+                return
+            index, start, end, task = item
+            try:
+                text = await task
+            except Exception as e:
+                logger.error(f"Live transcription window {index} failed: {str(e)}")
+                await send({"type": "error", "index": index, "detail": f"Transcription failed: {str(e)}"})
+                text = ""
+            added = new_words(text)
+            words.extend(added)
+            windows_pending -= 1
+            await send({
+                "type": "final",
+                "index": index,
+                "start": start / sample_rate,
+                "end": end / sample_rate,
+                "text": " ".join(added)
+            })
+    
+    async def emit_partial(index: int, pcm: bytes):
+        try:
+            text = await transcribe_pcm(pcm, f"partial{index}")
+        except Exception as e:
+            logger.warning(f"Live partial transcription failed: {str(e)}")
+            return
+        # Stale once the window it previewed has been cut
+        if index == windows_cut:
+            await send({"type": "partial", "index": index, "text": " ".join(new_words(text))})
+    
+    finals = asyncio.create_task(emit_finals())
+    tasks.append(finals)
+    partial: Optional[asyncio.Task] = None
+    last_partial = time.monotonic()
+    try:
+        while received < LIVE_MAX_SECONDS * sample_rate:
+            try:
+                message = await asyncio.wait_for(websocket.receive(), LIVE_IDLE_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                await send({"type": "error", "detail": "No audio received, ending the session"})
+                break
+            if message["type"] == "websocket.disconnect":
+                connected = False
+                break
+            if message.get("text") is not None:
+                try:
+                    if json.loads(message["text"]).get("type") == "stop":
+                        break
+                except (ValueError, AttributeError):
+                    await send({"type": "error", "detail": "Expected a JSON control message"})
+                continue
+            
+            data = message.get("bytes") or b""
+            BYTES_RECEIVED.inc(len(data), source="websocket")
+            buffer.extend(data)
+            received = buffer_start + len(buffer) // 2
+            while received - buffer_start >= window_frames:
+                cut_window(buffer_start + window_frames)
+            
+            # Partials only while finals keep up, so a slow engine never adds to the lag
+            now = time.monotonic()
+            if (
+                not windows_pending and (partial is None or partial.done())
+                and now - last_partial >= LIVE_PARTIAL_INTERVAL_SECONDS
+                and received - buffer_start > overlap_frames + sample_rate // 2
+            ):
+                last_partial = now
+                partial = asyncio.create_task(emit_partial(windows_cut, bytes(buffer[:(received - buffer_start) * 2])))
+                tasks.append(partial)
+        
+        # Transcribe whatever the last full window did not cover
+        if received > buffer_start + (overlap_frames if windows_cut else 0):
+            cut_window(received)
+        windows.put_nowait(None)
+        await finals
+        
+        if not received:
+            if connected:
+                await websocket.close()
+            return
+        
+        transcription_data = {
+            "id": session_id,
+            "text": " ".join(words),
+            "language": language,
+            "requested_language": requested_language,
+            "filename": filename,
+            "file_size": received * 2,
+            "duration": received / sample_rate,
+            "preprocessing": [],
+            "speech_spans": None,
+            "content_hash": None,
+            "model": f"{backend.name}:{backend.model}",
+            "search_language": search_language(language),
+            "timestamp": datetime.utcnow()
+        }
+        try:
+            with TRANSCRIPTION_STAGE_SECONDS.time(stage="mongo_insert"):
+                await db.transcriptions.insert_one(transcription_data)
+        except Exception as e:
+            logger.error(f"Error storing live transcription {session_id}: {str(e)}")
+            await send({"type": "error", "detail": "Failed to store transcription"})
+            if connected:
+                await websocket.close(code=1011)
+            return
+        await index_transcription(session_id, transcription_data["text"])
+        
+        await send({"type": "done", "transcription": jsonable_encoder(TranscriptionResponse(**transcription_data))})
+        if connected:
+            await websocket.close()
+    finally:
+        for task in tasks:
+            task.cancel()
+
+@api_router.get("/jobs/{job_id}", response_model=TranscriptionJob)
+async def get_job(job_id: str):
+    """
+    Get the state of a transcription job, including the result once it is done
+    """
+    job = await db.transcription_jobs.find_one({"id": job_id})
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    job = TranscriptionJob(**job)
+    if job.state == JobState.done and job.transcription_id:
+        transcription = await db.transcriptions.find_one({"id": job.transcription_id})
+        if transcription:
+            job.result = TranscriptionResponse(**transcription)
+    return job
+
+@api_router.get("/jobs", response_model=List[TranscriptionJob])
+async def get_jobs(state: Optional[JobState] = None, limit: int = Query(default=50, ge=1, le=500)):
+    """
+    List recent transcription jobs, optionally filtered by state
+    """
+    query = {"state": state} if state else {}
+    jobs = await db.transcription_jobs.find(query).sort("created_at", -1).to_list(limit)
+    return [TranscriptionJob(**job) for job in jobs]
+
+def encode_list_cursor(item: dict) -> str:
+    position = {"t": item["timestamp"].isoformat(), "i": item["id"]}
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+def decode_list_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(position["t"]), position["i"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@api_router.get("/transcriptions", response_model=List[TranscriptionListItem])
+async def get_transcriptions(
+    limit: int = Query(default=50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(
+        default=None,
+        description="Comma-separated fields to return; defaults to everything except the full text"
+    )
+):
+    """
+    Get transcriptions newest first, one page at a time.
+    Pass the X-Next-Cursor response header back as cursor for the next page.
+    """
+    selected = set(fields.split(",")) if fields else set(TRANSCRIPTION_LIST_DEFAULT_FIELDS)
+    unknown = selected - set(TranscriptionListItem.model_fields)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    # The cursor is built from these, so they are always returned
+    selected |= {"id", "timestamp"}
+    
+    projection = {"_id": 0, **{field: 1 for field in selected if field != "preview"}}
+    if "preview" in selected:
+        # Let the server cut the preview so full texts never cross the wire
+        projection["preview"] = {"$substrCP": [{"$ifNull": ["$text", ""]}, 0, TRANSCRIPTION_PREVIEW_CHARS]}
+    
+    query = {}
+    if cursor:
+        timestamp, last_id = decode_list_cursor(cursor)
+        query = {"$or": [
+            {"timestamp": {"$lt": timestamp}},
+            {"timestamp": timestamp, "id": {"$lt": last_id}}
+        ]}
+    
+    try:
+        documents = await db.transcriptions.find(query, projection).sort(
+            [("timestamp", -1), ("id", -1)]
+        ).limit(limit + 1).to_list(limit + 1)
     except Exception as e:
         logger.error(f"Error retrieving transcriptions: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to retrieve transcriptions")
+    
+    headers = {}
+    if len(documents) > limit:
+        documents = documents[:limit]
+        headers["X-Next-Cursor"] = encode_list_cursor(documents[-1])
+    
+    # Validate and serialize in one pass through pydantic-core
+    items = transcription_list_adapter.validate_python(documents)
+    return Response(
+        content=transcription_list_adapter.dump_json(items, exclude_none=True),
+        media_type="application/json",
+        headers=headers
+    )
 
 @api_router.get("/transcriptions/{transcription_id}")
 async def get_transcription(transcription_id: str):
@@ -187,10 +1687,12 @@ async def get_transcription(transcription_id: str):
     Get specific transcription by ID
     """
     try:
-        transcription = await db.transcriptions.find_one({"id": transcription_id})
+        transcription = await db.transcriptions.find_one({"id": transcription_id}, {"_id": 0})
         if not transcription:
             raise HTTPException(status_code=404, detail="Transcription not found")
         return transcription
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error retrieving transcription: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to retrieve transcription")
@@ -204,118 +1706,395 @@ async def delete_transcription(transcription_id: str):
         result = await db.transcriptions.delete_one({"id": transcription_id})
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Transcription not found")
+        await db.transcription_cache.delete_many({"transcription_id": transcription_id})
+        await asyncio.to_thread(vector_index.remove, transcription_id)
         return {"message": "Transcription deleted successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error deleting transcription: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to delete transcription")
 
-@api_router.post("/summarize", response_model=SummaryResponse)
-async def create_summary(request: SummaryRequest):
+async def rank_text_matches(collection: str, q: str, language: Optional[str], fields: List[str], depth: int) -> List[dict]:
+    """
+    Best text matches in one collection. Each stored language is searched with
+    its own stemmer, since a $text query stems the query words in one language.
     """
-    Create a structured summary of a transcription in the specified language
+    query = {}
+    if language:
+        languages = [search_language(language)]
+        query["language"] = language
+    else:
+        languages = await db[collection].distinct("search_language")
+    
+    async def rank(text_language: str) -> List[dict]:
+        return await db[collection].find(
+            {"$text": {"$search": q, "$language": text_language}, "search_language": text_language, **query},
+            {"_id": 0, "score": {"$meta": "textScore"}, **{field: 1 for field in fields}}
+        ).sort([("score", {"$meta": "textScore"})]).limit(depth).to_list(depth)
+    
+    ranked = await asyncio.gather(*(rank(text_language) for text_language in languages))
+    return [document for documents in ranked for document in documents]
+
+@api_router.get("/search", response_model=SearchResponse)
+async def search(
+    q: str = Query(min_length=1, max_length=500, description="Words, \"quoted phrases\" and -excluded words"),
+    limit: int = Query(default=20, ge=1, le=100),
+    skip: int = Query(default=0, ge=0),
+    language: Optional[str] = Query(default=None, description="Only match transcriptions and summaries in this language")
+):
     """
+    Search transcription texts and summaries, best matches first.
+    Each hit carries a snippet around the matches and the (start, end)
+    offsets of the matched words in it; pass next_skip as skip for more.
+    """
+    if skip + limit > SEARCH_MAX_RESULTS:
+        raise HTTPException(status_code=400, detail=f"Search results are limited to the first {SEARCH_MAX_RESULTS}")
+    depth = skip + limit + 1
+    
     try:
-        # Get the transcription from database
-        transcription = await db.transcriptions.find_one({"id": request.transcription_id})
-        if not transcription:
-            raise HTTPException(status_code=404, detail="Transcription not found")
-        
-        transcription_text = transcription.get("text", "")
-        if not transcription_text.strip():
-            raise HTTPException(status_code=400, detail="Transcription text is empty")
-        
-        # Language mapping for prompts
-        language_prompts = {
-            "ru": "русском языке",
-            "en": "English",
-            "es": "español",
-            "fr": "français", 
-            "de": "Deutsch",
-            "it": "italiano",
-            "pt": "português",
-            "ja": "日本語",
-            "ko": "한국어",
-            "zh": "中文",
-            "ar": "العربية"
-        }
-        
-        target_language = language_prompts.get(request.summary_language, "English")
+        # Rank on metadata only; texts are fetched for the returned page alone
+        transcription_hits, summary_hits = await asyncio.gather(
+            rank_text_matches("transcriptions", q, language, ["id", "language", "filename", "timestamp"], depth),
+            rank_text_matches("summaries", q, language, ["id", "transcription_id", "language", "timestamp"], depth)
+        )
+        for hit in transcription_hits:
+            hit.update(type="transcription", transcription_id=hit["id"])
+        for hit in summary_hits:
+            hit["type"] = "summary"
+        ranked = sorted(transcription_hits + summary_hits, key=lambda hit: hit["score"], reverse=True)
+        page = ranked[skip:skip + limit]
         
-        # Create structured summary prompt
-        summary_prompt = f"""Please create a structured summary of the following transcription in {target_language}. 
+        texts, parents, summaries = await asyncio.gather(
+            db.transcriptions.find(
+                {"id": {"$in": [hit["id"] for hit in page if hit["type"] == "transcription"]}},
+                {"_id": 0, "id": 1, "text": 1}
+            ).to_list(None),
+            db.transcriptions.find(
+                {"id": {"$in": [hit["transcription_id"] for hit in page if hit["type"] == "summary"]}},
+                {"_id": 0, "id": 1, "filename": 1}
+            ).to_list(None),
+            db.summaries.find(
+                {"id": {"$in": [hit["id"] for hit in page if hit["type"] == "summary"]}},
+                {"_id": 0, "id": 1, "summary": 1}
+            ).to_list(None)
+        )
+    except Exception as e:
+        logger.error(f"Search error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Search failed")
+    
+    texts = {document["id"]: document.get("text", "") for document in texts}
+    filenames = {document["id"]: document.get("filename") for document in parents}
+    texts.update((document["id"], document.get("summary", "")) for document in summaries)
+    
+    terms = query_terms(q)
+    hits = []
+    for hit in page:
+        if hit["type"] == "summary":
+            # Summaries outlive deleted transcriptions; those must not be served
+            if hit["transcription_id"] not in filenames:
+                continue
+            hit["filename"] = filenames[hit["transcription_id"]]
+        hit["snippet"], hit["highlights"] = snippet(texts.get(hit["id"], ""), terms, SEARCH_SNIPPET_CHARS)
+        hits.append(SearchHit(**hit))
+    
+    return SearchResponse(
+        query=q,
+        hits=hits,
+        next_skip=skip + limit if len(ranked) > skip + limit and skip + limit < SEARCH_MAX_RESULTS else None
+    )
 
-Format the summary with these sections:
-1. **Основные темы** (Main Topics) - key themes discussed
-2. **Ключевые моменты** (Key Points) - most important points mentioned
-3. **Выводы и заключения** (Conclusions) - main conclusions or takeaways
-4. **Дополнительные детали** (Additional Details) - any noteworthy details
+@api_router.get("/semantic-search", response_model=List[SemanticSearchHit])
+async def semantic_search(
+    q: str = Query(min_length=1, max_length=2000),
+    limit: int = Query(default=10, ge=1, le=100)
+):
+    """
+    Find the transcript passages closest in meaning to q, best first
+    """
+    try:
+        hits = await asyncio.to_thread(vector_index.search, embed(q), limit)
+        transcriptions = await db.transcriptions.find(
+            {"id": {"$in": list({owner for owner, _, _, _ in hits})}},
+            {"_id": 0, "id": 1, "filename": 1, "language": 1, "timestamp": 1, "text": 1}
+        ).to_list(None)
+    except Exception as e:
+        logger.error(f"Semantic search error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Semantic search failed")
+    
+    transcriptions = {transcription["id"]: transcription for transcription in transcriptions}
+    results = []
+    for owner, start, end, score in hits:
+        transcription = transcriptions.get(owner)
+        if not transcription:
+            continue
+        results.append(SemanticSearchHit(
+            transcription_id=owner,
+            filename=transcription.get("filename"),
+            language=transcription.get("language"),
+            timestamp=transcription["timestamp"],
+            score=score,
+            start=start,
+            end=end,
+            text=transcription.get("text", "")[start:end]
+        ))
+    return results
 
-Make the summary comprehensive but concise, highlighting the most important information.
+def estimate_tokens(text: str) -> int:
+    """
+    Conservative token estimate: about 4 bytes per token for English, and
+    non-Latin scripts use more tokens per UTF-8 byte, so 3 bytes is a safe bound
+    """
+    return len(text.encode("utf-8")) // 3
 
-Transcription text:
-{transcription_text}
+def split_for_summary(text: str, max_tokens: int) -> List[str]:
+    """
+    Split text on word boundaries into chunks of at most max_tokens (estimated)
+    """
+    max_bytes = max_tokens * 3
+    chunks: List[str] = []
+    current: List[str] = []
+    current_bytes = 0
+    for word in text.split():
+        word_bytes = len(word.encode("utf-8")) + 1
+        # Scripts without spaces produce very long "words"; cut them by characters
+        while word_bytes > max_bytes:
+            cut = len(word) * max_bytes // word_bytes
+            chunks.extend([" ".join(current)] if current else [])
+            chunks.append(word[:cut])
+            current, current_bytes = [], 0
+            word = word[cut:]
+            word_bytes = len(word.encode("utf-8")) + 1
+        if current_bytes + word_bytes > max_bytes and current:
+            chunks.append(" ".join(current))
+            current, current_bytes = [], 0
+        current.append(word)
+        current_bytes += word_bytes
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
 
-Please provide the summary in {target_language}:"""
+async def condense_transcript(text: str, target_language: str) -> str:
+    """
+    Map step: summarize token-bounded chunks concurrently, repeating on the
+    joined notes until they fit in a single reduce prompt
+    """
+    fan_out = asyncio.Semaphore(SUMMARY_CHUNK_CONCURRENCY)
+    
+    async def summarize_chunk(part: int, parts: int, chunk_text: str) -> str:
+        async with fan_out:
+            response = await chat_completion(
+                model=SUMMARY_MODEL,
+                messages=[
+                    {"role": "system", "content": SUMMARY_SYSTEM_PROMPT.format(target_language=target_language)},
+                    {"role": "user", "content": SUMMARY_MAP_PROMPT.format(
+                        part=part, parts=parts, target_language=target_language, chunk_text=chunk_text
+                    )}
+                ],
+                max_tokens=SUMMARY_CHUNK_MAX_TOKENS,
+                temperature=SUMMARY_TEMPERATURE
+            )
+        return response.choices[0].message.content
+    
+    while True:
+        chunks = split_for_summary(text, SUMMARY_CHUNK_TOKENS)
+        partials = await asyncio.gather(*(
+            summarize_chunk(index + 1, len(chunks), chunk) for index, chunk in enumerate(chunks)
+        ))
+        condensed = "\n\n".join(f"Part {index + 1}:\n{partial}" for index, partial in enumerate(partials))
+        # A single chunk cannot be condensed any further
+        if estimate_tokens(condensed) <= SUMMARY_MAP_REDUCE_THRESHOLD_TOKENS or len(chunks) == 1:
+            return condensed
+        text = condensed
 
-        # Generate summary using OpenAI GPT
-        response = openai_client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": f"You are a helpful assistant that creates structured summaries in {target_language}. Always format your response clearly with the requested sections."},
-                {"role": "user", "content": summary_prompt}
-            ],
-            max_tokens=1500,
-            temperature=0.3
+async def build_summary_messages(transcription_text: str, target_language: str) -> List[dict]:
+    """
+    Prompt for the final summary; long transcripts are condensed first
+    """
+    if estimate_tokens(transcription_text) > SUMMARY_MAP_REDUCE_THRESHOLD_TOKENS:
+        user_prompt = SUMMARY_REDUCE_PROMPT.format(
+            target_language=target_language,
+            partial_summaries=await condense_transcript(transcription_text, target_language)
         )
+    else:
+        user_prompt = SUMMARY_USER_PROMPT.format(
+            target_language=target_language, transcription_text=transcription_text
+        )
+    return [
+        {"role": "system", "content": SUMMARY_SYSTEM_PROMPT.format(target_language=target_language)},
+        {"role": "user", "content": user_prompt}
+    ]
+
+async def lookup_cached_summary(transcription_id: str, summary_language: str) -> Optional[SummaryResponse]:
+    """
+    Return the newest summary generated with the current prompt, if any
+    """
+    summary = await db.summaries.find_one(
+        {"transcription_id": transcription_id, "language": summary_language, "prompt_version": SUMMARY_PROMPT_VERSION},
+        sort=[("timestamp", -1)]
+    )
+    if not summary:
+        return None
+    
+    # Summaries outlive deleted transcriptions; those must not be served
+    if not await db.transcriptions.find_one({"id": transcription_id}, {"_id": 1}):
+        return None
+    return SummaryResponse(**summary, cached=True)
+
+async def get_text_to_summarize(transcription_id: str) -> str:
+    # Get the transcription from database
+    transcription = await db.transcriptions.find_one({"id": transcription_id}, {"text": 1})
+    if not transcription:
+        raise HTTPException(status_code=404, detail="Transcription not found")
+    
+    transcription_text = transcription.get("text", "")
+    if not transcription_text.strip():
+        raise HTTPException(status_code=400, detail="Transcription text is empty")
+    return transcription_text
+
+async def save_summary(request: SummaryRequest, summary_text: str) -> SummaryResponse:
+    # Create summary record
+    summary_data = {
+        "id": str(uuid.uuid4()),
+        "transcription_id": request.transcription_id,
+        "summary": summary_text,
+        "language": request.summary_language,
+        "prompt_version": SUMMARY_PROMPT_VERSION,
+        "search_language": search_language(request.summary_language),
+        "timestamp": datetime.utcnow()
+    }
+    
+    # Save to database
+    await db.summaries.insert_one(summary_data)
+    
+    return SummaryResponse(**summary_data)
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data), ensure_ascii=False)}\n\n"
+
+@api_router.post("/summarize", response_model=SummaryResponse)
+async def create_summary(request: SummaryRequest):
+    """
+    Create a structured summary of a transcription in the specified language.
+    A summary already generated with the current prompt is returned from the
+    cache unless force_refresh is set.
+    """
+    try:
+        if not request.force_refresh:
+            cached = await lookup_cached_summary(request.transcription_id, request.summary_language)
+            if cached:
+                return cached
         
-        summary_text = response.choices[0].message.content
-        
-        # Create summary record
-        summary_id = str(uuid.uuid4())
-        summary_data = {
-            "id": summary_id,
-            "transcription_id": request.transcription_id,
-            "summary": summary_text,
-            "language": request.summary_language,
-            "timestamp": datetime.utcnow()
-        }
-        
-        # Save to database
-        await db.summaries.insert_one(summary_data)
+        transcription_text = await get_text_to_summarize(request.transcription_id)
+        target_language = SUMMARY_LANGUAGE_NAMES.get(request.summary_language, "English")
         
-        return SummaryResponse(
-            id=summary_id,
-            transcription_id=request.transcription_id,
-            summary=summary_text,
-            language=request.summary_language,
-            timestamp=summary_data["timestamp"]
+        # Generate summary using OpenAI GPT
+        response = await chat_completion(
+            model=SUMMARY_MODEL,
+            messages=await build_summary_messages(transcription_text, target_language),
+            max_tokens=SUMMARY_MAX_TOKENS,
+            temperature=SUMMARY_TEMPERATURE
         )
         
+        return await save_summary(request, response.choices[0].message.content)
+        
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Summary creation error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Summary creation failed: {str(e)}")
 
+@api_router.post("/summarize/stream")
+async def stream_summary(request: SummaryRequest):
+    """
+    Same as /summarize, but relays the summary as server-sent events while it
+    is generated: "status" while long transcripts are condensed, "delta" with
+    each piece of text, then "done" with the stored SummaryResponse (or
+    "error"). The summary is saved only once the stream completes.
+    """
+    if not request.force_refresh:
+        cached = await lookup_cached_summary(request.transcription_id, request.summary_language)
+        if cached:
+            async def replay_cached():
+                yield sse_event("delta", {"text": cached.summary})
+                yield sse_event("done", cached)
+            return StreamingResponse(replay_cached(), media_type="text/event-stream", headers=SSE_HEADERS)
+    
+    transcription_text = await get_text_to_summarize(request.transcription_id)
+    target_language = SUMMARY_LANGUAGE_NAMES.get(request.summary_language, "English")
+    
+    async def generate():
+        # Flush headers right away so proxies and the browser see the stream open
+        yield ": stream open\n\n"
+        try:
+            if estimate_tokens(transcription_text) > SUMMARY_MAP_REDUCE_THRESHOLD_TOKENS:
+                yield sse_event("status", {"stage": "condensing"})
+            messages = await build_summary_messages(transcription_text, target_language)
+            
+            pieces = []
+            async for text in chat_completion_stream(
+                model=SUMMARY_MODEL,
+                messages=messages,
+                max_tokens=SUMMARY_MAX_TOKENS,
+                temperature=SUMMARY_TEMPERATURE
+            ):
+                pieces.append(text)
+                yield sse_event("delta", {"text": text})
+            
+            summary = await save_summary(request, "".join(pieces))
+            yield sse_event("done", summary)
+        except Exception as e:
+            logger.error(f"Summary stream error: {str(e)}")
+            yield sse_event("error", {"detail": f"Summary creation failed: {str(e)}"})
+    
+    return StreamingResponse(generate(), media_type="text/event-stream", headers=SSE_HEADERS)
+
 @api_router.get("/summaries/{transcription_id}")
 async def get_summaries_for_transcription(transcription_id: str):
     """
     Get all summaries for a specific transcription
     """
     try:
-        summaries = await db.summaries.find({"transcription_id": transcription_id}).sort("timestamp", -1).to_list(100)
+        summaries = await db.summaries.find({"transcription_id": transcription_id}, {"_id": 0}).sort("timestamp", -1).to_list(100)
         return summaries
     except Exception as e:
         logger.error(f"Error retrieving summaries: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to retrieve summaries")
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """
+    Prometheus scrape endpoint
+    """
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
 # Include the router in the main app
 app.include_router(api_router)
 
+# Turn away oversize and non-media uploads while their body streams in.
+# Added before CORS so CORS stays outermost and the errors carry its headers.
+app.add_middleware(UploadAdmissionMiddleware, rules=[
+    admission_rule(
+        "POST", r"/api/transcribe", MAX_UPLOAD_SIZE + UPLOAD_FORM_OVERHEAD, MAX_UPLOAD_SIZE,
+        "File size exceeds 200MB limit"
+    ),
+    # Batch files are type-checked one by one in the endpoint, so one bad file does not fail the rest
+    admission_rule(
+        "POST", r"/api/transcribe/batch", (MAX_UPLOAD_SIZE + UPLOAD_FORM_OVERHEAD) * TRANSCRIBE_BATCH_MAX_FILES,
+        MAX_UPLOAD_SIZE, "File size exceeds 200MB limit", check_content=False
+    ),
+    admission_rule(
+        "PUT", r"/api/uploads/[^/]+", MAX_UPLOAD_SIZE, MAX_UPLOAD_SIZE, "Range exceeds the 200MB upload limit"
+    ),
+])
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Configure logging
@@ -325,10 +2104,149 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def run_migrations():
+    # Registered first so indexes exist before the job workers query anything
+    await migrate(db)
+
+JOB_REQUEUE_FIELDS = {"_id": 0, "id": 1, "spool_path": 1, "file_size": 1, "duration": 1, "estimated_seconds": 1, "created_at": 1}
+
+async def requeue_jobs(jobs: List[dict]):
+    """
+    Feed jobs left over from a restart or a dead process to the workers,
+    waiting for room in the queue when there are more than it holds. Jobs
+    whose upload is gone are marked failed.
+    """
+    runnable = []
+    for job in jobs:
+        if Path(job["spool_path"]).exists():
+            runnable.append(job)
+        else:
+            await update_job(job["id"], state=JobState.failed, error="Upload was lost before processing")
+    for job in sorted(runnable, key=job_priority):
+        await job_queue.put((job_priority(job), job["id"]))
+    if runnable:
+        logger.info(f"Re-queued {len(runnable)} unfinished transcription jobs")
+
+async def reclaim_expired_jobs():
+    """
+    Periodically queue again the running jobs whose lease has lapsed
+    """
+    while True:
+        try:
+            cutoff = datetime.utcnow() - timedelta(seconds=TRANSCRIPTION_JOB_LEASE_SECONDS)
+            # Jobs from before leases have no heartbeat_at, which matches None
+            expired = await db.transcription_jobs.find(
+                {"state": JobState.running, "$or": [{"heartbeat_at": {"$lt": cutoff}}, {"heartbeat_at": None}]},
+                {**JOB_REQUEUE_FIELDS, "heartbeat_at": 1}
+            ).to_list(None)
+            reclaimed = []
+            for job in expired:
+                # Conditional on the lease seen, so only one process takes a job back
+                taken = await db.transcription_jobs.update_one(
+                    {"id": job["id"], "state": JobState.running, "heartbeat_at": job.get("heartbeat_at")},
+                    {"$set": {"state": JobState.queued, "progress": 0.0, "owner": None, "updated_at": datetime.utcnow()}}
+                )
+                if taken.modified_count:
+                    reclaimed.append(job)
+            await requeue_jobs(reclaimed)
+        except Exception as e:
+            logger.error(f"Error reclaiming expired transcription jobs: {str(e)}")
+        await asyncio.sleep(TRANSCRIPTION_JOB_LEASE_SECONDS)
+
+@app.on_event("startup")
+async def start_transcription_workers():
+    # Queued jobs run if their upload survived; another live process may run
+    # some of them first, which the claim in process_job settles
+    queued = await db.transcription_jobs.find({"state": JobState.queued}, JOB_REQUEUE_FIELDS).to_list(None)
+    job_workers.append(asyncio.create_task(requeue_jobs(queued)))
+    job_workers.append(asyncio.create_task(reclaim_expired_jobs()))
+    
+    for _ in range(TRANSCRIPTION_JOB_WORKERS):
+        job_workers.append(asyncio.create_task(transcription_worker()))
+
+async def sync_vector_index():
+    """
+    Bring the semantic index in line with db.transcriptions: index what is
+    missing (older data, failed updates) and drop what was deleted
+    """
+    try:
+        stored = {document["id"] async for document in db.transcriptions.find({}, {"_id": 0, "id": 1})}
+        indexed = await asyncio.to_thread(vector_index.owners)
+        for transcription_id in indexed - stored:
+            await asyncio.to_thread(vector_index.remove, transcription_id)
+        missing = list(stored - indexed)
+        for start in range(0, len(missing), 100):
+            async for document in db.transcriptions.find(
+                {"id": {"$in": missing[start:start + 100]}}, {"_id": 0, "id": 1, "text": 1}
+            ):
+                # Other server processes may be syncing the same transcripts
+                await index_transcription(document["id"], document.get("text") or "", if_missing=True)
+        if missing:
+            logger.info(f"Added {len(missing)} transcriptions to the semantic search index")
+    except Exception as e:
+        logger.error(f"Error syncing the semantic search index: {str(e)}")
+
+@app.on_event("startup")
+async def start_vector_index_sync():
+    # Runs in the background; it is cancelled with the workers on shutdown
+    job_workers.append(asyncio.create_task(sync_vector_index()))
+
+async def expire_upload_sessions():
+    """
+    Periodically remove resumable uploads that have been idle past their TTL
+    """
+    while True:
+        try:
+            now = datetime.utcnow()
+            expired = await db.upload_sessions.find({"expires_at": {"$lt": now}}, {"_id": 0, "id": 1}).to_list(None)
+            for session in expired:
+                # Re-checked in the delete, in case a range arrived meanwhile
+                result = await db.upload_sessions.delete_one({"id": session["id"], "expires_at": {"$lt": now}})
+                if result.deleted_count:
+                    upload_part_path(session["id"]).unlink(missing_ok=True)
+            if expired:
+                logger.info(f"Removed {len(expired)} expired upload sessions")
+        except Exception as e:
+            logger.error(f"Error removing expired upload sessions: {str(e)}")
+        await asyncio.sleep(UPLOAD_SESSION_GC_INTERVAL_SECONDS)
+
+async def release_stale_upload_claims():
+    """
+    Hand back sessions whose completion was interrupted (e.g. by a crash),
+    so the client can complete them again
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=UPLOAD_COMPLETE_CLAIM_SECONDS)
+    # Claims from another live process are younger than the cutoff and kept
+    result = await db.upload_sessions.update_many(
+        {"state": UploadState.completing, "$or": [{"claimed_at": {"$lt": cutoff}}, {"claimed_at": None}]},
+        {"$set": {"state": UploadState.uploading}}
+    )
+    if result.modified_count:
+        logger.info(f"Released {result.modified_count} interrupted upload completions")
+
+@app.on_event("startup")
+async def start_upload_session_gc():
+    await release_stale_upload_claims()
+    job_workers.append(asyncio.create_task(expire_upload_sessions()))
+
+@app.on_event("shutdown")
+async def stop_transcription_workers():
+    for worker in job_workers:
+        worker.cancel()
+    await asyncio.gather(*job_workers, return_exceptions=True)
+    job_workers.clear()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
     client.close()
 
+@app.on_event("shutdown")
+async def shutdown_openai_client():
+    if local_backend:
+        await local_backend.close()
+    await openai_client.close()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001)
@@ -0,0 +1,161 @@
+"""
+Speech-to-text engines behind one interface.
+
+server.py picks an engine per upload based on TRANSCRIPTION_BACKEND:
+
+    openai  - the hosted Whisper API (default)
+    local   - faster-whisper (CTranslate2) on the CPU; no network needed
+    stub    - deterministic fake text derived from the audio bytes, for tests
+    auto    - local for short clips, OpenAI for everything else
+"""
+import asyncio
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+try:
+    from faster_whisper import WhisperModel
+except ImportError:
+    WhisperModel = None
+
+
+# Whisper reports the detected language by name in verbose_json responses
+WHISPER_LANGUAGE_CODES = {
+    "afrikaans": "af", "albanian": "sq", "amharic": "am", "arabic": "ar", "armenian": "hy", "assamese": "as",
+    "azerbaijani": "az", "bashkir": "ba", "basque": "eu", "belarusian": "be", "bengali": "bn", "bosnian": "bs",
+    "breton": "br", "bulgarian": "bg", "burmese": "my", "catalan": "ca", "chinese": "zh", "croatian": "hr",
+    "czech": "cs", "danish": "da", "dutch": "nl", "english": "en", "estonian": "et", "faroese": "fo",
+    "finnish": "fi", "french": "fr", "galician": "gl", "georgian": "ka", "german": "de", "greek": "el",
+    "gujarati": "gu", "haitian creole": "ht", "hausa": "ha", "hebrew": "he", "hindi": "hi", "hungarian": "hu",
+    "icelandic": "is", "indonesian": "id", "italian": "it", "japanese": "ja", "javanese": "jv", "kannada": "kn",
+    "kazakh": "kk", "khmer": "km", "korean": "ko", "lao": "lo", "latin": "la", "latvian": "lv", "lingala": "ln",
+    "lithuanian": "lt", "luxembourgish": "lb", "macedonian": "mk", "malagasy": "mg", "malay": "ms",
+    "malayalam": "ml", "maltese": "mt", "maori": "mi", "marathi": "mr", "mongolian": "mn", "myanmar": "my",
+    "nepali": "ne", "norwegian": "no", "nynorsk": "nn", "occitan": "oc", "pashto": "ps", "persian": "fa",
+    "polish": "pl", "portuguese": "pt", "punjabi": "pa", "romanian": "ro", "russian": "ru", "sanskrit": "sa",
+    "serbian": "sr", "shona": "sn", "sindhi": "sd", "sinhala": "si", "slovak": "sk", "slovenian": "sl",
+    "somali": "so", "spanish": "es", "sundanese": "su", "swahili": "sw", "swedish": "sv", "tagalog": "tl",
+    "tajik": "tg", "tamil": "ta", "tatar": "tt", "telugu": "te", "thai": "th", "tibetan": "bo", "turkish": "tr",
+    "turkmen": "tk", "ukrainian": "uk", "urdu": "ur", "uzbek": "uz", "vietnamese": "vi", "welsh": "cy",
+    "yiddish": "yi", "yoruba": "yo",
+}
+
+
+def whisper_language_code(language: Optional[str]) -> Optional[str]:
+    """
+    ISO 639-1 code for a language Whisper reports by name or code; None for
+    languages without one (e.g. Cantonese, Hawaiian)
+    """
+    language = (language or "").strip().lower()
+    if len(language) == 2:
+        return language
+    return WHISPER_LANGUAGE_CODES.get(language)
+
+
+@dataclass
+class Transcript:
+    text: str
+    language: Optional[str] = None  # detected language, when the engine reports one
+
+
+class TranscriptionBackend(ABC):
+    """
+    One speech-to-text engine. Callers hold one of its `slots` per call, which
+    caps how many files it works on at once.
+    """
+    name = ""
+
+    def __init__(self, model: str, concurrency: int):
+        self.model = model
+        self.slots = asyncio.Semaphore(concurrency)
+
+    @abstractmethod
+    async def transcribe(self, audio_path: Path, language: Optional[str]) -> Transcript:
+        """
+        Transcribe an audio file; language is an ISO 639-1 code or None to detect it
+        """
+
+    async def close(self):
+        pass
+
+
+class OpenAIBackend(TranscriptionBackend):
+    name = "openai"
+
+    def __init__(self, client, model: str = "whisper-1", concurrency: int = 4):
+        super().__init__(model, concurrency)
+        self.client = client
+
+    async def transcribe(self, audio_path: Path, language: Optional[str]) -> Transcript:
+        # Passing the path lets the client read the file off the event loop.
+        # Only verbose_json says which language was detected.
+        response = await self.client.audio.transcriptions.create(
+            model=self.model,
+            file=audio_path,
+            language=language,
+            response_format="json" if language else "verbose_json"
+        )
+        detected = whisper_language_code(getattr(response, "language", None))
+        return Transcript(text=response.text, language=language or detected)
+
+
+class FasterWhisperBackend(TranscriptionBackend):
+    """
+    Local CPU inference with faster-whisper. The model is loaded on first use
+    and inference runs in a worker thread.
+    """
+    name = "local"
+
+    def __init__(self, model: str = "base", concurrency: int = 1, compute_type: str = "int8", cpu_threads: int = 0):
+        if WhisperModel is None:
+            raise RuntimeError("The local transcription backend needs faster-whisper: pip install faster-whisper")
+        super().__init__(model, concurrency)
+        self.compute_type = compute_type
+        self.cpu_threads = cpu_threads
+        self._model = None
+        self._load_lock = threading.Lock()
+
+    def _load(self):
+        with self._load_lock:
+            if self._model is None:
+                self._model = WhisperModel(
+                    self.model, device="cpu", compute_type=self.compute_type, cpu_threads=self.cpu_threads
+                )
+        return self._model
+
+    def _run(self, audio_path: Path, language: Optional[str]) -> Transcript:
+        segments, info = self._load().transcribe(str(audio_path), language=language, beam_size=1)
+        # segments is a generator; decoding happens while it is consumed
+        text = "".join(segment.text for segment in segments).strip()
+        return Transcript(text=text, language=info.language)
+
+    async def transcribe(self, audio_path: Path, language: Optional[str]) -> Transcript:
+        return await asyncio.to_thread(self._run, audio_path, language)
+
+
+class StubBackend(TranscriptionBackend):
+    """
+    Returns the same text for the same audio without running any model
+    """
+    name = "stub"
+
+    def __init__(self, concurrency: int = 16):
+        super().__init__("stub", concurrency)
+
+    def _run(self, audio_path: Path, language: Optional[str]) -> Transcript:
+        digest = hashlib.sha256()
+        size = 0
+        with open(audio_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+                size += len(block)
+        return Transcript(
+            text=f"Stub transcript of {size} bytes of audio ({digest.hexdigest()[:12]}).",
+            language=language or "en"
+        )
+
+    async def transcribe(self, audio_path: Path, language: Optional[str]) -> Transcript:
+        return await asyncio.to_thread(self._run, audio_path, language)
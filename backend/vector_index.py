@@ -0,0 +1,264 @@
+"""
+Local semantic search over transcription chunks.
+
+Transcripts are split into overlapping word windows and embedded without any
+network call: character n-grams are hashed into a fixed number of signed
+buckets (the "hashing trick"), so texts that share word pieces end up close in
+cosine distance even when they are phrased differently.
+
+Vectors live in a memory-mapped float32 matrix on disk next to a matrix of
+(owner, start, end, live) rows, so the index survives restarts and is paged
+in by the OS instead of being loaded into memory. Deleted transcriptions are
+tombstoned and squeezed out once they make up half of the index.
+
+Several server processes can share one index directory: every operation
+holds a lock file (shared for reads, exclusive for writes) and picks up the
+count and capacity other processes have committed before touching the
+matrices.
+"""
+import json
+import re
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Set, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: the index is then only safe within one process
+    fcntl = None
+
+EMBEDDING_DIM = 256
+NGRAM_SIZES = (3, 4, 5)
+CHUNK_WORDS = 60
+CHUNK_OVERLAP_WORDS = 15
+
+_NON_WORD = re.compile(r"[\W_]+")
+_WORD = re.compile(r"\S+")
+
+# One odd multiplier per byte position of an n-gram, then a Fibonacci hash
+_NGRAM_MULTIPLIERS = np.array(
+    [0x100000001B3, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0x27D4EB2F165667C5, 0x9E3779B185EBCA87],
+    dtype=np.uint64
+)
+_FIBONACCI = np.uint64(0x9E3779B97F4A7C15)
+
+ROW_DTYPE = np.dtype([("owner", "S36"), ("start", "<u4"), ("end", "<u4"), ("live", "u1")])
+
+
+def embed(text: str, dim: int = EMBEDDING_DIM) -> np.ndarray:
+    """
+    L2-normalized hashed character n-gram vector of text
+    """
+    normalized = " " + _NON_WORD.sub(" ", text.lower()).strip() + " "
+    data = np.frombuffer(normalized.encode("utf-8"), dtype=np.uint8).astype(np.uint64)
+    vector = np.zeros(dim, dtype=np.float64)
+    for n in NGRAM_SIZES:
+        if len(data) < n:
+            continue
+        windows = len(data) - n + 1
+        hashed = np.zeros(windows, dtype=np.uint64)
+        for offset in range(n):
+            hashed += data[offset:offset + windows] * _NGRAM_MULTIPLIERS[offset]
+        hashed *= _FIBONACCI
+        buckets = (hashed >> np.uint64(32)) % np.uint64(dim)
+        # The top bit of the hash decides the sign, so collisions cancel out
+        # on average instead of piling up
+        signs = np.where(hashed >> np.uint64(63), -1.0, 1.0)
+        vector += np.bincount(buckets.astype(np.intp), weights=signs, minlength=dim)
+    norm = np.linalg.norm(vector)
+    return (vector / norm if norm else vector).astype(np.float32)
+
+
+def chunk_spans(text: str, words: int = CHUNK_WORDS, overlap: int = CHUNK_OVERLAP_WORDS) -> List[Tuple[int, int]]:
+    """
+    (start, end) character offsets of overlapping windows of words
+    """
+    positions = [match.span() for match in _WORD.finditer(text)]
+    spans = []
+    step = max(1, words - overlap)
+    for first in range(0, len(positions), step):
+        last = min(first + words, len(positions)) - 1
+        spans.append((positions[first][0], positions[last][1]))
+        if last == len(positions) - 1:
+            break
+    return spans
+
+
+def embed_chunks(text: str, dim: int = EMBEDDING_DIM) -> Tuple[List[Tuple[int, int]], np.ndarray]:
+    spans = chunk_spans(text)
+    vectors = np.zeros((len(spans), dim), dtype=np.float32)
+    for row, (start, end) in enumerate(spans):
+        vectors[row] = embed(text[start:end], dim)
+    return spans, vectors
+
+
+class VectorIndex:
+    """
+    Append-only memory-mapped vector matrix with tombstoned deletes.
+    All methods are blocking, thread-safe and safe across processes sharing
+    the directory; call them from a worker thread.
+    """
+
+    def __init__(self, directory: Path, dim: int = EMBEDDING_DIM, initial_capacity: int = 1024):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.dim = dim
+        self._lock = threading.RLock()
+        self._meta_path = self.directory / "meta.json"
+        self._vectors_path = self.directory / "vectors.f32"
+        self._rows_path = self.directory / "rows.bin"
+        self._lock_file = open(self.directory / "index.lock", "a+b")
+        self.capacity = 0
+
+        with self._locked(exclusive=True):
+            if self.capacity < initial_capacity:
+                self._map(initial_capacity)
+
+    @contextmanager
+    def _locked(self, exclusive: bool):
+        """
+        Hold the thread lock and the lock file, with the state other
+        processes committed loaded
+        """
+        with self._lock:
+            if fcntl:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                self._load()
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _load(self):
+        meta = json.loads(self._meta_path.read_text()) if self._meta_path.exists() else {}
+        if meta and meta["dim"] != self.dim:
+            raise ValueError(f"Index at {self.directory} has dimension {meta['dim']}, expected {self.dim}")
+        self.count = meta.get("count", 0)
+        self.dead = meta.get("dead", 0)
+        # Another process may have grown the files
+        if meta.get("capacity", 0) > self.capacity:
+            self._map(meta["capacity"])
+
+    def _map(self, capacity: int):
+        for path, row_bytes in ((self._vectors_path, self.dim * 4), (self._rows_path, ROW_DTYPE.itemsize)):
+            with open(path, "ab") as f:
+                if f.tell() < capacity * row_bytes:
+                    f.truncate(capacity * row_bytes)
+        self.capacity = capacity
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        self._rows = np.memmap(self._rows_path, dtype=ROW_DTYPE, mode="r+", shape=(capacity,))
+
+    def _commit(self):
+        # Rows past count are ignored on load, so count is written last
+        self._vectors.flush()
+        self._rows.flush()
+        meta = {"dim": self.dim, "count": self.count, "dead": self.dead, "capacity": self.capacity}
+        temp_path = self._meta_path.with_suffix(".tmp")
+        temp_path.write_text(json.dumps(meta))
+        temp_path.replace(self._meta_path)
+
+    @property
+    def live(self) -> int:
+        return self.count - self.dead
+
+    def add(self, owner: str, spans: List[Tuple[int, int]], vectors: np.ndarray, if_missing: bool = False):
+        """
+        Append the chunk vectors of one owner (a transcription id). With
+        if_missing, nothing is added when the owner is already indexed, e.g.
+        by another process syncing at the same time.
+        """
+        if not len(spans):
+            return
+        with self._locked(exclusive=True):
+            if if_missing and self._owner_rows(owner).size:
+                return
+            needed = self.count + len(spans)
+            if needed > self.capacity:
+                capacity = self.capacity
+                while capacity < needed:
+                    capacity *= 2
+                self._map(capacity)
+            rows = slice(self.count, needed)
+            self._vectors[rows] = vectors
+            self._rows[rows] = [(owner.encode(), start, end, 1) for start, end in spans]
+            self.count = needed
+            self._commit()
+
+    def add_text(self, owner: str, text: str, if_missing: bool = False):
+        """
+        Chunk, embed and append a whole transcript
+        """
+        self.add(owner, *embed_chunks(text, self.dim), if_missing=if_missing)
+
+    def remove(self, owner: str) -> int:
+        """
+        Tombstone every chunk of owner; returns how many were removed
+        """
+        with self._locked(exclusive=True):
+            matches = self._owner_rows(owner)
+            if not len(matches):
+                return 0
+            self._rows["live"][matches] = 0
+            self.dead += len(matches)
+            if self.dead * 2 > self.count:
+                self._compact()
+            self._commit()
+            return len(matches)
+
+    def _owner_rows(self, owner: str) -> np.ndarray:
+        rows = self._rows[:self.count]
+        return np.flatnonzero((rows["owner"] == owner.encode()) & (rows["live"] == 1))
+
+    def _compact(self):
+        keep = np.flatnonzero(self._rows["live"][:self.count])
+        # Moving rows forward never overwrites a row that is still to be read
+        for block in range(0, len(keep), 1 << 16):
+            source = keep[block:block + (1 << 16)]
+            target = slice(block, block + len(source))
+            self._vectors[target] = self._vectors[source]
+            self._rows[target] = self._rows[source]
+        self.count = len(keep)
+        self.dead = 0
+
+    def search(self, query: np.ndarray, k: int, block_rows: int = 1 << 16) -> List[Tuple[str, int, int, float]]:
+        """
+        Top-k live chunks by cosine similarity to query (vectors are unit
+        length, so this is a dot product), scanned block by block so memory
+        stays bounded however large the index grows
+        """
+        query = np.asarray(query, dtype=np.float32)
+        best_rows = np.empty(0, dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+        with self._locked(exclusive=False):
+            for start in range(0, self.count, block_rows):
+                stop = min(start + block_rows, self.count)
+                scores = self._vectors[start:stop] @ query
+                scores[self._rows["live"][start:stop] == 0] = -np.inf
+                if len(scores) > k:
+                    top = np.argpartition(scores, -k)[-k:]
+                else:
+                    top = np.arange(len(scores))
+                best_rows = np.concatenate([best_rows, top + start])
+                best_scores = np.concatenate([best_scores, scores[top]])
+                if len(best_scores) > k:
+                    keep = np.argpartition(best_scores, -k)[-k:]
+                    best_rows, best_scores = best_rows[keep], best_scores[keep]
+
+            order = np.argsort(-best_scores)
+            hits = []
+            for position in order:
+                score = float(best_scores[position])
+                if score == -np.inf:
+                    break
+                row = self._rows[best_rows[position]]
+                hits.append((row["owner"].decode(), int(row["start"]), int(row["end"]), score))
+            return hits
+
+    def owners(self) -> Set[str]:
+        with self._locked(exclusive=False):
+            rows = self._rows[:self.count]
+            return {owner.decode() for owner in np.unique(rows["owner"][rows["live"] == 1])}
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the audio track extraction for video uploads (backend/demux.py).
+
+Writes one screen-recording-like file per container (MP4, AVI with 128 kbps
+MP3, WebM) with interleaved video and audio chunks. The video chunks are
+holes, so the files cost little disk space; the audio is random bytes, so
+the check that every audio frame reaches the output, in order and
+unchanged, is exact.
+Each output is also probed to confirm codec, sample rate, channels and
+duration survive. Reports bytes in and out and the extraction time.
+
+Usage: python benchmarks/demux_benchmark.py [--video-mb 200] [--audio-mb 10] [--seconds 600]
+"""
+
+import argparse
+import struct
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCHMARK_DIR.parent / "backend"))
+
+from demux import extract_audio  # noqa: E402
+from media_probe import probe_media  # noqa: E402
+
+
+class InterleavedWriter:
+    """
+    Writes audio frames and leaves holes for video chunks, keeping the offsets
+    """
+
+    def __init__(self, f):
+        self.f = f
+
+    def audio(self, data: bytes) -> int:
+        offset = self.f.tell()
+        self.f.write(data)
+        return offset
+
+    def video(self, size: int) -> int:
+        offset = self.f.tell()
+        self.f.seek(size, 1)
+        return offset
+
+
+def frame_sizes(rng, count: int, total: int) -> np.ndarray:
+    sizes = rng.integers(200, 600, count)
+    return np.maximum(sizes * total // sizes.sum(), 1)
+
+
+def atom(kind: bytes, *children: bytes) -> bytes:
+    payload = b"".join(children)
+    return struct.pack(">I4s", 8 + len(payload), kind) + payload
+
+
+def mp4_trak(handler: bytes, sample_entry: bytes, timescale: int, duration: int,
+             samples_per_chunk: int, sample_sizes, chunk_offsets) -> bytes:
+    stbl = atom(
+        b"stbl",
+        atom(b"stsd", struct.pack(">4xI", 1) + sample_entry),
+        atom(b"stts", struct.pack(">4xIII", 1, len(sample_sizes), duration // max(len(sample_sizes), 1))),
+        atom(b"stsc", struct.pack(">4xIIII", 1, 1, samples_per_chunk, 1)),
+        atom(b"stsz", struct.pack(">4xII", 0, len(sample_sizes)) + np.asarray(sample_sizes, ">u4").tobytes()),
+        atom(b"stco", struct.pack(">4xI", len(chunk_offsets)) + np.asarray(chunk_offsets, ">u4").tobytes()),
+    )
+    return atom(b"trak", atom(
+        b"mdia",
+        atom(b"mdhd", struct.pack(">B3xIIII", 0, 0, 0, timescale, duration) + b"\x00" * 4),
+        atom(b"hdlr", struct.pack(">4x4x4s12x", handler) + b"Handler\x00"),
+        atom(b"minf", stbl)
+    ))
+
+
+def make_mp4(path: Path, rng, seconds: int, video_bytes: int, audio_bytes: int):
+    frames_per_second = 47  # AAC frames of 1024 samples at 48 kHz
+    sizes = frame_sizes(rng, seconds * frames_per_second, audio_bytes)
+    frames = [rng.bytes(int(size)) for size in sizes]
+    ftyp = atom(b"ftyp", b"isom\x00\x00\x02\x00isomiso2mp41")
+    audio_offsets, video_offsets = [], []
+    with open(path, "wb") as f:
+        f.write(ftyp)
+        mdat_start = f.tell()
+        f.write(struct.pack(">I4s", 0, b"mdat"))
+        writer = InterleavedWriter(f)
+        # One chunk per second of each track, as most muxers interleave
+        for second in range(seconds):
+            video_offsets.append(writer.video(video_bytes // seconds))
+            audio_offsets.append(writer.audio(b"".join(frames[second * frames_per_second:(second + 1) * frames_per_second])))
+        mdat_end = f.tell()
+        f.seek(mdat_start)
+        f.write(struct.pack(">I", mdat_end - mdat_start))
+        f.seek(mdat_end)
+
+        sample_entry = struct.pack(">I4s6xH8xHHHHI", 36, b"mp4a", 1, 2, 16, 0, 0, 48000 << 16)
+        video_entry = struct.pack(">I4s6xH", 16, b"avc1", 1)
+        moov = atom(
+            b"moov",
+            atom(b"mvhd", struct.pack(">B3xIIII", 0, 0, 0, 1000, seconds * 1000) + b"\x00" * 80),
+            mp4_trak(b"vide", video_entry, 30, seconds * 30, 1, [video_bytes // seconds] * seconds, video_offsets),
+            mp4_trak(b"soun", sample_entry, 48000, seconds * 48000, frames_per_second, sizes, audio_offsets),
+        )
+        f.write(moov)
+    return frames
+
+
+def riff_chunk(kind: bytes, payload: bytes) -> bytes:
+    return struct.pack("<4sI", kind, len(payload)) + payload + b"\x00" * (len(payload) & 1)
+
+
+def make_avi(path: Path, rng, seconds: int, video_bytes: int, audio_bytes: int):
+    # 128 kbps MP3 whatever audio_bytes says, in frames of 400 bytes so no chunk needs a pad byte
+    frames_per_second = 40
+    frames = [b"\xff\xfb\x90\x64" + rng.bytes(396) for _ in range(seconds * frames_per_second)]
+    avih = riff_chunk(b"avih", struct.pack("<IIIIIIIIII", 1_000_000, 0, 0, 0, seconds, 0, 2, 0, 640, 480) + b"\x00" * 16)
+    video_strl = riff_chunk(b"LIST", b"strl" + riff_chunk(b"strh", b"vids" + b"\x00" * 52) + riff_chunk(b"strf", b"\x00" * 40))
+    audio_strl = riff_chunk(b"LIST", b"strl" + riff_chunk(b"strh", b"auds" + b"\x00" * 52)
+                            + riff_chunk(b"strf", struct.pack("<HHIIHHH", 0x0055, 2, 44100, 16000, 1, 0, 0)))
+    hdrl = riff_chunk(b"LIST", b"hdrl" + avih + video_strl + audio_strl)
+    video_chunk = (video_bytes // seconds) & ~1
+    with open(path, "wb") as f:
+        f.write(b"RIFF\x00\x00\x00\x00AVI " + hdrl)
+        movi_start = f.tell()
+        f.write(b"LIST\x00\x00\x00\x00movi")
+        writer = InterleavedWriter(f)
+        for second in range(seconds):
+            f.write(struct.pack("<4sI", b"00dc", video_chunk))
+            writer.video(video_chunk)
+            for frame in frames[second * frames_per_second:(second + 1) * frames_per_second]:
+                f.write(struct.pack("<4sI", b"01wb", len(frame)))
+                writer.audio(frame)
+        end = f.tell()
+        f.seek(movi_start + 4)
+        f.write(struct.pack("<I", end - movi_start - 8))
+        f.seek(4)
+        f.write(struct.pack("<I", end - 8))
+    return frames
+
+
+def ebml(element_id: int, payload: bytes) -> bytes:
+    element = element_id.to_bytes((element_id.bit_length() + 7) // 8, "big")
+    return element + (len(payload) | (1 << 56)).to_bytes(8, "big") + payload
+
+
+def ebml_header(element_id: int, size: int) -> bytes:
+    return element_id.to_bytes((element_id.bit_length() + 7) // 8, "big") + (size | (1 << 56)).to_bytes(8, "big")
+
+
+def make_webm(path: Path, rng, seconds: int, video_bytes: int, audio_bytes: int):
+    frames_per_second = 50  # 20 ms Opus frames
+    sizes = frame_sizes(rng, seconds * frames_per_second, audio_bytes)
+    frames = [rng.bytes(int(size)) for size in sizes]
+    unknown = b"\x01\xff\xff\xff\xff\xff\xff\xff"
+    header = ebml(0x1A45DFA3, ebml(0x4282, b"webm"))
+    info = ebml(0x1549A966, ebml(0x2AD7B1, (1_000_000).to_bytes(3, "big")) + ebml(0x4489, struct.pack(">d", seconds * 1000.0)))
+    video_track = ebml(0xAE, ebml(0xD7, b"\x01") + ebml(0x83, b"\x01") + ebml(0x86, b"V_VP9"))
+    audio = ebml(0xE1, ebml(0xB5, struct.pack(">d", 48000.0)) + ebml(0x9F, b"\x02"))
+    audio_track = ebml(0xAE, ebml(0xD7, b"\x02") + ebml(0x83, b"\x02") + ebml(0x86, b"A_OPUS") + audio)
+    video_block = video_bytes // seconds
+    with open(path, "wb") as f:
+        # MediaRecorder style: Segment and Clusters of unknown size
+        f.write(header + bytes.fromhex("18538067") + unknown + info + ebml(0x1654AE6B, video_track + audio_track))
+        writer = InterleavedWriter(f)
+        for second in range(seconds):
+            f.write(bytes.fromhex("1f43b675") + unknown + ebml(0xE7, (second * 1000).to_bytes(4, "big")))
+            f.write(ebml_header(0xA3, video_block) + b"\x81\x00\x00\x80")
+            writer.video(video_block - 4)
+            for index, frame in enumerate(frames[second * frames_per_second:(second + 1) * frames_per_second]):
+                f.write(ebml_header(0xA3, len(frame) + 4) + b"\x82" + struct.pack(">hB", index * 20, 0x80))
+                writer.audio(frame)
+    return frames
+
+
+FORMATS = {
+    "mp4": (".mp4", make_mp4),
+    "avi": (".avi", make_avi),
+    "webm": (".webm", make_webm),
+}
+
+
+def frames_in_order(data: bytes, frames) -> bool:
+    position = 0
+    for frame in frames:
+        position = data.find(frame, position)
+        if position < 0:
+            return False
+        position += len(frame)
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video-mb", type=int, default=200, help="video bytes per file")
+    parser.add_argument("--audio-mb", type=int, default=10, help="audio bytes per file")
+    parser.add_argument("--seconds", type=int, default=600, help="duration of each file")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    failures = 0
+    print(f"Extracting audio from {args.seconds}s files with {args.video_mb} MB of video and {args.audio_mb} MB of audio")
+    print(f"{'format':<8}{'in MB':>9}{'out MB':>9}{'saved':>8}{'ms':>8}  result")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, (suffix, make) in FORMATS.items():
+            path = Path(tmp) / f"sample{suffix}"
+            frames = make(path, rng, args.seconds, args.video_mb * 1024 * 1024, args.audio_mb * 1024 * 1024)
+            source = probe_media(path)
+
+            started = time.perf_counter()
+            output_path = extract_audio(path, Path(tmp) / "sample.audio", source.container)
+            elapsed = time.perf_counter() - started
+
+            problems = []
+            output = probe_media(output_path)
+            for field in ("codec", "sample_rate", "channels", "duration"):
+                if field == "duration" and output.duration and abs(output.duration - source.duration) < 0.01:
+                    continue
+                if getattr(output, field) != getattr(source, field):
+                    problems.append(f"{field} {getattr(output, field)!r} != {getattr(source, field)!r}")
+            if not frames_in_order(output_path.read_bytes(), frames):
+                problems.append("audio frames missing or out of order")
+            failures += bool(problems)
+
+            size_in, size_out = path.stat().st_size, output_path.stat().st_size
+            result = "❌ " + "; ".join(problems) if problems else (
+                f"✅ {output_path.suffix[1:]} {output.codec} {output.sample_rate} Hz x{output.channels}, {output.duration:.0f}s"
+            )
+            print(f"{name:<8}{size_in / 1e6:>9.1f}{size_out / 1e6:>9.1f}{1 - size_out / size_in:>8.1%}{elapsed * 1000:>8.0f}  {result}")
+            path.unlink()
+            output_path.unlink()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
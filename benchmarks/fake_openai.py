@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Deterministic local stand-in for the OpenAI transcription and chat APIs.
+
+Point the backend at it with OPENAI_BASE_URL=http://127.0.0.1:9000/v1 (any
+OPENAI_API_KEY works). Transcripts and summaries are derived from the request
+content, so the same input always gives the same output. Latency, jitter,
+streaming speed and failure rate are configurable, and the random choices
+are seeded so runs are repeatable.
+
+Usage: python benchmarks/fake_openai.py [--port 9000] [--latency-ms 300] [--failure-rate 0.05]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+SUMMARY_TEMPLATE = """1. Main topic: recording {digest}
+2. Key points:
+   - The recording is {words} words long
+   - Its content hashes to {digest}
+3. Conclusions: this summary was generated by the local OpenAI stand-in"""
+
+LANGUAGE_NAMES = {"en": "english", "ru": "russian", "es": "spanish", "de": "german", "fr": "french"}
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def create_app(
+    latency_ms: float = 0,
+    jitter_ms: float = 0,
+    token_ms: float = 0,
+    failure_rate: float = 0,
+    failure_status: int = 500,
+    seed: int = 0
+) -> FastAPI:
+    """
+    Build the stand-in app. Every request waits latency_ms plus up to
+    jitter_ms, then fails with failure_status with probability failure_rate;
+    streamed completions also wait token_ms between chunks.
+    """
+    app = FastAPI(title="Fake OpenAI API")
+    rng = random.Random(seed)
+    app.state.requests = {"transcriptions": 0, "chat": 0, "failures": 0}
+
+    async def simulate(kind: str):
+        app.state.requests[kind] += 1
+        delay = latency_ms + (rng.random() * jitter_ms if jitter_ms else 0)
+        if delay:
+            await asyncio.sleep(delay / 1000)
+        if failure_rate and rng.random() < failure_rate:
+            app.state.requests["failures"] += 1
+            return JSONResponse(
+                status_code=failure_status,
+                content={"error": {"message": "Injected failure", "type": "server_error", "code": None}}
+            )
+        return None
+
+    @app.post("/v1/audio/transcriptions")
+    async def transcriptions(request: Request):
+        form = await request.form()
+        upload = form["file"]
+        data = await upload.read()
+        failure = await simulate("transcriptions")
+        if failure:
+            return failure
+
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        text = f"Fake transcript of {len(data)} bytes of audio ({digest})."
+        if form.get("response_format") == "verbose_json":
+            # Like Whisper, name the language rather than give its code
+            language = LANGUAGE_NAMES.get(form.get("language") or "en", form.get("language"))
+            return {"text": text, "language": language, "duration": len(data) / 32000, "segments": []}
+        if form.get("response_format") == "text":
+            return PlainTextResponse(text)
+        return {"text": text}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        failure = await simulate("chat")
+        if failure:
+            return failure
+
+        prompt = "\n".join(str(message.get("content", "")) for message in body.get("messages", []))
+        digest = hashlib.sha256(prompt.encode()).hexdigest()[:12]
+        content = SUMMARY_TEMPLATE.format(digest=digest, words=len(prompt.split()))
+        usage = {
+            "prompt_tokens": estimate_tokens(prompt),
+            "completion_tokens": estimate_tokens(content),
+            "total_tokens": estimate_tokens(prompt) + estimate_tokens(content)
+        }
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        model = body.get("model", "gpt-4")
+
+        if not body.get("stream"):
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop"
+                }],
+                "usage": usage
+            }
+
+        include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+        def chunk(delta: dict, finish_reason=None, chunk_usage=None) -> str:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [] if chunk_usage else [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            if chunk_usage:
+                payload["usage"] = chunk_usage
+            return f"data: {json.dumps(payload)}\n\n"
+
+        async def stream():
+            yield chunk({"role": "assistant", "content": ""})
+            for piece in content.split(" "):
+                if token_ms:
+                    await asyncio.sleep(token_ms / 1000)
+                yield chunk({"content": piece + " "})
+            yield chunk({}, finish_reason="stop")
+            if include_usage:
+                yield chunk({}, chunk_usage=usage)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    @app.get("/stats")
+    async def stats():
+        return app.state.requests
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=0, help="fixed delay before every response")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="extra random delay of up to this much")
+    parser.add_argument("--token-ms", type=float, default=0, help="delay between streamed completion chunks")
+    parser.add_argument("--failure-rate", type=float, default=0, help="fraction of requests that fail")
+    parser.add_argument("--failure-status", type=int, default=500, help="HTTP status of injected failures")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    import uvicorn
+    app = create_app(
+        args.latency_ms, args.jitter_ms, args.token_ms, args.failure_rate, args.failure_status, args.seed
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
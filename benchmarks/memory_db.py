@@ -0,0 +1,379 @@
+"""
+In-memory stand-in for the subset of Motor that server.py and migrations.py
+use, so the pipeline can be benchmarked without a MongoDB server.
+
+Supported: insert/find/update/delete on plain documents, the query operators
+$or/$and/$in/$nin/$lt/$lte/$gt/$gte/$ne/$exists, $set/$unset/$inc/$push
+updates with upsert, inclusion and exclusion projections (with $ifNull,
+$substrCP and textScore expressions), multi-key sorts, unique indexes and a
+simple word-matching $text search over text-indexed fields. There is no
+stemming, and unique indexes are only checked on insert.
+"""
+import copy
+import re
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, List, Optional
+
+from bson import ObjectId
+from pymongo import TEXT
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+
+_MISSING = object()
+_WORD = re.compile(r"\w+")
+
+
+def _get(document: dict, path: str):
+    value = document
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _sort_key(value):
+    # Missing and None sort first, then numbers, strings and everything else
+    if value is _MISSING or value is None:
+        return (0, 0)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    return (3, value)
+
+
+def _compare(value, operator: str, operand) -> bool:
+    if operator == "$exists":
+        return (value is not _MISSING) == bool(operand)
+    if operator == "$eq":
+        return _equals(value, operand)
+    if operator == "$ne":
+        return not _equals(value, operand)
+    if operator == "$in":
+        return any(_equals(value, candidate) for candidate in operand)
+    if operator == "$nin":
+        return not any(_equals(value, candidate) for candidate in operand)
+    if value is _MISSING or value is None:
+        return False
+    try:
+        if operator == "$lt":
+            return value < operand
+        if operator == "$lte":
+            return value <= operand
+        if operator == "$gt":
+            return value > operand
+        if operator == "$gte":
+            return value >= operand
+    except TypeError:
+        return False
+    raise NotImplementedError(f"Query operator {operator} is not supported")
+
+
+def _equals(value, operand) -> bool:
+    if value is _MISSING:
+        return operand is None
+    if isinstance(value, list) and not isinstance(operand, list):
+        return operand in value
+    return value == operand
+
+
+def _evaluate(expression, document: dict, score: float):
+    if isinstance(expression, str) and expression.startswith("$"):
+        value = _get(document, expression[1:])
+        return None if value is _MISSING else value
+    if isinstance(expression, dict):
+        if expression.get("$meta") == "textScore":
+            return score
+        if "$ifNull" in expression:
+            value, default = (_evaluate(part, document, score) for part in expression["$ifNull"])
+            return default if value is None else value
+        if "$substrCP" in expression:
+            text, start, length = (_evaluate(part, document, score) for part in expression["$substrCP"])
+            return text[start:start + length]
+        raise NotImplementedError(f"Expression {expression} is not supported")
+    return expression
+
+
+class MemoryCursor:
+    def __init__(self, collection: "MemoryCollection", query: dict, projection: Optional[dict]):
+        self._collection = collection
+        self._query = query
+        self._projection = projection
+        self._sort: List[tuple] = []
+        self._skip = 0
+        self._limit = 0
+
+    def sort(self, key_or_list, direction=None):
+        self._sort = key_or_list if isinstance(key_or_list, list) else [(key_or_list, direction or 1)]
+        return self
+
+    def skip(self, count: int):
+        self._skip = count
+        return self
+
+    def limit(self, count: int):
+        self._limit = count
+        return self
+
+    def _results(self) -> List[dict]:
+        matches = self._collection._matching(self._query)
+        for key, direction in reversed(self._sort):
+            if isinstance(direction, dict):
+                # {"$meta": "textScore"}: best matches first
+                matches.sort(key=lambda match: match[1], reverse=True)
+            else:
+                matches.sort(key=lambda match: _sort_key(_get(match[0], key)), reverse=direction == -1)
+        matches = matches[self._skip:]
+        if self._limit:
+            matches = matches[:self._limit]
+        return [self._collection._project(document, self._projection, score) for document, score in matches]
+
+    async def to_list(self, length: Optional[int] = None) -> List[dict]:
+        results = self._results()
+        return results if length is None else results[:length]
+
+    def __aiter__(self):
+        self._iterator = iter(self._results())
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class MemoryCollection:
+    def __init__(self, name: str):
+        self.name = name
+        self._documents: List[dict] = []
+        self._indexes: Dict[str, dict] = {"_id_": {"key": [("_id", 1)], "unique": True}}
+        self._unique_keys: Dict[str, set] = {"_id_": set()}
+        self._text_fields: List[str] = []
+
+    # Indexes
+
+    async def create_indexes(self, indexes: Iterable) -> List[str]:
+        indexes = list(indexes)
+        # Like MongoDB, a name reused with other keys fails the whole call
+        for index in indexes:
+            name, keys = index.document["name"], list(index.document["key"].items())
+            if name in self._indexes and self._indexes[name]["key"] != keys:
+                raise OperationFailure(
+                    f"An existing index has the same name as the requested index: {name}", code=86
+                )
+        names = []
+        for index in indexes:
+            spec = index.document
+            name = spec["name"]
+            keys = list(spec["key"].items())
+            self._indexes[name] = {"key": keys, "unique": spec.get("unique", False)}
+            if spec.get("unique"):
+                self._unique_keys[name] = {self._unique_value(document, keys) for document in self._documents}
+            self._text_fields.extend(field for field, kind in keys if kind == TEXT)
+            names.append(name)
+        return names
+
+    async def index_information(self) -> Dict[str, dict]:
+        return copy.deepcopy(self._indexes)
+
+    def list_indexes(self) -> MemoryCursor:
+        collection = MemoryCollection("indexes")
+        collection._documents = [{"name": name, "key": dict(index["key"])} for name, index in self._indexes.items()]
+        return MemoryCursor(collection, {}, None)
+
+    async def drop_index(self, name: str):
+        self._indexes.pop(name, None)
+        self._unique_keys.pop(name, None)
+
+    @staticmethod
+    def _unique_value(document: dict, keys: List[tuple]) -> tuple:
+        return tuple(repr(_get(document, field)) for field, _ in keys)
+
+    # Queries
+
+    def _text_score(self, document: dict, search: dict) -> float:
+        terms = {word.lower() for word in _WORD.findall(search["$search"])}
+        words = []
+        for field in self._text_fields:
+            value = _get(document, field)
+            if isinstance(value, str):
+                words.extend(word.lower() for word in _WORD.findall(value))
+        return float(sum(1 for word in words if word in terms))
+
+    def _matches(self, document: dict, query: dict) -> bool:
+        for key, condition in query.items():
+            if key == "$or":
+                if not any(self._matches(document, part) for part in condition):
+                    return False
+            elif key == "$and":
+                if not all(self._matches(document, part) for part in condition):
+                    return False
+            elif key == "$text":
+                if not self._text_score(document, condition):
+                    return False
+            elif isinstance(condition, dict) and condition and all(name.startswith("$") for name in condition):
+                value = _get(document, key)
+                if not all(_compare(value, operator, operand) for operator, operand in condition.items()):
+                    return False
+            elif not _equals(_get(document, key), condition):
+                return False
+        return True
+
+    def _matching(self, query: dict) -> List[tuple]:
+        query = query or {}
+        return [
+            (document, self._text_score(document, query["$text"]) if "$text" in query else 0.0)
+            for document in self._documents if self._matches(document, query)
+        ]
+
+    @staticmethod
+    def _project(document: dict, projection: Optional[dict], score: float = 0.0) -> dict:
+        if not projection:
+            return copy.deepcopy(document)
+        fields = {key: value for key, value in projection.items() if key != "_id"}
+        if fields and any(value not in (0, False) for value in fields.values()):
+            projected = {"_id": document["_id"]} if projection.get("_id", 1) else {}
+            for key, value in fields.items():
+                if isinstance(value, (dict, str)):
+                    projected[key] = _evaluate(value, document, score)
+                elif key in document:
+                    projected[key] = copy.deepcopy(document[key])
+            return projected
+        if not fields and projection.get("_id", 1):
+            return {"_id": document["_id"]}
+        excluded = {key for key, value in projection.items() if value in (0, False)}
+        return {key: copy.deepcopy(value) for key, value in document.items() if key not in excluded}
+
+    def find(self, query: Optional[dict] = None, projection: Optional[dict] = None) -> MemoryCursor:
+        return MemoryCursor(self, query or {}, projection)
+
+    async def find_one(self, query: Optional[dict] = None, projection: Optional[dict] = None, sort=None):
+        cursor = self.find(query, projection).limit(1)
+        if sort:
+            cursor.sort(sort)
+        results = cursor._results()
+        return results[0] if results else None
+
+    async def count_documents(self, query: dict) -> int:
+        return len(self._matching(query))
+
+    async def distinct(self, key: str, query: Optional[dict] = None) -> List[Any]:
+        values = []
+        for document, _ in self._matching(query or {}):
+            value = _get(document, key)
+            if value is not _MISSING and value not in values:
+                values.append(value)
+        return values
+
+    # Writes
+
+    def _insert(self, document: dict):
+        document.setdefault("_id", ObjectId())
+        stored = copy.deepcopy(document)
+        for name, seen in self._unique_keys.items():
+            value = self._unique_value(stored, self._indexes[name]["key"])
+            if value in seen:
+                raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: {name}")
+        for name, seen in self._unique_keys.items():
+            seen.add(self._unique_value(stored, self._indexes[name]["key"]))
+        self._documents.append(stored)
+
+    async def insert_one(self, document: dict):
+        self._insert(document)
+        return SimpleNamespace(inserted_id=document["_id"], acknowledged=True)
+
+    async def insert_many(self, documents: List[dict], ordered: bool = True):
+        errors = []
+        for position, document in enumerate(documents):
+            try:
+                self._insert(document)
+            except DuplicateKeyError as e:
+                errors.append({"index": position, "code": 11000, "errmsg": str(e)})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(documents) - len(errors)})
+        return SimpleNamespace(inserted_ids=[document["_id"] for document in documents], acknowledged=True)
+
+    @staticmethod
+    def _apply(document: dict, update: dict):
+        for operator, fields in update.items():
+            for key, value in fields.items():
+                if operator == "$set":
+                    document[key] = copy.deepcopy(value)
+                elif operator == "$unset":
+                    document.pop(key, None)
+                elif operator == "$inc":
+                    document[key] = document.get(key, 0) + value
+                elif operator == "$push":
+                    document.setdefault(key, []).append(copy.deepcopy(value))
+                else:
+                    raise NotImplementedError(f"Update operator {operator} is not supported")
+
+    def _upsert(self, query: dict, update: dict):
+        document = {
+            key: value for key, value in query.items()
+            if not key.startswith("$") and not (isinstance(value, dict) and any(name.startswith("$") for name in value))
+        }
+        self._apply(document, update)
+        self._insert(document)
+        return document["_id"]
+
+    async def update_one(self, query: dict, update: dict, upsert: bool = False):
+        matches = self._matching(query)[:1]
+        for document, _ in matches:
+            self._apply(document, update)
+        upserted_id = self._upsert(query, update) if upsert and not matches else None
+        return SimpleNamespace(matched_count=len(matches), modified_count=len(matches), upserted_id=upserted_id)
+
+    async def update_many(self, query: dict, update: dict, upsert: bool = False):
+        matches = self._matching(query)
+        for document, _ in matches:
+            self._apply(document, update)
+        upserted_id = self._upsert(query, update) if upsert and not matches else None
+        return SimpleNamespace(matched_count=len(matches), modified_count=len(matches), upserted_id=upserted_id)
+
+    async def find_one_and_update(self, query: dict, update: dict, projection: Optional[dict] = None, sort=None):
+        cursor = self.find(query).limit(1)
+        if sort:
+            cursor.sort(sort)
+        matches = cursor._results()
+        if not matches:
+            return None
+        before = matches[0]
+        for document in self._documents:
+            if document["_id"] == before["_id"]:
+                self._apply(document, update)
+        return self._project(before, projection)
+
+    def _delete(self, documents: List[dict]) -> int:
+        targets = {id(document) for document in documents}
+        for document in documents:
+            for name, seen in self._unique_keys.items():
+                seen.discard(self._unique_value(document, self._indexes[name]["key"]))
+        self._documents = [document for document in self._documents if id(document) not in targets]
+        return len(targets)
+
+    async def delete_one(self, query: dict):
+        deleted = self._delete([document for document, _ in self._matching(query)[:1]])
+        return SimpleNamespace(deleted_count=deleted)
+
+    async def delete_many(self, query: dict):
+        deleted = self._delete([document for document, _ in self._matching(query)])
+        return SimpleNamespace(deleted_count=deleted)
+
+
+class MemoryDatabase:
+    def __init__(self):
+        self._collections: Dict[str, MemoryCollection] = {}
+
+    def __getitem__(self, name: str) -> MemoryCollection:
+        if name not in self._collections:
+            self._collections[name] = MemoryCollection(name)
+        return self._collections[name]
+
+    def __getattr__(self, name: str) -> MemoryCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the 16 kHz mono normalization stage.
+
+Generates WAV files in the formats clients actually upload (44.1 kHz mono as
+written by backend_test.py, 44.1/48 kHz stereo), runs resample_to_wav on each
+and reports upload bytes saved, resampling time and the net wall time saved
+at a given uplink bandwidth.
+
+Usage: python benchmarks/normalize_benchmark.py [--seconds 600] [--uplink-mbps 20]
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from audio_processing import read_wav, resample_to_wav, write_wav  # noqa: E402
+
+FORMATS = [
+    ("44.1 kHz mono (backend_test.py)", 44100, 1),
+    ("44.1 kHz stereo", 44100, 2),
+    ("48 kHz stereo", 48000, 2),
+]
+
+
+def make_speechlike_wav(path: Path, sample_rate: int, channels: int, seconds: float):
+    """
+    Write amplitude-modulated harmonics plus noise, roughly shaped like speech
+    """
+    rng = np.random.default_rng(0)
+    block = sample_rate * 10
+    frames = []
+    for start in range(0, int(seconds * sample_rate), block):
+        t = (np.arange(block) + start) / sample_rate
+        envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 3 * t)
+        voice = sum(np.sin(2 * np.pi * 140 * k * t) / k for k in range(1, 8))
+        signal = 0.2 * envelope * voice + 0.01 * rng.standard_normal(block)
+        frames.append((np.clip(signal, -1, 1) * 32767).astype(np.int16))
+    mono = np.concatenate(frames)[:int(seconds * sample_rate)]
+    write_wav(path, np.repeat(mono[:, None], channels, axis=1), sample_rate)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=600, help="length of each generated recording")
+    parser.add_argument("--uplink-mbps", type=float, default=20, help="uplink bandwidth used to estimate upload time")
+    parser.add_argument("--repeat", type=int, default=3, help="take the best of this many runs")
+    args = parser.parse_args()
+
+    bytes_per_second = args.uplink_mbps * 1_000_000 / 8
+    print(f"Normalization benchmark: {args.seconds:.0f}s recordings, {args.uplink_mbps:.0f} Mbit/s uplink")
+    print(f"{'format':<34}{'input MB':>10}{'output MB':>11}{'saved':>8}{'resample s':>12}{'x realtime':>12}{'net saved s':>13}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, sample_rate, channels in FORMATS:
+            source_path = Path(tmp) / f"source_{sample_rate}_{channels}.wav"
+            output_path = Path(tmp) / "normalized.wav"
+            make_speechlike_wav(source_path, sample_rate, channels, args.seconds)
+            audio = read_wav(source_path)
+
+            best = float("inf")
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                resample_to_wav(audio, output_path)
+                best = min(best, time.perf_counter() - started)
+
+            input_bytes = source_path.stat().st_size
+            output_bytes = output_path.stat().st_size
+            upload_saved = (input_bytes - output_bytes) / bytes_per_second
+            print(
+                f"{label:<34}{input_bytes / 1e6:>10.1f}{output_bytes / 1e6:>11.1f}"
+                f"{1 - output_bytes / input_bytes:>8.0%}{best:>12.3f}{args.seconds / best:>12.0f}"
+                f"{upload_saved - best:>13.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
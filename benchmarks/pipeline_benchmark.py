@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+In-process benchmark of the API handlers against local stand-ins.
+
+Starts the fake OpenAI server (fake_openai.py) on a free port, swaps the
+Mongo database for the in-memory one (memory_db.py) and calls the handlers in
+server.py directly, so the numbers are this service's own overhead plus
+whatever upstream latency is configured. Per-stage costs come from the
+/metrics histograms.
+
+Results can be saved as JSON and compared with an earlier run; the exit
+status is 1 when any scenario got slower than --threshold.
+
+Usage: python benchmarks/pipeline_benchmark.py [--iterations 30] [--latency-ms 0]
+                                               [--output run.json] [--compare baseline.json]
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import logging
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+REPO_DIR = BENCHMARK_DIR.parent
+sys.path.insert(0, str(REPO_DIR / "backend"))
+sys.path.insert(0, str(BENCHMARK_DIR))
+
+from fake_openai import create_app  # noqa: E402
+from memory_db import MemoryDatabase  # noqa: E402
+
+
+WARM_UP_ATTEMPTS = 20
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_fake_openai(port: int, latency_ms: float, failure_rate: float):
+    import uvicorn
+    config = uvicorn.Config(
+        create_app(latency_ms=latency_ms, failure_rate=failure_rate), host="127.0.0.1", port=port, log_level="warning"
+    )
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+def make_wav(sample_rate: int, channels: int, seconds: float, seed: int) -> bytes:
+    from audio_processing import write_wav
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(sample_rate * seconds)) / sample_rate
+    tone = 0.2 * np.sin(2 * np.pi * 220 * t) + 0.01 * rng.standard_normal(len(t))
+    samples = np.repeat((tone * 32767).astype(np.int16)[:, None], channels, axis=1)
+    with tempfile.NamedTemporaryFile(suffix=".wav") as f:
+        write_wav(Path(f.name), samples, sample_rate)
+        return Path(f.name).read_bytes()
+
+
+def make_upload(data: bytes, filename: str):
+    from fastapi import UploadFile
+    from starlette.datastructures import Headers
+    return UploadFile(io.BytesIO(data), filename=filename, headers=Headers({"content-type": "audio/wav"}))
+
+
+def stage_totals(server) -> dict:
+    totals = {}
+    for histogram, prefix in ((server.TRANSCRIPTION_STAGE_SECONDS, ""), (server.UPSTREAM_REQUEST_SECONDS, "upstream_")):
+        for (label,), (count, total) in histogram.totals().items():
+            totals[prefix + label] = (count, total)
+    return totals
+
+
+def stage_means(before: dict, after: dict, iterations: int) -> dict:
+    """
+    Milliseconds spent per iteration in each stage between two snapshots
+    """
+    means = {}
+    for stage, (count, total) in after.items():
+        previous_count, previous_total = before.get(stage, (0, 0.0))
+        if count > previous_count:
+            means[stage] = round((total - previous_total) / iterations * 1000, 3)
+    return means
+
+
+async def run_scenarios(server, iterations: int, corpus: int) -> dict:
+    from fastapi import HTTPException
+    from migrations import migrate
+    await migrate(server.db)
+
+    short_clip = make_wav(16000, 1, 5, seed=1)
+    stereo_clip = make_wav(44100, 2, 10, seed=2)
+
+    # Seed a corpus for the listing endpoints
+    now = datetime.utcnow()
+    await server.db.transcriptions.insert_many([{
+        "id": str(uuid.uuid4()),
+        "text": "seeded transcript " * 200,
+        "language": "en",
+        "filename": f"seed{index}.wav",
+        "file_size": 1000,
+        "duration": 5.0,
+        "timestamp": now - timedelta(seconds=index),
+        "search_language": "english"
+    } for index in range(corpus)])
+
+    state = {}
+
+    async def transcribe_short(iteration):
+        result = await server.transcribe_audio(
+            make_upload(short_clip[:-2] + iteration.to_bytes(2, "little"), "short.wav"),
+            language="en", background=False, use_cache=False, trim_silence=False
+        )
+        state["transcription_id"] = result.id
+
+    async def transcribe_resampled(iteration):
+        await server.transcribe_audio(
+            make_upload(stereo_clip[:-2] + iteration.to_bytes(2, "little"), "stereo.wav"),
+            language="en", background=False, use_cache=False, trim_silence=False
+        )
+
+    async def transcribe_cached(iteration):
+        result = await server.transcribe_audio(
+            make_upload(short_clip, "short.wav"), language="en", background=False, use_cache=True, trim_silence=False
+        )
+        assert iteration == 0 or result.cached
+
+    async def summarize(iteration):
+        await server.create_summary(server.SummaryRequest(
+            transcription_id=state["transcription_id"], summary_language="en", force_refresh=True
+        ))
+
+    async def summarize_cached(iteration):
+        result = await server.create_summary(server.SummaryRequest(
+            transcription_id=state["transcription_id"], summary_language="en"
+        ))
+        assert result.cached
+
+    async def list_first_page(iteration):
+        response = await server.get_transcriptions(limit=50, cursor=None, fields=None)
+        state["cursor"] = response.headers["X-Next-Cursor"]
+
+    async def list_next_page(iteration):
+        await server.get_transcriptions(limit=50, cursor=state["cursor"], fields=None)
+
+    async def list_jobs(iteration):
+        await server.get_jobs(state=None, limit=50)
+
+    scenarios = [
+        ("transcribe_short", transcribe_short),
+        ("transcribe_resampled", transcribe_resampled),
+        ("transcribe_cached", transcribe_cached),
+        ("summarize", summarize),
+        ("summarize_cached", summarize_cached),
+        ("list_first_page", list_first_page),
+        ("list_next_page", list_next_page),
+        ("list_jobs", list_jobs),
+    ]
+
+    results = {}
+    for name, scenario in scenarios:
+        # Warm up; with --failure-rate the first tries may fail upstream
+        for _ in range(WARM_UP_ATTEMPTS):
+            try:
+                await scenario(0)
+                break
+            except Exception:
+                pass
+        before = stage_totals(server)
+        latencies = []
+        errors = {}
+        for iteration in range(1, iterations + 1):
+            started = time.perf_counter()
+            try:
+                await scenario(iteration)
+            except Exception as e:
+                # Failed calls are counted, not timed
+                error = f"HTTP {e.status_code}" if isinstance(e, HTTPException) else type(e).__name__
+                errors[error] = errors.get(error, 0) + 1
+                continue
+            latencies.append(time.perf_counter() - started)
+        results[name] = {
+            "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 3) if latencies else None,
+            "p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 3) if latencies else None,
+            "mean_ms": round(float(np.mean(latencies)) * 1000, 3) if latencies else None,
+            "errors": sum(errors.values()),
+            "error_types": errors,
+            "stages_ms": stage_means(before, stage_totals(server), iterations),
+        }
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        return ""
+
+
+def format_ms(value) -> str:
+    return "-" if value is None else f"{value:.2f}"
+
+
+def print_results(results: dict):
+    print(f"{'scenario':<24}{'p50 ms':>10}{'p95 ms':>10}{'errors':>8}  stages (ms per call)")
+    for name, result in results.items():
+        stages = ", ".join(f"{stage} {ms:.2f}" for stage, ms in result["stages_ms"].items())
+        print(f"{name:<24}{format_ms(result['p50_ms']):>10}{format_ms(result['p95_ms']):>10}{result['errors']:>8}  {stages}")
+    for name, result in results.items():
+        if result["errors"]:
+            print(f"   {name} errors: " + ", ".join(f"{error} x{count}" for error, count in result["error_types"].items()))
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> bool:
+    """
+    Print p50 changes against the baseline; returns True if any regressed
+    """
+    regressed = False
+    print(f"\nCompared with {baseline['meta'].get('commit') or 'baseline'} ({baseline['meta']['date']}):")
+    print(f"{'scenario':<24}{'before':>10}{'after':>10}{'change':>9}")
+    for name, result in results.items():
+        before = baseline["scenarios"].get(name)
+        if not before or before["p50_ms"] is None or result["p50_ms"] is None:
+            before_ms = before["p50_ms"] if before else None
+            print(f"{name:<24}{format_ms(before_ms):>10}{format_ms(result['p50_ms']):>10}{'-' if before else 'new':>9}")
+            continue
+        change = result["p50_ms"] / before["p50_ms"] - 1 if before["p50_ms"] else 0
+        flag = ""
+        if change > threshold:
+            regressed = True
+            flag = "  ❌ slower"
+        print(f"{name:<24}{before['p50_ms']:>10.2f}{result['p50_ms']:>10.2f}{change:>+9.0%}{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=30, help="timed calls per scenario")
+    parser.add_argument("--corpus", type=int, default=2000, help="transcriptions seeded for the listing scenarios")
+    parser.add_argument("--latency-ms", type=float, default=0, help="simulated OpenAI latency")
+    parser.add_argument("--failure-rate", type=float, default=0, help="fraction of OpenAI calls that fail")
+    parser.add_argument("--output", type=Path, help="write the results to this JSON file")
+    parser.add_argument("--compare", type=Path, help="compare with results saved by an earlier --output")
+    parser.add_argument("--threshold", type=float, default=0.10, help="p50 slowdown counted as a regression")
+    args = parser.parse_args()
+
+    port = free_port()
+    fake_openai = start_fake_openai(port, args.latency_ms, args.failure_rate)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.update({
+            "OPENAI_BASE_URL": f"http://127.0.0.1:{port}/v1",
+            "OPENAI_API_KEY": "benchmark",
+            "MONGO_URL": "mongodb://127.0.0.1:1",  # never contacted
+            "DB_NAME": "benchmark",
+            "VECTOR_INDEX_DIR": tmp,
+            "TRANSCRIPTION_BACKEND": "openai",
+        })
+        import server
+        # Keep per-request log lines out of the timings and the report
+        logging.getLogger().setLevel(logging.WARNING)
+        server.db = MemoryDatabase()
+        results = asyncio.run(run_scenarios(server, args.iterations, args.corpus))
+    fake_openai.should_exit = True
+
+    print(f"Pipeline benchmark: {args.iterations} iterations, {args.latency_ms:.0f} ms simulated OpenAI latency")
+    print_results(results)
+
+    report = {
+        "meta": {
+            "date": datetime.utcnow().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "iterations": args.iterations,
+            "corpus": args.corpus,
+            "latency_ms": args.latency_ms,
+            "failure_rate": args.failure_rate,
+        },
+        "scenarios": results,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"\nSaved results to {args.output}")
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())
+        if baseline["meta"].get("latency_ms") != args.latency_ms:
+            print(f"\n⚠️  The baseline ran with {baseline['meta'].get('latency_ms')} ms simulated latency")
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
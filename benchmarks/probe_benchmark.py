@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the header-only media prober (backend/media_probe.py).
+
+Writes one large file per supported container (sparse, so they cost almost
+no disk space), checks that probe_media() reports the duration, codec,
+sample rate and channels they were written with, and times repeated probes.
+The files are in the page cache after the first probe, so the timings are
+the parsing cost plus a few system calls; the target is well under 1 ms.
+
+Usage: python benchmarks/probe_benchmark.py [--size-mb 1024] [--iterations 2000]
+"""
+
+import argparse
+import struct
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCHMARK_DIR.parent / "backend"))
+
+from audio_processing import wav_header  # noqa: E402
+from media_probe import probe_media  # noqa: E402
+
+
+def write_sparse(path: Path, header: bytes, size: int, trailer: bytes = b""):
+    """
+    header at the start, trailer at the end and a hole in between
+    """
+    with open(path, "wb") as f:
+        f.write(header)
+        f.truncate(size - len(trailer))
+        f.seek(size - len(trailer))
+        f.write(trailer)
+
+
+def make_wav(path: Path, size: int) -> dict:
+    data_size = size - 44
+    write_sparse(path, wav_header(2, 44100, data_size), size)
+    return {"duration": data_size / (44100 * 4), "codec": "pcm_s16le", "sample_rate": 44100, "channels": 2}
+
+
+def make_mp3_cbr(path: Path, size: int) -> dict:
+    tag = b"ID3\x04\x00\x00" + bytes([0, 0, 7, 104]) + b"\x00" * 1000  # 1000-byte ID3v2 tag
+    frame = b"\xff\xfb\x90\x64"  # MPEG-1 layer III, 128 kbps, 44.1 kHz, joint stereo
+    write_sparse(path, tag + frame, size)
+    return {"duration": (size - len(tag)) * 8 / 128000, "codec": "mp3", "sample_rate": 44100, "channels": 2}
+
+
+def make_mp3_vbr(path: Path, size: int) -> dict:
+    frames = 300_000
+    frame = b"\xff\xfb\x90\x64" + b"\x00" * 32 + b"Xing" + struct.pack(">II", 1, frames)
+    write_sparse(path, frame, size)
+    return {"duration": frames * 1152 / 44100, "codec": "mp3", "sample_rate": 44100, "channels": 2}
+
+
+def atom(kind: bytes, *children: bytes) -> bytes:
+    payload = b"".join(children)
+    return struct.pack(">I4s", 8 + len(payload), kind) + payload
+
+
+def make_mp4(path: Path, size: int) -> dict:
+    # moov after a huge mdat, as most encoders write it
+    timescale, duration = 1000, 3_600_000
+    sample_entry = struct.pack(">I4s6xH8xHHHHI", 36, b"mp4a", 1, 2, 16, 0, 0, 48000 << 16)
+    moov = atom(
+        b"moov",
+        atom(b"mvhd", struct.pack(">B3xIIII", 0, 0, 0, timescale, duration) + b"\x00" * 80),
+        atom(b"trak", atom(
+            b"mdia",
+            atom(b"mdhd", struct.pack(">B3xIIII", 0, 0, 0, 48000, duration * 48)),
+            atom(b"hdlr", struct.pack(">4x4x4s12x", b"soun") + b"SoundHandler\x00"),
+            atom(b"minf", atom(b"stbl", atom(b"stsd", struct.pack(">4xI", 1) + sample_entry)))
+        ))
+    )
+    ftyp = atom(b"ftyp", b"isom\x00\x00\x02\x00isomiso2mp41")
+    mdat_size = size - len(ftyp) - len(moov)
+    mdat_header = struct.pack(">I4sQ", 1, b"mdat", mdat_size)
+    write_sparse(path, ftyp + mdat_header, size, moov)
+    return {"duration": duration / timescale, "codec": "aac", "sample_rate": 48000, "channels": 2}
+
+
+def make_flac(path: Path, size: int) -> dict:
+    total_samples = 44100 * 7200
+    packed = (44100 << 44) | ((2 - 1) << 41) | ((16 - 1) << 36) | total_samples
+    streaminfo = struct.pack(">HH", 4096, 4096) + b"\x00" * 6 + packed.to_bytes(8, "big") + b"\x00" * 16
+    write_sparse(path, b"fLaC" + bytes([0x80, 0, 0, 34]) + streaminfo, size)
+    return {"duration": 7200.0, "codec": "flac", "sample_rate": 44100, "channels": 2}
+
+
+def ebml(element_id: int, payload: bytes) -> bytes:
+    element = element_id.to_bytes((element_id.bit_length() + 7) // 8, "big")
+    return element + (len(payload) | (1 << 56)).to_bytes(8, "big") + payload
+
+
+def make_webm(path: Path, size: int) -> dict:
+    header = ebml(0x1A45DFA3, ebml(0x4282, b"webm"))
+    info = ebml(0x1549A966, ebml(0x2AD7B1, (1_000_000).to_bytes(3, "big")) + ebml(0x4489, struct.pack(">d", 5_400_000.0)))
+    audio = ebml(0xE1, ebml(0xB5, struct.pack(">d", 48000.0)) + ebml(0x9F, b"\x01"))
+    tracks = ebml(0x1654AE6B, ebml(0xAE, ebml(0x83, b"\x02") + ebml(0x86, b"A_OPUS") + audio))
+    cluster = bytes.fromhex("1f43b675") + b"\x01\xff\xff\xff\xff\xff\xff\xff"  # unknown size
+    segment = bytes.fromhex("18538067") + b"\x01\xff\xff\xff\xff\xff\xff\xff" + info + tracks + cluster
+    write_sparse(path, header + segment, size)
+    return {"duration": 5400.0, "codec": "opus", "sample_rate": 48000, "channels": 1}
+
+
+def make_avi(path: Path, size: int) -> dict:
+    def chunk(kind: bytes, payload: bytes) -> bytes:
+        return struct.pack("<4sI", kind, len(payload)) + payload + b"\x00" * (len(payload) & 1)
+
+    avih = chunk(b"avih", struct.pack("<IIIIIIIIII", 40000, 0, 0, 0, 90000, 0, 2, 0, 640, 480) + b"\x00" * 16)
+    strh = chunk(b"strh", b"auds" + b"\x00" * 52)
+    strf = chunk(b"strf", struct.pack("<HHIIHHH", 0x0055, 2, 44100, 16000, 1, 0, 0))
+    hdrl = chunk(b"LIST", b"hdrl" + avih + chunk(b"LIST", b"strl" + strh + strf))
+    write_sparse(path, b"RIFF" + struct.pack("<I", size - 8) + b"AVI " + hdrl, size)
+    return {"duration": 3600.0, "codec": "mp3", "sample_rate": 44100, "channels": 2}
+
+
+FORMATS = {
+    "wav": (".wav", make_wav),
+    "mp3 (CBR)": (".mp3", make_mp3_cbr),
+    "mp3 (VBR)": (".mp3", make_mp3_vbr),
+    "mp4": (".mp4", make_mp4),
+    "flac": (".flac", make_flac),
+    "webm": (".webm", make_webm),
+    "avi": (".avi", make_avi),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=1024, help="size of each generated file")
+    parser.add_argument("--iterations", type=int, default=2000, help="probes timed per format")
+    args = parser.parse_args()
+
+    size = args.size_mb * 1024 * 1024
+    failures = 0
+    print(f"Probing {args.size_mb} MB files, {args.iterations} iterations each")
+    print(f"{'format':<12}{'p50 µs':>9}{'p99 µs':>9}{'max µs':>9}  result")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, (suffix, make) in FORMATS.items():
+            path = Path(tmp) / f"sample{suffix}"
+            expected = make(path, size)
+            info = probe_media(path)
+
+            timings = np.empty(args.iterations)
+            for iteration in range(args.iterations):
+                started = time.perf_counter()
+                probe_media(path)
+                timings[iteration] = time.perf_counter() - started
+            timings *= 1e6
+
+            mismatches = [
+                f"{field} {getattr(info, field)!r} != {value!r}" for field, value in expected.items()
+                if not info or (
+                    abs(getattr(info, field) - value) > 0.01 if field == "duration" and getattr(info, field)
+                    else getattr(info, field) != value
+                )
+            ]
+            failures += bool(mismatches)
+            result = "❌ " + "; ".join(mismatches) if mismatches else (
+                f"✅ {info.container} {info.codec} {info.sample_rate} Hz x{info.channels}, {info.duration:.1f}s"
+            )
+            print(f"{name:<12}{np.percentile(timings, 50):>9.1f}{np.percentile(timings, 99):>9.1f}{timings.max():>9.1f}  {result}")
+            path.unlink()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
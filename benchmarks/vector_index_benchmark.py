@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the memory-mapped semantic search index.
+
+Fills a VectorIndex with --chunks chunk vectors (1M by default, about 1GB on
+disk at 256 dimensions) and reports append throughput, top-k query latency,
+delete latency and embedding throughput. Most of the vectors are random unit
+vectors so the index can be filled quickly; a few real embedded passages are
+planted in it to check that queries still find them.
+
+Usage: python benchmarks/vector_index_benchmark.py [--chunks 1000000] [--queries 50]
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from vector_index import EMBEDDING_DIM, VectorIndex, embed, embed_chunks  # noqa: E402
+
+CHUNKS_PER_TRANSCRIPTION = 20
+
+PASSAGES = [
+    ("The quarterly budget meeting was postponed until next week",
+     "we moved the budget meetings for this quarter to the following week"),
+    ("Please send the signed contract to the legal department by Friday",
+     "legal needs the contract signed and sent over before friday"),
+    ("The new hire starts on Monday and will join the platform team",
+     "on monday a new engineer joins our platform team"),
+]
+
+
+def random_unit_vectors(rng: np.random.Generator, rows: int) -> np.ndarray:
+    vectors = rng.standard_normal((rows, EMBEDDING_DIM), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def percentile_ms(samples, q: float) -> float:
+    return float(np.percentile(samples, q)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=1_000_000, help="number of chunk vectors in the index")
+    parser.add_argument("--queries", type=int, default=50, help="number of timed queries")
+    parser.add_argument("--k", type=int, default=10, help="results per query")
+    parser.add_argument("--dir", type=Path, default=None, help="index directory (a temporary one by default)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        index = VectorIndex(Path(tmp))
+        owners = []
+
+        started = time.perf_counter()
+        planted = len(PASSAGES)
+        for start in range(0, args.chunks - planted, CHUNKS_PER_TRANSCRIPTION):
+            rows = min(CHUNKS_PER_TRANSCRIPTION, args.chunks - planted - start)
+            owner = str(uuid.UUID(int=int(rng.integers(1 << 62))))
+            index.add(owner, [(0, 0)] * rows, random_unit_vectors(rng, rows))
+            owners.append(owner)
+        for position, (passage, _) in enumerate(PASSAGES):
+            index.add(f"planted-{position}", *embed_chunks(passage))
+        build_seconds = time.perf_counter() - started
+
+        # The first pass pages the matrix in; time the warm passes
+        index.search(embed(PASSAGES[0][1]), args.k)
+        latencies = []
+        for query in range(args.queries):
+            paraphrase = PASSAGES[query % len(PASSAGES)][1]
+            started = time.perf_counter()
+            index.search(embed(paraphrase), args.k)
+            latencies.append(time.perf_counter() - started)
+
+        found = sum(
+            index.search(embed(paraphrase), 1)[0][0] == f"planted-{position}"
+            for position, (_, paraphrase) in enumerate(PASSAGES)
+        )
+
+        delete_latencies = []
+        for owner in owners[:5]:
+            started = time.perf_counter()
+            index.remove(owner)
+            delete_latencies.append(time.perf_counter() - started)
+
+        text = " ".join(passage for pair in PASSAGES for passage in pair) * 20
+        started = time.perf_counter()
+        spans, _ = embed_chunks(text)
+        embed_seconds = time.perf_counter() - started
+
+        disk_bytes = sum(path.stat().st_size for path in Path(tmp).iterdir())
+
+    print(f"Vector index benchmark: {args.chunks:,} chunks x {EMBEDDING_DIM} dims, top {args.k}")
+    print(f"{'index size on disk':<28}{disk_bytes / 1e9:>10.2f} GB")
+    print(f"{'append throughput':<28}{args.chunks / build_seconds:>10,.0f} chunks/s")
+    print(f"{'query latency p50':<28}{percentile_ms(latencies, 50):>10.1f} ms")
+    print(f"{'query latency p95':<28}{percentile_ms(latencies, 95):>10.1f} ms")
+    print(f"{'delete latency p50':<28}{percentile_ms(delete_latencies, 50):>10.1f} ms")
+    print(f"{'embedding throughput':<28}{len(spans) / embed_seconds:>10,.0f} chunks/s")
+    print(f"{'paraphrases ranked first':<28}{found:>10} / {len(PASSAGES)}")
+
+
+if __name__ == "__main__":
+    main()
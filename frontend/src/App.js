@@ -20,6 +20,74 @@ const {
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
 
+// Resumable uploads: ranges in flight at once, and retries per range
+const UPLOAD_PARALLELISM = 3;
+const UPLOAD_RETRIES = 5;
+const JOB_POLL_INTERVAL_MS = 1500;
+
+const sleep = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+
+// Send the file in ranges so a dropped connection only costs the range in flight
+const uploadResumable = async (file, language, onProgress) => {
+  const { data: session } = await axios.post(`${API}/uploads`, {
+    filename: file.name,
+    file_size: file.size,
+    content_type: file.type || null,
+    language
+  });
+
+  const pending = [];
+  for (let start = 0; start < file.size; start += session.chunk_size) {
+    pending.push([start, Math.min(start + session.chunk_size, file.size)]);
+  }
+
+  let sent = 0;
+  const sendRange = async ([start, end]) => {
+    for (let attempt = 0; ; attempt++) {
+      try {
+        await axios.put(`${API}/uploads/${session.id}`, file.slice(start, end), {
+          headers: {
+            "Content-Type": "application/octet-stream",
+            "Content-Range": `bytes ${start}-${end - 1}/${file.size}`,
+          },
+        });
+        sent += end - start;
+        onProgress(sent / file.size);
+        return;
+      } catch (error) {
+        // Client errors will not go away by retrying
+        if (attempt >= UPLOAD_RETRIES || error.response?.status < 500) {
+          throw error;
+        }
+        await sleep(1000 * 2 ** attempt);
+      }
+    }
+  };
+
+  await Promise.all(
+    Array.from({ length: UPLOAD_PARALLELISM }, async () => {
+      while (pending.length) {
+        await sendRange(pending.shift());
+      }
+    })
+  );
+
+  const { data: job } = await axios.post(`${API}/uploads/${session.id}/complete`);
+  return job;
+};
+
+const waitForJob = async (job, onProgress) => {
+  while (job.state !== "done") {
+    if (job.state === "failed") {
+      throw new Error(job.error || "Transcription failed");
+    }
+    onProgress(job.progress);
+    await sleep(JOB_POLL_INTERVAL_MS);
+    ({ data: job } = await axios.get(`${API}/jobs/${job.id}`));
+  }
+  return job.result;
+};
+
 const Home = () => {
   const [uploadedFile, setUploadedFile] = useState(null);
   const [transcriptionResult, setTranscriptionResult] = useState("");
@@ -53,41 +121,32 @@ const Home = () => {
     setUploadProgress(10);
 
     try {
-      // Create form data
-      const formData = new FormData();
-      formData.append("file", file);
-      formData.append("language", selectedLanguage);
-
       setProcessingStep("Uploading file to server...");
       setUploadProgress(25);
 
-      // Make API call with progress tracking
-      const response = await axios.post(`${API}/transcribe`, formData, {
-        headers: {
-          "Content-Type": "multipart/form-data",
-        },
-        onUploadProgress: (progressEvent) => {
-          const percentCompleted = Math.round((progressEvent.loaded * 100) / progressEvent.total);
-          setUploadProgress(25 + (percentCompleted * 0.25)); // 25-50% for upload
-        },
+      const job = await uploadResumable(file, selectedLanguage, (fraction) => {
+        setUploadProgress(25 + Math.round(fraction * 25)); // 25-50% for upload
       });
 
       setProcessingStep("Processing with OpenAI Whisper...");
-      setUploadProgress(75);
-
-      // Simulate processing time for better UX
-      await new Promise(resolve => setTimeout(resolve, 2000));
+      const result = await waitForJob(job, (progress) => {
+        setUploadProgress(50 + Math.round(progress * 50)); // 50-100% for processing
+      });
 
       setProcessingStep("Transcription complete!");
       setUploadProgress(100);
 
       // Set results
-      setTranscriptionResult(response.data.text);
-      setTranscriptionId(response.data.id);
+      setTranscriptionResult(result.text);
+      setTranscriptionId(result.id);
 
     } catch (error) {
       console.error("Transcription error:", error);
-      setError(error.response?.data?.detail || "Transcription failed. Please try again.");
+      setError(
+        error.response?.data?.detail ||
+        (error.isAxiosError ? null : error.message) ||
+        "Transcription failed. Please try again."
+      );
       setProcessingStep("Transcription failed");
     } finally {
       setIsProcessing(false);
@@ -323,10 +323,11 @@ const SummarySection = ({ transcriptionId, onSummaryCreate }) => {
 
     setIsGenerating(true);
     setError("");
+    setSummary("");
 
     try {
       const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
-      const response = await fetch(`${BACKEND_URL}/api/summarize`, {
+      const response = await fetch(`${BACKEND_URL}/api/summarize/stream`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -337,15 +338,44 @@ const SummarySection = ({ transcriptionId, onSummaryCreate }) => {
         })
       });
 
-      if (response.ok) {
-        const result = await response.json();
-        setSummary(result.summary);
-        if (onSummaryCreate) {
-          onSummaryCreate(result);
-        }
-      } else {
+      if (!response.ok) {
         const errorData = await response.json();
         setError(errorData.detail || "Failed to generate summary");
+        return;
+      }
+
+      // Render the summary as server-sent events arrive
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        const events = buffer.split("\n\n");
+        buffer = events.pop();
+        for (const rawEvent of events) {
+          let eventName = "message";
+          let data = "";
+          for (const line of rawEvent.split("\n")) {
+            if (line.startsWith("event: ")) eventName = line.slice(7);
+            else if (line.startsWith("data: ")) data += line.slice(6);
+          }
+          if (!data) continue;
+
+          const payload = JSON.parse(data);
+          if (eventName === "delta") {
+            setSummary((previous) => previous + payload.text);
+          } else if (eventName === "done") {
+            setSummary(payload.summary);
+            if (onSummaryCreate) {
+              onSummaryCreate(payload);
+            }
+          } else if (eventName === "error") {
+            setError(payload.detail || "Failed to generate summary");
+          }
+        }
       }
     } catch (err) {
       setError("Network error while generating summary");
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Load Testing for Whisper AI Transcription Service
+Drives concurrent clients through a mixed transcribe/summarize/list/get
+workload at a target request rate and reports throughput, latency
+percentiles, error rates and server memory growth
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+import requests
+
+from backend_test import BASE_URL, WhisperAPITester
+
+OPERATIONS = ["transcribe", "summarize", "list", "get"]
+DEFAULT_MIX = "transcribe=2,summarize=1,list=4,get=3"
+
+
+def parse_mix(mix):
+    """Parse "name=weight,..." into a dict of operation weights"""
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Unknown operation {name!r}; choose from {', '.join(OPERATIONS)}")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+class LoadTest:
+    def __init__(self, args):
+        self.args = args
+        self.base_url = args.base_url.rstrip("/")
+        self.metrics_url = self.base_url[:-len("/api")] + "/metrics" if self.base_url.endswith("/api") else None
+        self.weights = args.mix
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(lambda: defaultdict(int))
+        self.transcription_ids = []
+        self.memory_samples = []
+        self.next_slot = 0
+        self.late_starts = 0
+        self.stopped = threading.Event()
+
+        # Reuse the functional test's WAV generator so the audio matches what CI uploads
+        audio_path = WhisperAPITester().create_test_audio_file(args.audio_mb)
+        with open(audio_path, "rb") as f:
+            self.audio = f.read()
+        os.unlink(audio_path)
+
+    # Operations
+
+    def transcribe(self, session):
+        files = {"file": ("load_test.wav", self.audio, "audio/wav")}
+        data = {"language": "en", "use_cache": str(self.args.use_cache).lower()}
+        response = session.post(f"{self.base_url}/transcribe", files=files, data=data, timeout=self.args.timeout)
+        if response.status_code == 200:
+            with self.lock:
+                self.transcription_ids.append(response.json()["id"])
+        return response
+
+    def summarize(self, session):
+        payload = {
+            "transcription_id": self.random_transcription_id(),
+            "summary_language": "en",
+            "force_refresh": self.args.fresh_summaries
+        }
+        return session.post(f"{self.base_url}/summarize", json=payload, timeout=self.args.timeout)
+
+    def list(self, session):
+        return session.get(f"{self.base_url}/transcriptions", params={"limit": 50}, timeout=self.args.timeout)
+
+    def get(self, session):
+        return session.get(f"{self.base_url}/transcriptions/{self.random_transcription_id()}", timeout=self.args.timeout)
+
+    def random_transcription_id(self):
+        with self.lock:
+            return random.choice(self.transcription_ids)
+
+    # Scheduling
+
+    def take_slot(self):
+        with self.lock:
+            slot = self.next_slot
+            self.next_slot += 1
+            return slot
+
+    def client(self, client_id, started):
+        session = requests.Session()
+        rng = random.Random(self.args.seed + client_id)
+        names = list(self.weights)
+        weights = [self.weights[name] for name in names]
+        deadline = started + self.args.duration
+
+        while not self.stopped.is_set():
+            if self.args.rate:
+                # Open loop: request k is due at k / rate no matter how slow earlier ones were
+                scheduled = started + self.take_slot() / self.args.rate
+                if scheduled >= deadline:
+                    break
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                elif delay < -0.01:
+                    with self.lock:
+                        self.late_starts += 1
+            else:
+                scheduled = time.perf_counter()
+                if scheduled >= deadline:
+                    break
+
+            name = rng.choices(names, weights)[0]
+            try:
+                response = getattr(self, name)(session)
+                error = None if response.status_code < 400 else f"HTTP {response.status_code}"
+            except requests.RequestException as e:
+                error = type(e).__name__
+            # Measured from the scheduled start, so time spent queued behind a
+            # busy client counts as latency instead of being hidden
+            elapsed = time.perf_counter() - scheduled
+            with self.lock:
+                self.latencies[name].append(elapsed)
+                if error:
+                    self.errors[name][error] += 1
+
+    def sample_memory(self, started):
+        while True:
+            try:
+                response = requests.get(self.metrics_url, timeout=5)
+                for line in response.text.splitlines():
+                    if line.startswith("process_resident_memory_bytes "):
+                        self.memory_samples.append((time.perf_counter() - started, float(line.split()[1])))
+            except requests.RequestException:
+                pass
+            if self.stopped.wait(self.args.sample_interval):
+                return
+
+    def run(self):
+        print(f"Load testing {self.base_url}: {self.args.clients} clients, "
+              f"{f'{self.args.rate:g} req/s' if self.args.rate else 'closed loop'}, {self.args.duration:g}s")
+
+        # Summaries and lookups need at least one transcription to point at
+        session = requests.Session()
+        response = self.transcribe(session)
+        if response.status_code != 200:
+            print(f"❌ Could not create a seed transcription: HTTP {response.status_code} {response.text}")
+            return None
+
+        started = time.perf_counter()
+        sampler = None
+        if self.metrics_url:
+            sampler = threading.Thread(target=self.sample_memory, args=(started,), daemon=True)
+            sampler.start()
+        clients = [
+            threading.Thread(target=self.client, args=(client_id, started), daemon=True)
+            for client_id in range(self.args.clients)
+        ]
+        for thread in clients:
+            thread.start()
+        try:
+            for thread in clients:
+                thread.join()
+        except KeyboardInterrupt:
+            print("Stopping early...")
+        self.stopped.set()
+        if sampler:
+            sampler.join()
+        return time.perf_counter() - started
+
+    # Reporting
+
+    def report(self, wall_seconds):
+        rows = {}
+        for name in list(self.weights) + ["all"]:
+            if name == "all":
+                samples = [latency for latencies in self.latencies.values() for latency in latencies]
+                errors = sum(sum(counts.values()) for counts in self.errors.values())
+            else:
+                samples = self.latencies.get(name, [])
+                errors = sum(self.errors.get(name, {}).values())
+            if not samples:
+                continue
+            milliseconds = np.array(samples) * 1000
+            rows[name] = {
+                "requests": len(samples),
+                "throughput_rps": len(samples) / wall_seconds,
+                "error_rate": errors / len(samples),
+                "p50_ms": float(np.percentile(milliseconds, 50)),
+                "p95_ms": float(np.percentile(milliseconds, 95)),
+                "p99_ms": float(np.percentile(milliseconds, 99)),
+                "max_ms": float(milliseconds.max()),
+            }
+
+        print(f"\n{'operation':<12}{'requests':>10}{'req/s':>9}{'errors':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+        for name, row in rows.items():
+            print(f"{name:<12}{row['requests']:>10}{row['throughput_rps']:>9.1f}{row['error_rate']:>9.1%}"
+                  f"{row['p50_ms']:>10.0f}{row['p95_ms']:>10.0f}{row['p99_ms']:>10.0f}{row['max_ms']:>10.0f}")
+        for name, counts in self.errors.items():
+            print(f"   {name} errors: " + ", ".join(f"{error} x{count}" for error, count in counts.items()))
+        if self.late_starts:
+            print(f"⚠️  {self.late_starts} requests started late; add --clients to hold the target rate")
+
+        memory = None
+        if self.memory_samples:
+            first, last = self.memory_samples[0][1], self.memory_samples[-1][1]
+            peak = max(rss for _, rss in self.memory_samples)
+            memory = {
+                "start_mb": first / 1e6,
+                "end_mb": last / 1e6,
+                "peak_mb": peak / 1e6,
+                "samples": [(round(t, 1), round(rss / 1e6, 1)) for t, rss in self.memory_samples],
+            }
+            print(f"\nServer memory: {first / 1e6:.0f} MB -> {last / 1e6:.0f} MB "
+                  f"({(last - first) / 1e6:+.0f} MB, peak {peak / 1e6:.0f} MB)")
+            print("   " + "  ".join(f"{t:.0f}s:{rss / 1e6:.0f}MB" for t, rss in self.memory_samples))
+        elif self.metrics_url:
+            print("\n⚠️  Server memory was not reported by /metrics")
+
+        return {"operations": rows, "memory": memory, "late_starts": self.late_starts}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default=BASE_URL, help="API base URL ending in /api")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent clients (threads)")
+    parser.add_argument("--rate", type=float, default=5, help="target requests per second in total; 0 for closed loop")
+    parser.add_argument("--duration", type=float, default=60, help="seconds to generate load for")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help=f"operation weights (default {DEFAULT_MIX})")
+    parser.add_argument("--audio-mb", type=float, default=1, help="size argument for create_test_audio_file")
+    parser.add_argument("--use-cache", action="store_true", help="let repeated uploads hit the transcription cache")
+    parser.add_argument("--fresh-summaries", action="store_true", help="force_refresh every summary")
+    parser.add_argument("--timeout", type=float, default=120, help="per-request timeout in seconds")
+    parser.add_argument("--sample-interval", type=float, default=5, help="seconds between server memory samples")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="also write the report to this JSON file")
+    args = parser.parse_args()
+
+    load_test = LoadTest(args)
+    wall_seconds = load_test.run()
+    if wall_seconds is None:
+        sys.exit(1)
+    report = load_test.report(wall_seconds)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": {**vars(args), "mix": args.mix}, **report}, f, indent=2)
+        print(f"\nSaved report to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
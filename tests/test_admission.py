@@ -0,0 +1,230 @@
+"""
+Tests for the streaming upload admission checks (backend/admission.py),
+driving the ASGI middleware directly with hand-made request messages
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from admission import MAX_PART_HEADER_BYTES, UploadAdmissionMiddleware, UploadRejected, admission_rule  # noqa: E402
+from media_probe import SNIFF_BYTES  # noqa: E402
+
+MAX_BODY_BYTES = 64 * 1024
+MAX_FILE_BYTES = 32 * 1024
+BOUNDARY = "----TestBoundary7MA4YWxkTrZu0gW"
+
+RULES = [
+    admission_rule("POST", r"/upload", MAX_BODY_BYTES, MAX_FILE_BYTES, "File too large"),
+    admission_rule("POST", r"/batch", MAX_BODY_BYTES, MAX_FILE_BYTES, "File too large", check_content=False),
+    admission_rule("PUT", r"/uploads/[^/]+", MAX_BODY_BYTES, MAX_BODY_BYTES, "Range too large"),
+]
+
+# Chunk sizes that split delimiters, header blocks and the sniffed head in different places
+CHUNK_SIZES = [1, 2, 3, 7, 13, 64, 100, 1000, SNIFF_BYTES - 1, SNIFF_BYTES + 1, None]
+
+
+def wav_bytes(size: int) -> bytes:
+    return (b"RIFF\x24\x00\x00\x00WAVEfmt " + bytes(range(256)) * (size // 256 + 1))[:size]
+
+
+def multipart(content: bytes, filename: str = "clip.wav", content_type: str = "audio/wav") -> bytes:
+    boundary = BOUNDARY.encode()
+    return (
+        b"--" + boundary + b"\r\n"
+        b'Content-Disposition: form-data; name="language"\r\n\r\n'
+        b"en\r\n"
+        b"--" + boundary + b"\r\n"
+        + f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'.encode()
+        + f"Content-Type: {content_type}\r\n\r\n".encode()
+        + content + b"\r\n"
+        b"--" + boundary + b"--\r\n"
+    )
+
+
+def send_request(body: bytes, chunk_size=None, method="POST", path="/upload", headers=None, content_length=True):
+    """
+    Run one request through the middleware; returns the response status and
+    how many body bytes the app behind it read
+    """
+    headers = dict(headers or {})
+    if "content-type" not in headers and method == "POST":
+        headers["content-type"] = f"multipart/form-data; boundary={BOUNDARY}"
+    if content_length is True:
+        headers["content-length"] = str(len(body))
+    elif content_length is not False:
+        headers["content-length"] = str(content_length)
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "headers": [(name.encode("latin-1"), value.encode("latin-1")) for name, value in headers.items()],
+    }
+
+    chunks = [body[start:start + chunk_size] for start in range(0, len(body), chunk_size)] if chunk_size else [body]
+    messages = [
+        {"type": "http.request", "body": chunk, "more_body": index < len(chunks) - 1}
+        for index, chunk in enumerate(chunks)
+    ]
+    read = 0
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    async def app(scope, receive, send):
+        nonlocal read
+        while True:
+            message = await receive()
+            read += len(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    try:
+        asyncio.run(UploadAdmissionMiddleware(app, RULES)(scope, receive, send))
+    except UploadRejected as e:
+        return e.status_code, read
+    return sent[0]["status"], read
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+def test_accepts_supported_upload_in_any_chunking(chunk_size):
+    body = multipart(wav_bytes(10000))
+    assert send_request(body, chunk_size) == (200, len(body))
+
+
+def test_accepts_every_split_of_boundaries_and_headers():
+    # Every chunk size up to past the first header block, so each delimiter
+    # and CRLF pair gets split at every position
+    body = multipart(wav_bytes(SNIFF_BYTES + 10))
+    for chunk_size in range(1, 200):
+        assert send_request(body, chunk_size) == (200, len(body)), chunk_size
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+def test_rejects_unsupported_type_from_part_headers(chunk_size):
+    body = multipart(wav_bytes(20000), filename="setup.exe", content_type="application/x-msdownload")
+    status, read = send_request(body, chunk_size)
+    assert status == 400
+    if chunk_size and chunk_size < 1000:
+        # Rejected once the part headers arrived, long before the content
+        assert read < 1000
+
+
+def test_extension_is_enough_without_a_content_type():
+    body = multipart(wav_bytes(5000), filename="clip.wav", content_type="application/octet-stream")
+    assert send_request(body)[0] == 200
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+def test_rejects_bad_magic_bytes(chunk_size):
+    body = multipart(b"MZ\x90\x00" + bytes(20000), filename="clip.wav")
+    status, read = send_request(body, chunk_size)
+    assert status == 400
+    if chunk_size and chunk_size < 1000:
+        assert read < SNIFF_BYTES + 1000
+
+
+def test_rejects_bad_magic_bytes_in_file_shorter_than_sniff():
+    body = multipart(b"not audio at all", filename="clip.wav")
+    assert send_request(body, 5)[0] == 400
+
+
+@pytest.mark.parametrize("chunk_size", [1, 100, None])
+def test_file_exactly_at_limit_is_accepted(chunk_size):
+    body = multipart(wav_bytes(MAX_FILE_BYTES))
+    assert send_request(body, chunk_size) == (200, len(body))
+
+
+@pytest.mark.parametrize("chunk_size", [1, 100, None])
+def test_file_one_byte_over_limit_is_rejected(chunk_size):
+    body = multipart(wav_bytes(MAX_FILE_BYTES + 1))
+    assert send_request(body, chunk_size)[0] == 413
+
+
+def test_content_length_over_limit_is_rejected_before_reading():
+    body = multipart(wav_bytes(100))
+    assert send_request(body, content_length=MAX_BODY_BYTES + 1) == (413, 0)
+
+
+@pytest.mark.parametrize("content_length", [False, "not a number"])
+def test_body_without_usable_content_length_is_counted(content_length):
+    body = wav_bytes(MAX_BODY_BYTES + 1)
+    headers = {"content-range": f"bytes 0-{len(body) - 1}/{len(body)}"}
+    status, read = send_request(body, 1000, "PUT", "/uploads/abc", headers, content_length)
+    assert status == 413
+    assert read <= MAX_BODY_BYTES
+
+
+def test_lying_content_length_is_caught_while_streaming():
+    body = wav_bytes(MAX_BODY_BYTES + 5000)
+    headers = {"content-range": f"bytes 0-{len(body) - 1}/{len(body)}"}
+    status, read = send_request(body, 1000, "PUT", "/uploads/abc", headers, content_length=100)
+    assert status == 413
+    assert read <= MAX_BODY_BYTES
+
+
+@pytest.mark.parametrize("content_length", [True, False])
+def test_body_exactly_at_limit_is_accepted(content_length):
+    body = wav_bytes(MAX_BODY_BYTES)
+    headers = {"content-range": f"bytes 0-{len(body) - 1}/{len(body)}"}
+    assert send_request(body, 1000, "PUT", "/uploads/abc", headers, content_length) == (200, len(body))
+
+
+@pytest.mark.parametrize("content_length", [True, False])
+def test_body_one_byte_over_limit_is_rejected(content_length):
+    body = wav_bytes(MAX_BODY_BYTES + 1)
+    headers = {"content-range": f"bytes 0-{len(body) - 1}/{len(body)}"}
+    assert send_request(body, 1000, "PUT", "/uploads/abc", headers, content_length)[0] == 413
+
+
+@pytest.mark.parametrize("chunk_size", [1, 100, None])
+def test_raw_range_at_file_start_is_sniffed(chunk_size):
+    body = b"MZ" + bytes(10000)
+    headers = {"content-range": f"bytes 0-{len(body) - 1}/50000"}
+    status, read = send_request(body, chunk_size, "PUT", "/uploads/abc", headers)
+    assert status == 400
+    if chunk_size:
+        assert read <= SNIFF_BYTES
+
+
+def test_short_raw_range_at_file_start_is_sniffed():
+    body = b"short junk"
+    headers = {"content-range": f"bytes 0-{len(body) - 1}/50000"}
+    assert send_request(body, 3, "PUT", "/uploads/abc", headers)[0] == 400
+
+
+def test_raw_range_at_file_start_with_valid_magic_is_accepted():
+    body = wav_bytes(10000)
+    headers = {"content-range": f"bytes 0-{len(body) - 1}/50000"}
+    assert send_request(body, 100, "PUT", "/uploads/abc", headers) == (200, len(body))
+
+
+def test_raw_range_past_file_start_is_not_sniffed():
+    body = bytes(10000)
+    headers = {"content-range": f"bytes 8192-{8192 + len(body) - 1}/50000"}
+    assert send_request(body, 100, "PUT", "/uploads/abc", headers) == (200, len(body))
+
+
+def test_rule_without_content_checks_still_enforces_size():
+    assert send_request(multipart(b"MZ" + bytes(1000), filename="setup.exe"), 100, path="/batch")[0] == 200
+    assert send_request(multipart(bytes(MAX_FILE_BYTES + 1), filename="setup.exe"), 100, path="/batch")[0] == 413
+
+
+def test_oversized_part_headers_are_rejected():
+    boundary = BOUNDARY.encode()
+    body = b"--" + boundary + b"\r\nX-Padding: " + b"a" * (MAX_PART_HEADER_BYTES * 2) + b"\r\n\r\n"
+    assert send_request(body, 1000)[0] == 400
+
+
+def test_other_routes_pass_through():
+    body = b"MZ" + bytes(MAX_BODY_BYTES * 2)
+    assert send_request(body, 1000, path="/other") == (200, len(body))
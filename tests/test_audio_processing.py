@@ -0,0 +1,116 @@
+"""
+Tests for the pure audio helpers in backend/audio_processing.py
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from audio_processing import (  # noqa: E402
+    PCMAudio, TimelineMap, detect_speech, plan_windows, read_wav, stitch_transcripts, write_spans
+)
+
+SAMPLE_RATE = 16000
+
+
+def tone_and_silence(layout, seed=0) -> PCMAudio:
+    """
+    Mono 16-bit audio of (seconds, is_tone) sections over faint noise
+    """
+    rng = np.random.default_rng(seed)
+    sections = []
+    for seconds, is_tone in layout:
+        t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+        tone = 0.3 * np.sin(2 * np.pi * 440 * t) if is_tone else 0.0
+        sections.append(tone + 0.0005 * rng.standard_normal(len(t)))
+    samples = (np.concatenate(sections) * 32767).astype(np.int16)[:, None]
+    return PCMAudio(samples, SAMPLE_RATE)
+
+
+def test_detect_speech_finds_tones_between_silences():
+    audio = tone_and_silence([(1, True), (2, False), (1.5, True), (1, False)])
+    spans = [(start / SAMPLE_RATE, end / SAMPLE_RATE) for start, end in detect_speech(audio)]
+    # Each tone, padded by 0.2s and rounded out to whole 30ms frames
+    expected = [(0.0, 1.2), (2.8, 4.7)]
+    assert len(spans) == len(expected)
+    for (start, end), (expected_start, expected_end) in zip(spans, expected):
+        assert start == pytest.approx(expected_start, abs=0.05)
+        assert end == pytest.approx(expected_end, abs=0.05)
+
+
+def test_detect_speech_keeps_short_pauses():
+    audio = tone_and_silence([(1, True), (0.3, False), (1, True)])
+    assert detect_speech(audio) == [(0, audio.frames)]
+
+
+def test_write_spans_keeps_only_the_span_samples(tmp_path):
+    audio = tone_and_silence([(1, True), (2, False), (1.5, True), (1, False)])
+    spans = detect_speech(audio)
+    timeline = write_spans(audio, spans, tmp_path / "speech.wav")
+
+    trimmed = read_wav(tmp_path / "speech.wav")
+    expected = np.concatenate([audio.samples[start:end] for start, end in spans])
+    assert trimmed.sample_rate == SAMPLE_RATE
+    assert np.array_equal(trimmed.samples, expected)
+    assert timeline.spans() == [(round(start / SAMPLE_RATE, 3), round(end / SAMPLE_RATE, 3)) for start, end in spans]
+
+
+def test_timeline_maps_trimmed_times_onto_the_original():
+    timeline = TimelineMap.from_spans([(1.0, 3.0), (5.0, 6.5), (10.0, 12.0)])
+    # Trimmed spans start at 0, 2 and 3.5 seconds
+    trimmed = [0.0, 1.5, 2.0, 3.0, 3.5, 4.0, 5.5]
+    original = [1.0, 2.5, 5.0, 6.0, 10.0, 10.5, 12.0]
+    assert timeline.to_original(trimmed) == pytest.approx(original)
+    assert timeline.to_original(2.25) == pytest.approx(5.25)
+
+
+def test_timeline_round_trips_through_its_stored_spans():
+    timeline = TimelineMap.from_spans([(0.5, 1.25), (4.0, 4.5)])
+    rebuilt = TimelineMap.from_spans(timeline.spans())
+    times = np.linspace(0, 1.25, 11)
+    assert rebuilt.to_original(times) == pytest.approx(timeline.to_original(times))
+
+
+def test_plan_windows_overlap_and_cover_the_audio():
+    windows = plan_windows(100 * SAMPLE_RATE, SAMPLE_RATE, window_seconds=30, overlap_seconds=5)
+    assert windows == [
+        (0, 30 * SAMPLE_RATE),
+        (25 * SAMPLE_RATE, 55 * SAMPLE_RATE),
+        (50 * SAMPLE_RATE, 80 * SAMPLE_RATE),
+        (75 * SAMPLE_RATE, 100 * SAMPLE_RATE),
+    ]
+
+
+def test_plan_windows_short_audio_is_one_window():
+    assert plan_windows(10 * SAMPLE_RATE, SAMPLE_RATE, window_seconds=30, overlap_seconds=5) == [(0, 10 * SAMPLE_RATE)]
+
+
+def test_plan_windows_caps_overlap_at_half_a_window():
+    windows = plan_windows(100, 1, window_seconds=10, overlap_seconds=50)
+    assert all(next_start - start == 5 for (start, _), (next_start, _) in zip(windows, windows[1:]))
+    assert windows[-1][1] == 100
+
+
+def test_stitch_removes_the_overlap_once():
+    texts = ["the quick brown fox jumps", "fox jumps over the lazy", "the lazy dog"]
+    assert stitch_transcripts(texts) == "the quick brown fox jumps over the lazy dog"
+
+
+def test_stitch_keeps_the_longest_overlap_of_repeated_words():
+    assert stitch_transcripts(["we said no no no", "no no no to that"]) == "we said no no no to that"
+
+
+def test_stitch_keeps_a_single_repeated_word():
+    # One shared word is too weak a match to drop; it may be said twice
+    assert stitch_transcripts(["it was very", "very good"]) == "it was very very good"
+
+
+def test_stitch_ignores_case_and_punctuation_in_the_overlap():
+    assert stitch_transcripts(["Hello there, General", "there general Kenobi."]) == "Hello there, General Kenobi."
+
+
+def test_stitch_skips_empty_windows():
+    assert stitch_transcripts(["one two three", "", "two three four"]) == "one two three four"
@@ -0,0 +1,52 @@
+"""
+Tests for the keyset pagination cursors of GET /api/transcriptions
+"""
+import base64
+import os
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+from fastapi import HTTPException
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+# server.py reads these at import; nothing is contacted by these tests
+os.environ.setdefault("MONGO_URL", "mongodb://127.0.0.1:1")
+os.environ.setdefault("DB_NAME", "test")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("VECTOR_INDEX_DIR", tempfile.mkdtemp())
+
+from server import decode_list_cursor, encode_list_cursor  # noqa: E402
+
+
+def b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode()
+
+
+@pytest.mark.parametrize("timestamp", [datetime(2024, 3, 1, 12, 30, 5, 123456), datetime(1999, 12, 31)])
+def test_cursor_round_trip(timestamp):
+    item = {"timestamp": timestamp, "id": "0b6f1c1e-8d0a-4c47-9a41-3f8f2f0f5a10", "text": "ignored"}
+    assert decode_list_cursor(encode_list_cursor(item)) == (timestamp, item["id"])
+
+
+def test_cursor_is_url_safe():
+    cursor = encode_list_cursor({"timestamp": datetime(2024, 1, 1), "id": "??>>~~"})
+    assert set(cursor) <= set("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_=")
+
+
+@pytest.mark.parametrize("cursor", [
+    "",
+    "not a cursor!",
+    b64(b"\xff\xfe not json"),
+    b64(b"[1, 2]"),
+    b64(b'{"t": "2024-01-01T00:00:00"}'),
+    b64(b'{"t": "yesterday", "i": "x"}'),
+    b64(b'{"t": 5, "i": "x"}'),
+])
+def test_malformed_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_list_cursor(cursor)
+    assert error.value.status_code == 400
@@ -0,0 +1,83 @@
+"""
+Tests for the header prober (backend/media_probe.py) and the audio track
+extraction (backend/demux.py), on small versions of the synthetic files the
+benchmarks generate
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "backend"))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+import demux_benchmark  # noqa: E402
+import probe_benchmark  # noqa: E402
+from demux import DemuxError, extract_audio  # noqa: E402
+from media_probe import probe_media  # noqa: E402
+
+PROBE_FILE_BYTES = 4 * 1024 * 1024
+
+
+@pytest.mark.parametrize("name", list(probe_benchmark.FORMATS))
+def test_probe_reports_what_the_headers_say(name, tmp_path):
+    suffix, make = probe_benchmark.FORMATS[name]
+    path = tmp_path / f"sample{suffix}"
+    expected = make(path, PROBE_FILE_BYTES)
+    info = probe_media(path)
+    assert info is not None
+    for field, value in expected.items():
+        if field == "duration":
+            assert info.duration == pytest.approx(value, abs=0.01)
+        else:
+            assert getattr(info, field) == value, field
+
+
+def test_probe_rejects_unknown_files(tmp_path):
+    path = tmp_path / "setup.exe"
+    path.write_bytes(b"MZ\x90\x00" + bytes(8000))
+    assert probe_media(path) is None
+
+
+def test_probe_survives_truncated_headers(tmp_path):
+    path = tmp_path / "sample.mp4"
+    probe_benchmark.make_mp4(path, PROBE_FILE_BYTES)
+    with open(path, "r+b") as f:
+        f.truncate(PROBE_FILE_BYTES - 40)
+    info = probe_media(path)
+    assert info is not None and info.container == "mp4"
+
+
+@pytest.mark.parametrize("name", list(demux_benchmark.FORMATS))
+def test_extract_audio_keeps_every_frame_in_order(name, tmp_path):
+    suffix, make = demux_benchmark.FORMATS[name]
+    path = tmp_path / f"sample{suffix}"
+    frames = make(path, np.random.default_rng(0), 3, 256 * 1024, 32 * 1024)
+    source = probe_media(path)
+
+    output_path = extract_audio(path, tmp_path / "sample.audio", source.container)
+    assert output_path is not None
+    assert output_path.stat().st_size < path.stat().st_size
+    assert demux_benchmark.frames_in_order(output_path.read_bytes(), frames)
+
+    output = probe_media(output_path)
+    assert (output.codec, output.sample_rate, output.channels) == (source.codec, source.sample_rate, source.channels)
+    assert output.duration == pytest.approx(source.duration, abs=0.01)
+
+
+def test_extract_audio_rejects_damaged_files(tmp_path):
+    path = tmp_path / "sample.mp4"
+    demux_benchmark.make_mp4(path, np.random.default_rng(0), 2, 64 * 1024, 8 * 1024)
+    data = path.read_bytes()
+    moov = data.rfind(b"moov") - 4
+    path.write_bytes(data[:moov] + data[moov:moov + 64])
+    with pytest.raises(DemuxError):
+        extract_audio(path, tmp_path / "sample.audio", "mp4")
+    assert not list(tmp_path.glob("sample.audio*"))
+
+
+def test_extract_audio_rejects_unknown_containers(tmp_path):
+    with pytest.raises(DemuxError):
+        extract_audio(tmp_path / "sample.flac", tmp_path / "sample.audio", "flac")
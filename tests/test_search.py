@@ -0,0 +1,65 @@
+"""
+Tests for the search helpers in backend/search.py
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from search import query_terms, search_language, snippet  # noqa: E402
+
+ELLIPSIS = "…"
+
+
+def test_query_terms_skip_negated_words_and_phrases():
+    terms = query_terms('Meeting -budget "Next week" -"old plan" meeting')
+    assert terms == ["meeting", "next", "week"]
+
+
+def test_query_terms_keep_non_latin_words():
+    assert query_terms("会議 Réunion -😀") == ["会議", "réunion"]
+
+
+@pytest.mark.parametrize("language, expected", [("en", "english"), ("pt-BR", "portuguese"), ("ja", "none"), (None, "none")])
+def test_search_language(language, expected):
+    assert search_language(language) == expected
+
+
+def test_short_text_is_returned_whole():
+    text, highlights = snippet("Der Tee ist heiß", ["heiß"], 100)
+    assert text == "Der Tee ist heiß"
+    assert [text[start:end] for start, end in highlights] == ["heiß"]
+
+
+@pytest.mark.parametrize("text, query", [
+    ("café naïve 😀 " * 30 + "résumé review " + "😀 ok " * 40, "résumé"),
+    ("会議" * 10 + " 予算について話しました " + "話" * 200, "予算について"),
+    ("Привет мир " * 40 + "бюджет утвержден " + "и так далее " * 40, "бюджет"),
+])
+def test_snippet_bounds_on_multibyte_text(text, query):
+    width = 80
+    cut, highlights = snippet(text, query_terms(query), width)
+    body = cut.strip(ELLIPSIS)
+    # Counted in characters, never bytes, and always a slice of the original
+    assert len(body) <= width
+    assert body in text
+    assert cut.startswith(ELLIPSIS) and cut.endswith(ELLIPSIS)
+    assert highlights
+    for start, end in highlights:
+        assert 0 < start < end < len(cut)
+        assert cut[start:end].lower().startswith(query[:5].lower())
+
+
+def test_snippet_centres_on_the_densest_cluster():
+    text = "budget " + "filler " * 50 + "budget plan budget " + "filler " * 50
+    cut, highlights = snippet(text, ["budget"], 60)
+    assert len(highlights) == 2
+    assert "budget plan budget" in cut
+
+
+def test_snippet_does_not_cut_words():
+    text = " ".join(["word"] * 100) + " target " + " ".join(["word"] * 100)
+    cut, _ = snippet(text, ["target"], 50)
+    assert all(token in ("word", "target") for token in cut.strip(ELLIPSIS).split())